@@ -0,0 +1,26 @@
+"""
+ASGI config for med project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Under ASGI free-time lookups and the busy-time event stream are served by
+async views (see ``RECEPTION_ASYNC_VIEWS`` in settings). The booking form
+stays synchronous: it saves in a transaction under a doctor lock, which the
+async ORM does not support. The process is warmed up (URLs, templates,
+database, caches) before serving.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "med.settings")
+os.environ.setdefault("MED_ASYNC_VIEWS", "1")
+
+application = get_asgi_application()
+
+from reception.warmup import warm_up  # noqa: E402
+
+warm_up()
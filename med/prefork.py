@@ -0,0 +1,292 @@
+"""Запуск ``med.wsgi.application`` в нескольких предварительно созданных процессах.
+
+Приложение импортируется и прогревается в главном процессе до создания
+рабочих, поэтому загруженный код и прогретые кеши делятся между ними
+копированием при записи. Соединение с БД каждый рабочий открывает сам.
+Рабочий процесс перезапускается после заданного числа запросов.
+
+Сигналы главного процесса:
+
+* ``SIGTERM``, ``SIGINT`` - плавная остановка: рабочие дообрабатывают
+  текущий запрос и завершаются;
+* ``SIGHUP`` - плавная перезагрузка: главный процесс перезапускает себя
+  с новым кодом, не закрывая слушающий сокет, старые рабочие
+  дообрабатывают текущий запрос и завершаются.
+
+Запуск::
+
+    $ python -m med.prefork --bind 0.0.0.0:8000 --workers 4
+"""
+import argparse
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+# Переменная окружения с номером слушающего сокета при перезагрузке
+LISTEN_FD_ENV = 'MED_LISTEN_FD'
+
+# Интервал проверки состояния процессов, в секундах
+POLL_INTERVAL = 0.5
+
+
+class WorkerRequestHandler(WSGIRequestHandler):
+    """Обработчик соединения с ограниченным временем ожидания клиента.
+
+    Принятое соединение блокирующее, и без тайм-аута клиент, который не
+    присылает запрос, занимает рабочий процесс навсегда.
+    """
+
+    # Тайм-аут чтения запроса и отправки ответа, в секундах
+    timeout = 30
+
+
+class WorkerServer(WSGIServer):
+    """WSGI-сервер рабочего процесса на общем слушающем сокете."""
+
+    def __init__(self, sock, application):
+        super().__init__(sock.getsockname()[:2], WorkerRequestHandler, bind_and_activate=False)
+        # Сокет уже привязан и слушает в главном процессе
+        self.socket.close()
+        self.socket = sock
+        self.server_name, self.server_port = sock.getsockname()[:2]
+        self.setup_environ()
+        self.set_app(application)
+        self.requests_served = 0
+        # Ожидание запроса прерывается, чтобы проверить сигнал остановки
+        self.timeout = POLL_INTERVAL
+
+    def process_request(self, request, client_address):
+        super().process_request(request, client_address)
+        self.requests_served += 1
+
+
+class Arbiter:
+    """Главный процесс: запускает рабочие процессы и следит за ними."""
+
+    def __init__(self, application, sock, workers, max_requests, max_requests_jitter,
+                 graceful_timeout):
+        self.application = application
+        self.socket = sock
+        self.workers_count = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.workers = set()
+        self.stopping = False
+        self.reloading = False
+
+    def run(self):
+        """Запускает рабочие процессы и перезапускает завершившиеся."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, self.reload)
+
+        while not self.stopping:
+            if self.reloading:
+                self.reexec()
+            self.reap()
+            while len(self.workers) < self.workers_count:
+                self.spawn()
+            time.sleep(POLL_INTERVAL)
+
+        self.kill_workers(signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(POLL_INTERVAL / 5)
+        self.kill_workers(signal.SIGKILL)
+        self.reap()
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def reload(self, signum, frame):
+        self.reloading = True
+
+    def spawn(self):
+        """Создает рабочий процесс."""
+        pid = os.fork()
+        if pid:
+            self.workers.add(pid)
+            return
+
+        exit_code = 0
+        try:
+            self.run_worker()
+        except BaseException:
+            exit_code = 1
+            sys.excepthook(*sys.exc_info())
+        finally:
+            os._exit(exit_code)
+
+    def run_worker(self):
+        """Обрабатывает запросы, пока не получен сигнал или не исчерпан лимит."""
+        alive = True
+
+        def stop(signum, frame):
+            nonlocal alive
+            alive = False
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        random.seed()
+
+        # Соединение с БД открывается в рабочем процессе до первого запроса
+        from reception.warmup import warm_up
+        warm_up(keep_connection=True)
+
+        server = WorkerServer(self.socket, self.application)
+        max_requests = self.max_requests + random.randint(0, self.max_requests_jitter)
+        while alive and (not self.max_requests or server.requests_served < max_requests):
+            server.handle_request()
+
+        from reception.metrics import registry
+        registry.flush(force=True)
+
+    def reap(self):
+        """Забирает статусы завершившихся рабочих процессов."""
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            self.workers.discard(pid)
+
+    def kill_workers(self, signum):
+        for pid in self.workers:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def reexec(self):
+        """Перезапускает главный процесс с новым кодом на том же сокете.
+
+        Старые рабочие получают ``SIGTERM`` и остаются дочерними процессами
+        нового главного процесса, который заберет их статусы.
+        """
+        self.kill_workers(signal.SIGTERM)
+        self.socket.set_inheritable(True)
+        os.environ[LISTEN_FD_ENV] = str(self.socket.fileno())
+        os.execv(sys.executable, [sys.executable, '-m', 'med.prefork', *sys.argv[1:]])
+
+
+def parse_bind(bind):
+    """Разбирает адрес вида ``хост:порт``."""
+    host, _, port = bind.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+def create_socket(bind, backlog):
+    """Возвращает слушающий сокет, унаследованный при перезагрузке или новый."""
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if fd is not None:
+        sock = socket.socket(fileno=int(fd))
+        sock.set_inheritable(False)
+    else:
+        sock = socket.create_server(parse_bind(bind), backlog=backlog)
+
+    # Соединение принимает тот рабочий, который успел первым, остальные
+    # не должны блокироваться на accept
+    sock.setblocking(False)
+    return sock
+
+
+def load_application():
+    """Импортирует приложение, прогреваемое до создания рабочих процессов."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'med.settings')
+    # Рабочие процессы сводят метрики для /metrics через общий каталог
+    if not os.environ.get('MED_METRICS_DIR'):
+        os.environ['MED_METRICS_DIR'] = tempfile.mkdtemp(prefix='med-metrics-')
+    # Сброс кешей после записи должен быть виден всем рабочим процессам
+    if not os.environ.get('MED_CACHE_DIR'):
+        os.environ['MED_CACHE_DIR'] = tempfile.mkdtemp(prefix='med-cache-')
+
+    from med.wsgi import application
+
+    return application
+
+
+def check_shared_caches(workers):
+    """Возвращает ошибку, если кеш со сбрасываемым состоянием не общий для рабочих.
+
+    Локальный кеш у каждого процесса свой. Запись сбрасывает его только в
+    своем процессе, и остальные рабочие отдают устаревшие занятость врачей,
+    ETag, брони, справочник врачей и календари. С локальным кешем
+    ограничения частоты запросов каждый рабочий процесс пропускает клиенту
+    полную норму запросов.
+
+    :rtype str or None
+    """
+    from django.conf import settings
+
+    if workers < 2:
+        return None
+
+    aliases = ['default', settings.RECEPTION_FREE_TIME_CACHE_ALIAS,
+               settings.RECEPTION_THROTTLE_CACHE_ALIAS]
+    for alias in dict.fromkeys(aliases):
+        if settings.CACHES[alias]['BACKEND'].endswith('.LocMemCache'):
+            return (f'Кеш {alias!r} локальный для процесса, укажите общий кеш '
+                    'в CACHES или каталог кешей в MED_CACHE_DIR')
+
+    return None
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--bind', default=os.environ.get('MED_BIND', '127.0.0.1:8000'),
+        help='Адрес и порт в виде хост:порт')
+    parser.add_argument(
+        '--workers', type=int,
+        default=int(os.environ.get('MED_WORKERS', os.cpu_count() or 1)),
+        help='Число рабочих процессов, по умолчанию - число ядер')
+    parser.add_argument(
+        '--max-requests', type=int, default=int(os.environ.get('MED_MAX_REQUESTS', 1000)),
+        help='Число запросов, после которого рабочий процесс перезапускается, '
+             '0 - без перезапуска')
+    parser.add_argument(
+        '--max-requests-jitter', type=int,
+        default=int(os.environ.get('MED_MAX_REQUESTS_JITTER', 50)),
+        help='Случайная добавка к лимиту запросов, чтобы рабочие не '
+             'перезапускались одновременно')
+    parser.add_argument(
+        '--graceful-timeout', type=float, default=30,
+        help='Время на завершение текущих запросов при остановке, в секундах')
+    parser.add_argument(
+        '--timeout', type=float,
+        default=float(os.environ.get('MED_TIMEOUT', WorkerRequestHandler.timeout)),
+        help='Время ожидания запроса от клиента и отправки ответа, в секундах')
+    parser.add_argument(
+        '--backlog', type=int, default=2048, help='Длина очереди соединений')
+
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    options = parser.parse_args(argv)
+    WorkerRequestHandler.timeout = options.timeout
+    application = load_application()
+    error = check_shared_caches(options.workers)
+    if error:
+        parser.error(error)
+    sock = create_socket(options.bind, options.backlog)
+
+    Arbiter(
+        application, sock, options.workers, options.max_requests,
+        options.max_requests_jitter, options.graceful_timeout,
+    ).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -46,6 +46,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'reception.middleware.StaticAssetsMiddleware',
+    'reception.middleware.MetricsMiddleware',
+    'reception.middleware.QueryInspectorMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,7 +63,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -68,23 +70,214 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Скомпилированные шаблоны хранятся в памяти процесса,
+            # прогреваются при старте в reception.apps
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'med.wsgi.application'
 
+ASGI_APPLICATION = 'med.asgi.application'
+
+# Асинхронные представления свободного времени и потока занятости,
+# включаются в med/asgi.py
+RECEPTION_ASYNC_VIEWS = os.environ.get('MED_ASYNC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/1.10/ref/settings/#databases
 
+# SQLite не поддерживает SELECT ... FOR UPDATE, поэтому транзакции начинаются
+# с BEGIN IMMEDIATE: запись сериализуется с начала транзакции, и проверка
+# пересечения приемов перед сохранением не гонится с другой записью
+SQLITE_OPTIONS = {'transaction_mode': 'IMMEDIATE'}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': SQLITE_OPTIONS,
     }
 }
 
+# Реплики для чтения, пути к файлам через запятую в MED_REPLICA_DBS.
+# Для локальной проверки реплики синхронизируются командой sync_replicas.
+for number, name in enumerate(
+        filter(None, os.environ.get('MED_REPLICA_DBS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Алиасы реплик, на которые направляется чтение занятости и отчетов
+RECEPTION_READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# Шарды с карточками приема врачей, пути к файлам через запятую в
+# MED_SHARD_DBS. Без шардов все данные хранятся в default
+for number, name in enumerate(
+        filter(None, os.environ.get('MED_SHARD_DBS', '').split(',')), 1):
+    DATABASES[f'shard{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': SQLITE_OPTIONS,
+    }
+
+RECEPTION_SHARDS = [alias for alias in DATABASES if alias.startswith('shard')]
+
+DATABASE_ROUTERS = ['reception.routers.ShardRouter', 'reception.routers.ReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# Каталог общих для процессов кешей: справочника врачей, календарей и
+# занятости врачей. Без него кеши локальные для процесса, и изменение,
+# сделанное в одном процессе, другие процессы не видят до истечения записей.
+# med.prefork задает его сам, для нескольких машин используйте общий сервер
+# кеша (Memcached, Redis)
+CACHE_DIR = os.environ.get('MED_CACHE_DIR')
+
+if CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(CACHE_DIR, 'default'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+        'free_time': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(CACHE_DIR, 'free-time'),
+            'TIMEOUT': 3600,
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        # Общий кеш занятости врачей
+        'free_time': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'free-time',
+            'TIMEOUT': 3600,
+        },
+    }
+
+# Состояние ограничения частоты запросов, общее для процессов на одной
+# машине. Файловый кеш при каждой записи перечисляет файлы каталога, а сверх
+# MAX_ENTRIES удаляет случайные записи и тем сбрасывает лимиты клиентов,
+# поэтому MAX_ENTRIES должен превышать число одновременно активных клиентов.
+# При большом числе клиентов и для нескольких машин используйте общий
+# сервер кеша (Memcached, Redis)
+CACHES['throttle'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.environ.get(
+        'MED_THROTTLE_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'throttle')),
+    'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('MED_THROTTLE_CACHE_MAX_ENTRIES', 10000))},
+}
+
+# Алиас общего кеша занятости врачей
+RECEPTION_FREE_TIME_CACHE_ALIAS = 'free_time'
+
+# Размер локального LRU-кеша занятости врачей в каждом процессе
+RECEPTION_FREE_TIME_CACHE_SIZE = 1024
+
+# Время жизни записей локального кеша занятости врачей, в секундах
+RECEPTION_FREE_TIME_LOCAL_TTL = 2
+
+# Время жизни брони часа приема, в секундах
+RECEPTION_SLOT_HOLD_TTL = 120
+
+# Число пациентов с одного адреса, которые одновременно держат брони часов.
+# Учитывается в кеше RECEPTION_THROTTLE_CACHE_ALIAS
+RECEPTION_SLOT_HOLDS_PER_CLIENT = 10
+
+# Предел подсчета записей в списке карточек приема админки
+RECEPTION_ADMIN_COUNT_LIMIT = 10000
+
+# Время кеширования отрисованной формы записи и страницы успешной записи,
+# в секундах
+RECEPTION_PAGE_CACHE_TIMEOUT = 3600
+
+# Число ближайших рабочих дней, занятость врачей на которые загружается
+# в кеш при прогреве процесса
+RECEPTION_WARMUP_DAYS = 5
+
+# Каталог, через который процессы обмениваются метриками для /metrics.
+# Без него /metrics отдает метрики только обработавшего запрос процесса
+RECEPTION_METRICS_DIR = os.environ.get('MED_METRICS_DIR')
+
+# Как часто процесс сохраняет свои метрики в каталог, в секундах
+RECEPTION_METRICS_FLUSH_INTERVAL = 1
+
+# Адреса клиентов, которым доступен /metrics, через запятую в
+# MED_METRICS_ALLOWED_IPS. Адрес определяется как для ограничения частоты
+# запросов. Сотрудникам (is_staff) /metrics доступен с любого адреса
+RECEPTION_METRICS_ALLOWED_IPS = list(filter(
+    None, os.environ.get('MED_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')))
+
+# Поиск N+1 запросов и проверка бюджетов запросов из med/urls.py на каждом
+# запросе: False - выключены, True - проблемы пишутся в лог, 'raise' - исключение
+RECEPTION_QUERY_INSPECTION = DEBUG
+
+# Сколько одинаковых по виду SQL-запросов за запрос считается N+1
+RECEPTION_NPLUSONE_THRESHOLD = 5
+
+# Часы работы клиники по дням недели (0 - понедельник): начало и окончание.
+# Врачи без своего расписания принимают в часы работы клиники. Часы должны
+# укладываться в часы приема reception.slots.WORKING_HOURS (09:00 - 18:00),
+# это проверяет manage.py check
+RECEPTION_CLINIC_HOURS = {
+    0: ('09:00', '18:00'),
+    1: ('09:00', '18:00'),
+    2: ('09:00', '18:00'),
+    3: ('09:00', '18:00'),
+    4: ('09:00', '18:00'),
+}
+
+# На сколько дней вперед рассчитывается календарь часов приема
+RECEPTION_CALENDAR_DAYS = 365
+
+# Ограничение частоты запросов одного клиента по группам представлений:
+# скорость пополнения ведра в запросах в секунду и вместимость ведра
+RECEPTION_THROTTLE_RATES = {
+    'free-time': (5, 30),
+    # Сетка и поиск ближайших часов читают занятость многих врачей и дней
+    'free-time-grid': (1, 10),
+    'earliest': (1, 10),
+    'hold': (0.5, 10),
+}
+
+# Кеш состояния ограничения частоты запросов. Чтобы ограничение действовало
+# на все рабочие процессы, кеш должен быть общим для них: med.prefork
+# не запускает несколько рабочих процессов с локальным кешем
+RECEPTION_THROTTLE_CACHE_ALIAS = 'throttle'
+
+# Заголовок с адресом клиента, который выставляет обратный прокси,
+# например, 'HTTP_X_REAL_IP'. Без него используется REMOTE_ADDR
+RECEPTION_THROTTLE_CLIENT_HEADER = os.environ.get('MED_THROTTLE_CLIENT_HEADER')
+
+# Брокер, через который изменения занятости передаются в потоки событий.
+# reception.events.LocalBroker доставляет их только в потоки своего процесса
+RECEPTION_EVENTS_BROKER = 'reception.events.LocalBroker'
+
+# Интервал комментариев в потоке событий без изменений, в секундах
+RECEPTION_EVENTS_KEEPALIVE = 15
+
+# Время, через которое поток событий завершается, в секундах
+RECEPTION_EVENTS_MAX_AGE = 600
+
+# Пауза перед переподключением браузера к потоку событий, в миллисекундах
+RECEPTION_EVENTS_RETRY = 3000
+
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 
@@ -126,7 +319,35 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
-STATIC_ROOT = os.path.join(BASE_DIR, 'reception/static/')
+STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 STATICFILES_DIRS = ()
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'reception.storage.BundleManifestStorage',
+    },
+}
+
+# Бандлы статики: имя склеенного файла и исходные файлы в порядке подключения
+RECEPTION_ASSET_BUNDLES = {
+    'css/reception.css': [
+        'css/bootstrap-theme.min.css',
+        'css/bootstrap-datetimepicker.min.css',
+        'bootstrap_datepicker_plus/css/datepicker-widget.css',
+        'css/style.css',
+    ],
+    # Библиотеки, которые нужны до подключения bootstrap
+    'js/vendor.js': [
+        'js/jquery.min.js',
+        'js/moment-with-locales.min.js',
+        'js/bootstrap-datetimepicker.min.js',
+    ],
+    'js/reception.js': [
+        'bootstrap_datepicker_plus/js/datepicker-widget.js',
+        'js/new-reception.js',
+    ],
+}
@@ -13,18 +13,70 @@ Including another URLconf
     1. Import the include() function: from django.conf.urls import url, include
     2. Add a URL to urlpatterns:  url(r'^blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.urls import include, re_path
 from django.contrib import admin
 
 from reception.views import (
-    CreateReception, CreateReceptionRedirectView, reception_success,
-    doctor_free_times)
+    CreateReception, CreateReceptionRedirectView,
+    reception_success, adoctor_free_times, doctor_free_times,
+    doctors_free_time_grid, earliest_free_times, export_receptions,
+    free_time_events, hold_slot, metrics_view, ready, search_doctors)
+
+if settings.RECEPTION_ASYNC_VIEWS:
+    free_time_choices = adoctor_free_times
+else:
+    free_time_choices = doctor_free_times
 
 urlpatterns = [
     re_path(r'^admin/', admin.site.urls),
 
-    re_path(r'^$', CreateReceptionRedirectView.as_view()),
-    re_path(r'^reception/new/', CreateReception.as_view()),
-    re_path(r'^reception/success/', reception_success),
-    re_path(r'^reception/get-free-time-choices/', doctor_free_times)
+    re_path(r'^$', CreateReceptionRedirectView.as_view(), name='index'),
+    re_path(r'^ready/?$', ready, name='ready'),
+    re_path(r'^metrics/?$', metrics_view, name='metrics'),
+    re_path(r'^reception/new/', CreateReception.as_view(), name='reception-new'),
+    re_path(r'^reception/success/', reception_success, name='reception-success'),
+    re_path(r'^reception/get-free-time-choices/', free_time_choices, name='free-time-choices'),
+    re_path(r'^reception/free-time-events/', free_time_events, name='free-time-events'),
+    re_path(r'^reception/get-free-time-grid/', doctors_free_time_grid, name='free-time-grid'),
+    re_path(r'^reception/get-earliest-free-time/', earliest_free_times, name='earliest-free-time'),
+    re_path(r'^reception/hold-slot/', hold_slot, name='hold-slot'),
+    re_path(r'^reception/doctors/search/', search_doctors, name='doctors-search'),
+    re_path(r'^reception/export/', export_receptions, name='export'),
 ]
+
+# Предельное число SQL-запросов на один запрос по имени маршрута, для админки -
+# по пространству имен. Бюджет - число запросов плана маршрута при пустых
+# кешах, точки сохранения транзакций тоже считаются. Соблюдение бюджетов
+# проверяется тестами
+QUERY_BUDGETS = {
+    # Сессия, пользователь, журнал действий или счетчик и страница списка;
+    # форма карточки - транзакция, карточка с врачом, тип контента и врач
+    # поля raw_id
+    'admin': 7,
+    'index': 0,
+    'ready': 0,
+    'metrics': 0,
+    # Проверка формы: календари клиники и врача, врач по ключу и его
+    # ForeignKey, пересечения, уникальность, сессия и брони (8). Сохранение
+    # в транзакции: блокировка врача, повторная проверка пересечений,
+    # карточка, блокировка строки индекса, пересчет и запись маски (6 и две
+    # точки сохранения). Снятие броней владельца - выборка и удаление (2)
+    'reception-new': 18,
+    'reception-success': 0,
+    # Индекс занятости, брони и календарь врача
+    'free-time-choices': 3,
+    # Под ASGI - индекс занятости и календарь врача, под WSGI - ни одного
+    'free-time-events': 2,
+    # Календарь клиники, карточки периода, врачи и их календари
+    'free-time-grid': 4,
+    # Календарь клиники, врачи, их календари, брони и индекс занятости
+    'earliest-free-time': 5,
+    # Календарь врача, сессия, индекс занятости; в транзакции - бронь часа,
+    # выборка и удаление броней владельца, удаление и создание брони часа
+    # (5 и две точки сохранения)
+    'hold-slot': 10,
+    'doctors-search': 1,
+    # Сессия, пользователь и карточки с врачами
+    'export': 3,
+}
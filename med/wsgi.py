@@ -1,7 +1,8 @@
 """
 WSGI config for med project.
 
-It exposes the WSGI callable as a module-level variable named ``application``.
+It exposes the WSGI callable as a module-level variable named ``application``
+and warms the process up (URLs, templates, database, caches) before serving.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/1.10/howto/deployment/wsgi/
@@ -14,3 +15,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "med.settings")
 
 application = get_wsgi_application()
+
+from reception.warmup import warm_up  # noqa: E402
+
+warm_up()
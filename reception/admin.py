@@ -1,7 +1,224 @@
+"""Модуль создания карточек на прием к врачу."""
+from django.conf import settings
 from django.contrib import admin
 
-from reception.models import Doctor, Reception
+from reception import sharding
+from reception.export import streaming_export
+from reception.models import (
+    ClinicHoliday, Doctor, DoctorSchedule, Reception, ReceptionArchive,
+    ScheduleException)
+from reception.paginators import KeysetPaginator
+from reception.routers import read_from_replica
 
+# Параметр запроса с курсором страницы списка карточек
+CURSOR_VAR = 'after'
 
-admin.site.register(Doctor)
-admin.site.register(Reception)
+# Параметр запроса с шардом списка карточек
+SHARD_VAR = 'shard'
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """Выбор шарда, карточки которого выводятся в списке.
+
+    Выводится только при шардировании, карточки выбираются в шарде
+    маршрутизатором, поэтому фильтр не меняет запрос.
+    """
+
+    title = 'шард'
+    parameter_name = SHARD_VAR
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in sharding.get_shards()]
+
+    def queryset(self, request, queryset):
+        return queryset
+
+    def choices(self, changelist):
+        current = get_shard(changelist.params)
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == current,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+
+def get_shard(params, object_id=None):
+    """Возвращает шард карточек страницы администрирования.
+
+    Шард выбирается по идентификатору карточки, параметру ``shard``,
+    врачу в фильтре списка или в форме, иначе это первый шард.
+
+    :param params: Параметры запроса
+    :type params: dict
+    :param object_id: Идентификатор карточки
+    :type object_id: str or None
+
+    :rtype str or None
+    """
+    shards = sharding.get_shards()
+    if not shards:
+        return None
+    if object_id is not None:
+        return sharding.shard_for_pk(object_id)
+    if params.get(SHARD_VAR) in shards:
+        return params[SHARD_VAR]
+
+    doctor_id = params.get('doctor') or params.get('doctor__id__exact')
+    try:
+        alias = sharding.shard_for(int(doctor_id))
+    except (TypeError, ValueError):
+        alias = None
+
+    return alias or shards[0]
+
+
+class ShardAdminMixin:
+    """Направляет запросы страниц администрирования карточек в их шард."""
+
+    def using_request_shard(self, request, object_id=None):
+        params = {**request.GET.dict(), **request.POST.dict()}
+        return sharding.using_shard(get_shard(params, object_id))
+
+    def changelist_view(self, request, extra_context=None):
+        with self.using_request_shard(request):
+            return super().changelist_view(request, extra_context)
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        with self.using_request_shard(request, object_id):
+            return super().changeform_view(request, object_id, form_url, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        with self.using_request_shard(request, object_id):
+            return super().delete_view(request, object_id, extra_context)
+
+    def history_view(self, request, object_id, extra_context=None):
+        with self.using_request_shard(request, object_id):
+            return super().history_view(request, object_id, extra_context)
+
+
+class KeysetAdminMixin:
+    """Список с переходом на следующую страницу по курсору без OFFSET.
+
+    Полное количество записей не считается, а количество в списке
+    ограничено ``RECEPTION_ADMIN_COUNT_LIMIT``.
+    """
+
+    show_full_result_count = False
+    paginator = KeysetPaginator
+
+    def changelist_view(self, request, extra_context=None):
+        # Курсор не является фильтром списка, убираем его из параметров
+        # до построения ChangeList
+        if CURSOR_VAR in request.GET:
+            request.GET = request.GET.copy()
+            request.reception_cursor = request.GET.pop(CURSOR_VAR)[-1]
+
+        return super().changelist_view(request, extra_context)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, cursor=getattr(request, 'reception_cursor', None),
+            count_limit=settings.RECEPTION_ADMIN_COUNT_LIMIT, orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page)
+
+
+class DoctorScheduleInline(admin.TabularInline):
+    """Недельное расписание врача."""
+
+    model = DoctorSchedule
+    extra = 0
+
+
+class ScheduleExceptionInline(admin.TabularInline):
+    """Исключения из расписания врача."""
+
+    model = ScheduleException
+    extra = 0
+
+
+@admin.register(Doctor)
+class DoctorAdmin(admin.ModelAdmin):
+    """Администрирование врачей."""
+
+    list_display = 'surname', 'name', 'patronymic'
+    inlines = DoctorScheduleInline, ScheduleExceptionInline
+    search_fields = 'surname', 'name', 'patronymic'
+    # Без поиска полное количество совпадает с отфильтрованным, второй
+    # COUNT не нужен
+    show_full_result_count = False
+
+
+@admin.register(Reception)
+class ReceptionAdmin(KeysetAdminMixin, ShardAdminMixin, admin.ModelAdmin):
+    """Администрирование карточек приема.
+
+    Список карточек рассчитан на большие таблицы: врач загружается тем же
+    запросом, полное количество записей не считается, а переход на
+    следующую страницу выполняется по курсору (date, time, id) без OFFSET.
+    При шардировании список выводит карточки одного шарда.
+
+    Фильтры не читают таблицы: иерархия дат и фильтр по врачу выбирали бы
+    все даты карточек и всех врачей. Даты фильтруются диапазоном по индексу
+    (date, time, id), карточки врача - параметром ``doctor__id__exact``.
+    """
+
+    list_display = 'date', 'time', 'duration', 'doctor', 'fio'
+    list_filter = ShardListFilter, ('date', admin.DateFieldListFilter)
+    ordering = 'date', 'time', 'id'
+    raw_id_fields = 'doctor',
+    actions = ['export_csv', 'export_jsonl']
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+
+        # Просмотр списка только читает данные, его можно отдать реплике
+        with read_from_replica():
+            return super().changelist_view(request, extra_context)
+
+    def get_queryset(self, request):
+        # Столбец списка и название карточки в форме включают ФИО врача,
+        # загружаем его тем же запросом
+        return super().get_queryset(request).select_related('doctor')
+
+    @admin.action(description='Выгрузить выбранные карточки в CSV')
+    def export_csv(self, request, queryset):
+        return streaming_export(queryset, 'csv')
+
+    @admin.action(description='Выгрузить выбранные карточки в JSONL')
+    def export_jsonl(self, request, queryset):
+        return streaming_export(queryset, 'jsonl')
+
+
+@admin.register(ReceptionArchive)
+class ReceptionArchiveAdmin(KeysetAdminMixin, ShardAdminMixin, admin.ModelAdmin):
+    """Просмотр архивных карточек приема, только чтение.
+
+    Архив только растет, поэтому список листается по курсору, как список
+    карточек, а поиск идет по началу ФИО, чтобы использовать индекс.
+    """
+
+    list_display = 'date', 'time', 'duration', 'doctor', 'fio', 'archived_at'
+    list_select_related = 'doctor',
+    list_filter = ShardListFilter, ('date', admin.DateFieldListFilter)
+    search_fields = '^fio', '^doctor__surname'
+    ordering = '-date', '-time', '-id'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ClinicHoliday)
+class ClinicHolidayAdmin(admin.ModelAdmin):
+    """Администрирование праздничных дней клиники."""
+
+    list_display = 'date', 'name'
+    date_hierarchy = 'date'
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ReceptionConfig(AppConfig):
     name = 'reception'
     verbose_name = 'Запись на прием'
+
+    def ready(self):
+        from reception import checks, signals  # noqa: F401
@@ -0,0 +1,119 @@
+"""Микробенчмарки горячих путей записи на прием.
+
+Модуль содержит генератор синтетических данных и функцию замера, которая
+для каждого сценария собирает задержки (p50/p95/p99) и количество запросов
+к БД. Запускается командой ``manage.py bench_reception``.
+"""
+import datetime
+import random
+import statistics
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reception import schedule, sharding, slots
+from reception.models import Doctor, Reception
+from reception.signals import days_changed
+
+
+def working_days(start, weeks):
+    """Возвращает рабочие дни ``weeks`` недель начиная с ``start``."""
+    return schedule.clinic_days([
+        start + datetime.timedelta(days=i) for i in range(weeks * 7)])
+
+
+def generate_data(doctors, weeks, fill_rate, start=None, seed=0):
+    """Создает врачей и карточки приема с заданной заполненностью.
+
+    :param doctors: Количество врачей
+    :type doctors: int
+    :param weeks: Количество недель расписания
+    :type weeks: int
+    :param fill_rate: Доля занятых часов приема от 0 до 1
+    :type fill_rate: float
+    :param start: Первый день расписания, по умолчанию следующий понедельник
+    :type start: datetime.date
+    :param seed: Зерно генератора случайных чисел
+    :type seed: int
+
+    :return Свободные часы приема (врач, дата, время)
+    :rtype list of tuple
+    """
+    rnd = random.Random(seed)
+    if start is None:
+        today = datetime.date.today()
+        start = today + datetime.timedelta(days=7 - today.weekday())
+
+    shards = sharding.get_shards()
+    created = Doctor.objects.bulk_create(
+        Doctor(name=f'Имя {i}', surname=f'Фамилия {i}', patronymic=f'Отчество {i}',
+               shard=shards[i % len(shards)] if shards else '')
+        for i in range(doctors))
+    sharding.mirror_doctors(created)
+    doctor_ids = [doctor.id for doctor in created]
+
+    receptions, free, days = [], [], set()
+    for doctor_id in doctor_ids:
+        for day in working_days(start, weeks):
+            for hour in slots.WORKING_HOURS:
+                time_ = datetime.time(hour)
+                if rnd.random() < fill_rate:
+                    receptions.append(Reception(
+                        doctor_id=doctor_id, date=day, time=time_,
+                        fio='Иванов Иван Иванович'))
+                    days.add((doctor_id, day))
+                else:
+                    free.append((doctor_id, day, time_))
+
+    def save(shard_doctor_ids):
+        shard_doctor_ids = set(shard_doctor_ids)
+        Reception.objects.bulk_create(
+            [reception for reception in receptions if reception.doctor_id in shard_doctor_ids],
+            batch_size=1000)
+        days_changed({day for day in days if day[0] in shard_doctor_ids})
+
+    sharding.fan_out(save, doctor_ids)
+    rnd.shuffle(free)
+
+    return free
+
+
+def percentile(values, percent):
+    """Возвращает перцентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    rank = max(1, -(-len(values) * percent // 100))
+
+    return values[rank - 1]
+
+
+def measure(func, iterations, setup=None):
+    """Замеряет задержку и количество запросов к БД сценария.
+
+    :param func: Сценарий, вызывается с номером итерации
+    :type func: callable
+    :param iterations: Количество итераций
+    :type iterations: int
+    :param setup: Подготовка перед каждой итерацией, не входит в замер
+    :type setup: callable or None
+
+    :rtype dict
+    """
+    latencies, queries = [], []
+    for i in range(iterations):
+        if setup is not None:
+            setup(i)
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            func(i)
+            latencies.append(time.perf_counter() - started)
+        queries.append(len(context.captured_queries))
+
+    return {
+        'iterations': iterations,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'queries': statistics.fmean(queries),
+    }
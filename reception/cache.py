@@ -0,0 +1,211 @@
+"""Кеш занятости врачей для представления свободного времени приема.
+
+Кеш двухуровневый: локальный LRU-кеш процесса ограниченного размера и общий
+кеш Django (``settings.RECEPTION_FREE_TIME_CACHE_ALIAS``), разделяемый между
+процессами. Записи сбрасываются сигналами сохранения и удаления карточек
+приема. Сигнал сбрасывает локальный кеш только в своем процессе, поэтому
+записи локального кеша живут не дольше ``RECEPTION_FREE_TIME_LOCAL_TTL``
+секунд.
+
+Сброс может произойти, пока значение загружается из БД, и тогда загруженное
+значение уже устарело. Поэтому у каждого ключа в общем кеше есть поколение,
+которое сброс увеличивает. Значение сохраняется вместе с поколением,
+прочитанным до загрузки, и при чтении принимается, только если поколение
+не изменилось.
+
+Брони часов кешируются отдельно в ``hold_cache`` со своими ключами и
+поколениями: бронь может так и не стать записью, поэтому она не меняет
+индекс занятости, его версию и ETag, построенный по версии.
+"""
+import collections
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class FreeTimeCache:
+    """Двухуровневый кеш масок занятости врачей по ключу (врач, дата)."""
+
+    def __init__(self, key_prefix='free-time'):
+        self.key_prefix = key_prefix
+        self._local = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # Число сбросов в процессе: значение, при загрузке которого был
+        # сброс, в локальный кеш не попадает
+        self._epoch = 0
+        self.reset_stats()
+
+    @property
+    def shared(self):
+        """Общий кеш Django."""
+        return caches[settings.RECEPTION_FREE_TIME_CACHE_ALIAS]
+
+    def make_key(self, doctor_id, date):
+        """Возвращает ключ кеша для врача и даты."""
+        return f'{self.key_prefix}:{doctor_id}:{date.isoformat()}'
+
+    def generation_key(self, key):
+        """Возвращает ключ поколения значений ключа ``key``."""
+        return f'{key}:generation'
+
+    def get(self, doctor_id, date, loader):
+        """Возвращает значение из кеша, загружая его при промахе.
+
+        :param doctor_id: Идентификатор врача
+        :type doctor_id: int
+        :param date: Дата
+        :type date: datetime.date
+        :param loader: Функция загрузки значения по врачу и дате
+        :type loader: callable
+        """
+        key = self.make_key(doctor_id, date)
+
+        value = self._get_local(key)
+        if value is not None:
+            self.stats['local_hits'] += 1
+            return value
+
+        epoch = self._epoch
+        generation_key = self.generation_key(key)
+        entries = self.shared.get_many([key, generation_key])
+        generation = entries.get(generation_key)
+        value = self._unpack(entries.get(key), generation)
+        if value is not None:
+            self.stats['shared_hits'] += 1
+        else:
+            self.stats['misses'] += 1
+            if generation is None:
+                self.shared.add(generation_key, self._new_generation())
+                generation = self.shared.get(generation_key)
+            value = loader(doctor_id, date)
+            self.shared.set(key, (generation, value))
+
+        self._set_local(key, value, epoch)
+
+        return value
+
+    async def aget(self, doctor_id, date, loader):
+        """Асинхронная версия ``get`` с асинхронной функцией загрузки."""
+        key = self.make_key(doctor_id, date)
+
+        value = self._get_local(key)
+        if value is not None:
+            self.stats['local_hits'] += 1
+            return value
+
+        epoch = self._epoch
+        generation_key = self.generation_key(key)
+        entries = await self.shared.aget_many([key, generation_key])
+        generation = entries.get(generation_key)
+        value = self._unpack(entries.get(key), generation)
+        if value is not None:
+            self.stats['shared_hits'] += 1
+        else:
+            self.stats['misses'] += 1
+            if generation is None:
+                await self.shared.aadd(generation_key, self._new_generation())
+                generation = await self.shared.aget(generation_key)
+            value = await loader(doctor_id, date)
+            await self.shared.aset(key, (generation, value))
+
+        self._set_local(key, value, epoch)
+
+        return value
+
+    def prime(self, keys, loader):
+        """Заполняет общий кеш значениями, загруженными одной функцией.
+
+        :param keys: Ключи (врач, дата), которые заполняются
+        :type keys: list of tuple
+        :param loader: Функция без аргументов, возвращающая значения
+                       по ключу (врач, дата)
+        :type loader: callable
+        """
+        generation_keys = {
+            self.generation_key(self.make_key(*key)): key for key in keys}
+        generations = self.shared.get_many(generation_keys)
+        for generation_key in generation_keys.keys() - generations.keys():
+            self.shared.add(generation_key, self._new_generation())
+        generations.update(self.shared.get_many(
+            generation_keys.keys() - generations.keys()))
+
+        values = loader()
+        self.shared.set_many({
+            self.make_key(*generation_keys[generation_key]): (
+                generation, values[generation_keys[generation_key]])
+            for generation_key, generation in generations.items()
+            if generation_keys[generation_key] in values})
+
+    def invalidate(self, doctor_id, date):
+        """Удаляет значение для врача и даты из обоих уровней кеша."""
+        key = self.make_key(doctor_id, date)
+        with self._lock:
+            self._local.pop(key, None)
+            self._epoch += 1
+        try:
+            self.shared.incr(self.generation_key(key))
+        except ValueError:
+            # Поколения нет: значения с прежним поколением уже не примутся
+            pass
+        self.shared.delete(key)
+        self.stats['invalidations'] += 1
+
+    def clear(self):
+        """Очищает оба уровня кеша."""
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def reset_stats(self):
+        """Обнуляет счетчики кеша."""
+        self.stats = collections.Counter(
+            local_hits=0, shared_hits=0, misses=0, evictions=0,
+            invalidations=0)
+
+    @staticmethod
+    def _new_generation():
+        # Случайное начальное поколение: после вытеснения ключа поколения
+        # значения с прежним поколением не совпадут с новым
+        return random.getrandbits(62)
+
+    @staticmethod
+    def _unpack(entry, generation):
+        """Возвращает значение записи общего кеша, если его поколение актуально."""
+        if entry is None or generation is None:
+            return None
+
+        entry_generation, value = entry
+        return value if entry_generation == generation else None
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._local[key]
+                return None
+
+            self._local.move_to_end(key)
+            return value
+
+    def _set_local(self, key, value, epoch):
+        expires = time.monotonic() + settings.RECEPTION_FREE_TIME_LOCAL_TTL
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._local[key] = value, expires
+            self._local.move_to_end(key)
+            while len(self._local) > settings.RECEPTION_FREE_TIME_CACHE_SIZE:
+                self._local.popitem(last=False)
+                self.stats['evictions'] += 1
+
+
+free_time_cache = FreeTimeCache()
+
+hold_cache = FreeTimeCache('slot-holds')
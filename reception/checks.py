@@ -0,0 +1,38 @@
+"""Проверки настроек приложения при запуске (``manage.py check``)."""
+import datetime
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+from reception import slots
+
+
+@register()
+def check_clinic_hours(app_configs, **kwargs):
+    """Проверяет, что часы работы клиники укладываются в часы приема.
+
+    Календарь хранит только часы ``slots.WORKING_HOURS``, поэтому часы
+    работы клиники вне их были бы молча отброшены.
+    """
+    first = datetime.time(slots.WORKING_HOURS[0])
+    last = datetime.time(slots.WORKING_HOURS[-1] + 1)
+    errors = []
+    for weekday, hours in settings.RECEPTION_CLINIC_HOURS.items():
+        try:
+            start_time, end_time = map(datetime.time.fromisoformat, hours)
+        except (TypeError, ValueError):
+            start_time = end_time = None
+
+        if weekday not in range(7) or start_time is None:
+            errors.append(Error(
+                f'Некорректные часы работы клиники {weekday!r}: {hours!r}',
+                hint='Ключ - день недели от 0 до 6, значение - начало и окончание ЧЧ:ММ',
+                obj='RECEPTION_CLINIC_HOURS', id='reception.E001'))
+        elif not first <= start_time < end_time <= last:
+            errors.append(Error(
+                f'Часы работы клиники в день {weekday} {hours[0]}-{hours[1]} '
+                f'выходят за часы приема {first:%H:%M}-{last:%H:%M}',
+                hint='Часы приема задаются в reception.slots.WORKING_HOURS',
+                obj='RECEPTION_CLINIC_HOURS', id='reception.E002'))
+
+    return errors
@@ -0,0 +1,130 @@
+"""Кешированный справочник врачей и поиск врача по началу ФИО.
+
+Список врачей для поиска хранится в кеше Django под ключом с версией
+справочника. Версия увеличивается при каждом изменении врачей, поэтому
+устаревший список читается, только пока процессы видят прежнюю версию. Чтобы
+изменение видели все рабочие процессы, кеш ``default`` должен быть общим
+(``MED_CACHE_DIR`` или сервер кеша), с локальным кешем другие процессы
+отдают прежний список, пока их кеш не очистится. Начальная версия случайная:
+если ключ версии вытеснен из кеша, новая версия не совпадет с версией
+оставшихся в кеше списков. Для поиска в памяти процесса строится префиксный
+индекс по фамилии, имени и отчеству, который перестраивается при смене
+версии.
+"""
+import bisect
+import random
+import threading
+
+from django.core.cache import cache
+
+VERSION_KEY = 'doctors:version'
+
+
+def get_version():
+    """Возвращает текущую версию справочника врачей."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        cache.add(VERSION_KEY, version, timeout=None)
+        version = cache.get(VERSION_KEY, version)
+
+    return version
+
+
+def bump_version():
+    """Увеличивает версию справочника врачей."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, _new_version(), timeout=None)
+
+
+def _new_version():
+    return random.getrandbits(62)
+
+
+def get_choices():
+    """Возвращает список врачей в виде пар (идентификатор, ФИО).
+
+    :rtype list of tuple
+    """
+    from reception.models import Doctor
+
+    key = f'doctors:choices:{get_version()}'
+    choices = cache.get(key)
+    if choices is None:
+        choices = [
+            (id_, f'{surname} {name} {patronymic}')
+            for id_, surname, name, patronymic in Doctor.objects.order_by(
+                'surname', 'name', 'patronymic', 'id'
+            ).values_list('id', 'surname', 'name', 'patronymic')
+        ]
+        cache.set(key, choices, timeout=None)
+
+    return choices
+
+
+def normalize(text):
+    """Приводит текст к виду для поиска."""
+    return text.lower().replace('ё', 'е')
+
+
+class PrefixIndex:
+    """Префиксный индекс врачей по словам ФИО."""
+
+    def __init__(self, choices):
+        self.labels = dict(choices)
+        self.order = {id_: position for position, (id_, _) in enumerate(choices)}
+        self.tokens = sorted(
+            (normalize(word), id_)
+            for id_, label in choices for word in label.split())
+        self.words = [word for word, _ in self.tokens]
+
+    def ids_by_prefix(self, prefix):
+        """Возвращает идентификаторы врачей со словом ФИО на ``prefix``."""
+        start = bisect.bisect_left(self.words, prefix)
+        end = bisect.bisect_left(self.words, prefix + '￿', start)
+
+        return {id_ for _, id_ in self.tokens[start:end]}
+
+    def search(self, query, limit=20):
+        """Ищет врачей, у которых каждое слово запроса начинает слово ФИО.
+
+        :rtype list of tuple
+        """
+        words = normalize(query).split()
+        if not words:
+            return []
+
+        ids = self.ids_by_prefix(words[0])
+        for word in words[1:]:
+            ids &= self.ids_by_prefix(word)
+
+        return [
+            (id_, self.labels[id_])
+            for id_ in sorted(ids, key=self.order.__getitem__)[:limit]
+        ]
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Возвращает префиксный индекс текущей версии справочника."""
+    global _index, _index_version
+
+    version = get_version()
+    if _index_version != version:
+        with _index_lock:
+            if _index_version != version:
+                _index = PrefixIndex(get_choices())
+                _index_version = version
+
+    return _index
+
+
+def search(query, limit=20):
+    """Ищет врачей по началу слов ФИО."""
+    return get_index().search(query, limit)
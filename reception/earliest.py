@@ -0,0 +1,176 @@
+"""Поиск ближайших свободных часов приема у врачей.
+
+Свободный час - это час приема врача по календарю, который не занят по
+индексу ``DoctorDaySlots`` и не забронирован другим пациентом. Строки
+индекса за весь горизонт читаются одним запросом, упорядоченным по дате,
+и просматриваются вместе с датами горизонта: дни, в которые клиника не
+работает, пропускаются, а чтение прекращается, как только найдено нужное
+число часов. Поэтому число запросов не зависит от длины горизонта и числа
+врачей, а время поиска по полностью занятому горизонту ограничено одним
+проходом по строкам индекса.
+
+При шардировании строки индекса читаются из каждого шарда своим запросом,
+упорядоченным по дате, и объединяются слиянием.
+"""
+import datetime
+import heapq
+import operator
+
+from django.utils import timezone
+
+from reception import doctors, schedule, sharding, slots
+
+# Число строк индекса, читаемых из БД за раз
+CHUNK_SIZE = 2000
+
+
+def passed_mask(now):
+    """Возвращает маску часов, начало которых уже прошло.
+
+    :param now: Текущее время
+    :type now: datetime.datetime
+
+    :rtype int
+    """
+    mask = 0
+    for slot, hour in enumerate(slots.WORKING_HOURS):
+        if hour <= now.hour:
+            mask |= 1 << slot
+
+    return mask
+
+
+def held_masks(doctor_ids, dates, owner=None):
+    """Возвращает маски часов, забронированных не владельцем ``owner``.
+
+    :param doctor_ids: Идентификаторы врачей, None - все врачи
+    :type doctor_ids: list of int or None
+    :param dates: Даты по возрастанию
+    :type dates: list of datetime.date
+    :param owner: Ключ сессии, чьи брони не учитываются
+    :type owner: str or None
+
+    :return Маски по ключу (врач, дата)
+    :rtype dict
+    """
+    from reception.models import SlotHold
+
+    def shard_held(shard_doctor_ids):
+        held = SlotHold.objects.filter(
+            date__range=(dates[0], dates[-1]), expires_at__gt=timezone.now())
+        if shard_doctor_ids is not None:
+            held = held.filter(doctor__in=shard_doctor_ids)
+        if owner is not None:
+            held = held.exclude(owner=owner)
+        return list(held.values_list('doctor_id', 'date', 'time'))
+
+    masks = {}
+    for rows in sharding.fan_out(shard_held, doctor_ids):
+        for doctor_id, date, time in rows:
+            slot = slots.time_to_slot(time)
+            if slot is not None:
+                masks[doctor_id, date] = masks.get((doctor_id, date), 0) | 1 << slot
+
+    return masks
+
+
+def busy_days(doctor_ids, dates):
+    """Возвращает маски занятости врачей, сгруппированные по датам.
+
+    Строки индекса читаются одним запросом частями по ``CHUNK_SIZE``,
+    поэтому после остановки перебора оставшиеся строки не читаются.
+
+    :param doctor_ids: Идентификаторы врачей, None - все врачи
+    :type doctor_ids: list of int or None
+    :param dates: Даты по возрастанию
+    :type dates: list of datetime.date
+
+    :return Пары (дата, маски по врачам) для каждой даты ``dates``
+    :rtype generator
+    """
+    from reception.models import DoctorDaySlots
+
+    def shard_rows(alias, shard_doctor_ids):
+        rows = DoctorDaySlots.objects.filter(
+            date__range=(dates[0], dates[-1]), busy_mask__gt=0)
+        if shard_doctor_ids is not None:
+            rows = rows.filter(doctor__in=shard_doctor_ids)
+        if alias is not None:
+            rows = rows.using(alias)
+        return rows.order_by('date').values_list(
+            'date', 'doctor_id', 'busy_mask').iterator(chunk_size=CHUNK_SIZE)
+
+    rows = heapq.merge(
+        *(shard_rows(alias, shard_doctor_ids)
+          for alias, shard_doctor_ids in sharding.group_by_shard(doctor_ids).items()),
+        key=operator.itemgetter(0))
+
+    row = next(rows, None)
+    for date in dates:
+        busy = {}
+        # Строки за дни, в которые клиника не работает, пропускаются
+        while row is not None and row[0] <= date:
+            if row[0] == date:
+                busy[row[1]] = row[2]
+            row = next(rows, None)
+        yield date, busy
+
+
+def find_earliest(doctor_ids, start, days, limit, owner=None):
+    """Возвращает ближайшие свободные часы приема врачей.
+
+    :param doctor_ids: Идентификаторы врачей, None - все врачи
+    :type doctor_ids: list of int or None
+    :param start: Первый день поиска
+    :type start: datetime.date
+    :param days: Длина периода поиска в днях
+    :type days: int
+    :param limit: Число часов приема в ответе
+    :type limit: int
+    :param owner: Ключ сессии, чьи брони не учитываются
+    :type owner: str or None
+
+    :return Тройки (дата, время, врач) по возрастанию даты и времени
+    :rtype list of tuple
+    """
+    dates = schedule.clinic_days([
+        start + datetime.timedelta(days=i) for i in range(days)])
+    known = [doctor_id for doctor_id, _ in sorted(doctors.get_choices())]
+    if doctor_ids is not None:
+        requested = set(doctor_ids)
+        known = [doctor_id for doctor_id in known if doctor_id in requested]
+    if not dates or not known or limit <= 0:
+        return []
+
+    calendars = {
+        doctor_id: (calendar_start, schedule.decode(data))
+        for doctor_id, (calendar_start, data, _) in schedule.get_calendars(
+            known, dates[-1]).items()}
+    # Без фильтра по врачам запросы не перечисляют идентификаторы всех врачей
+    filter_ids = known if doctor_ids is not None else None
+    held = held_masks(filter_ids, dates, owner)
+    now = datetime.datetime.now()
+
+    found = []
+    for date, busy in busy_days(filter_ids, dates):
+        unavailable = passed_mask(now) if date == now.date() else 0
+        day = []
+        for doctor_id in known:
+            calendar_start, masks = calendars[doctor_id]
+            position = (date - calendar_start).days
+            if not 0 <= position < len(masks):
+                continue
+            free = masks[position] & ~(
+                busy.get(doctor_id, 0) | held.get((doctor_id, date), 0) | unavailable)
+            day.extend(
+                (slot, doctor_id) for slot in range(len(slots.WORKING_HOURS))
+                if free & (1 << slot))
+
+        day.sort()
+        found.extend(
+            (date, slots.slot_to_time(slot), doctor_id)
+            for slot, doctor_id in day[:limit - len(found)])
+        if len(found) >= limit:
+            break
+
+    return found
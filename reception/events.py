@@ -0,0 +1,145 @@
+"""Рассылка изменений занятости врачей подписчикам потока событий.
+
+Открытая форма записи подписывается на канал врача и даты. После фиксации
+изменения карточек приема в канал публикуется новая маска занятости дня
+с версией строки индекса, а поток событий отправляет клиенту разницу
+с предыдущей маской.
+
+Брокер по умолчанию ``LocalBroker`` рассылает сообщения подписчикам своего
+процесса. Брокер задается в ``settings.RECEPTION_EVENTS_BROKER`` и может
+быть заменен брокером, который доставляет сообщения между процессами, -
+у него должны быть те же методы ``subscribe``, ``unsubscribe``,
+``publish`` и ``has_subscribers``.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def channel(doctor_id, date):
+    """Возвращает имя канала врача и даты."""
+    return f'{doctor_id}:{date.isoformat()}'
+
+
+class Subscription:
+    """Подписка на канал в цикле событий подписчика.
+
+    Подписчику важна только последняя маска занятости, поэтому хранится одно
+    последнее сообщение, а не очередь: память подписки не растет, даже если
+    клиент не успевает читать поток.
+    """
+
+    def __init__(self, channel_name, loop):
+        self.channel = channel_name
+        self.loop = loop
+        self.message = None
+        self.ready = asyncio.Event()
+
+    def deliver(self, message):
+        """Сохраняет сообщение, вызывается в цикле событий подписчика."""
+        self.message = message
+        self.ready.set()
+
+    async def get(self, timeout=None):
+        """Возвращает последнее сообщение или None по истечении ``timeout``."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+        self.ready.clear()
+        message, self.message = self.message, None
+
+        return message
+
+
+class LocalBroker:
+    """Брокер сообщений для подписчиков одного процесса.
+
+    Публиковать можно из любого потока, сообщение передается в цикл событий
+    каждого подписчика.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def subscribe(self, channel_name):
+        """Подписывает текущий цикл событий на канал.
+
+        :rtype reception.events.Subscription
+        """
+        subscription = Subscription(channel_name, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(channel_name, set()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def has_subscribers(self, channel_name):
+        return channel_name in self._subscriptions
+
+    def publish(self, channel_name, message):
+        """Отправляет сообщение всем подписчикам канала."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel_name, ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Цикл событий подписчика уже закрыт
+                self.unsubscribe(subscription)
+
+
+_broker = None
+
+
+def get_broker():
+    """Возвращает брокер из ``settings.RECEPTION_EVENTS_BROKER``."""
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.RECEPTION_EVENTS_BROKER)()
+
+    return _broker
+
+
+def publish_days(days):
+    """Публикует маски занятости измененных дней, на которые есть подписчики.
+
+    Маски читаются из индекса одним запросом на шард, дни без подписчиков
+    не читаются.
+
+    :param days: Пары (идентификатор врача, дата)
+    :type days: iterable of tuple
+    """
+    from reception import sharding
+    from reception.models import DoctorDaySlots
+
+    broker = get_broker()
+    watched = {day for day in days if broker.has_subscribers(channel(*day))}
+    if not watched:
+        return
+
+    def shard_states(doctor_ids):
+        return list(DoctorDaySlots.objects.filter(
+            doctor__in=doctor_ids, date__in={date for _, date in watched},
+        ).values_list('doctor_id', 'date', 'busy_mask', 'version'))
+
+    states = dict.fromkeys(watched, (0, 0))
+    for rows in sharding.fan_out(shard_states, {doctor_id for doctor_id, _ in watched}):
+        for doctor_id, date, mask, version in rows:
+            if (doctor_id, date) in states:
+                states[doctor_id, date] = mask, version
+
+    for (doctor_id, date), (mask, version) in states.items():
+        broker.publish(channel(doctor_id, date), {'busy_mask': mask, 'version': version})
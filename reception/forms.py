@@ -1,16 +1,61 @@
 from django import forms
+from django.utils.choices import BaseChoiceIterator
 
 from bootstrap_datepicker_plus.widgets import DatePickerInput, TimePickerInput
 
-from reception.models import Reception
+from reception import schedule
+from reception.models import Doctor, Reception
+
+
+class DoctorChoiceIterator(BaseChoiceIterator):
+    """Варианты выбора врача: пустой вариант и выбранный врач.
+
+    Остальные врачи подбираются поиском по началу ФИО, поэтому отрисовка
+    формы не зависит от размера справочника.
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield '', self.field.empty_label
+
+        if self.field.selected is not None:
+            yield self.field.selected.pk, str(self.field.selected)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class DoctorChoiceField(forms.ModelChoiceField):
+    """Поле выбора врача поиском, проверяющее врача одним запросом по ключу."""
+
+    iterator = DoctorChoiceIterator
+
+    def __init__(self, *args, **kwargs):
+        self.selected = None
+        super().__init__(*args, **kwargs)
+        self.widget.attrs['data-autocomplete-url'] = '/reception/doctors/search/'
+
+    def to_python(self, value):
+        self.selected = super().to_python(value)
+        return self.selected
 
 
 class ReceptionForm(forms.ModelForm):
-    """"Форма карточки записи на прием к врачу."""
+    """"Форма карточки записи на прием к врачу.
+
+    Выходные и праздничные дни и часы работы в виджетах даты и времени
+    берутся из календаря клиники. Длительность приема пациент не выбирает:
+    она берется из карточки врача.
+    """
+
+    doctor = DoctorChoiceField(queryset=Doctor.objects.all(), label='К врачу')
 
     class Meta:
         model = Reception
-        fields = '__all__'
+        fields = 'doctor', 'date', 'time', 'fio'
 
         widgets = {
             'date': DatePickerInput(
@@ -21,9 +66,26 @@ class ReceptionForm(forms.ModelForm):
              'time': TimePickerInput(
                 options={
                     "format": "HH:mm",
-                    "enabledHours": [9, 10, 11, 12, 13, 14, 15, 16, 17],
                     "stepping": 15,
                 }
              )
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        options, self.calendar_version = schedule.picker_options()
+        for name, keys in (('date', ('daysOfWeekDisabled', 'disabledDates')),
+                           ('time', ('enabledHours',))):
+            # Копия виджета поля делит настройки с виджетом класса формы
+            widget = self.fields[name].widget
+            widget.config = widget.config.model_copy(deep=True)
+            widget.config.update_options({key: options[key] for key in keys})
+
+    def clean(self):
+        cleaned_data = super().clean()
+        doctor = cleaned_data.get('doctor')
+        if doctor is not None:
+            self.instance.duration = doctor.duration
+
+        return cleaned_data
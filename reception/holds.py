@@ -0,0 +1,261 @@
+"""Временные брони часов приема.
+
+Пациент, выбравший врача, дату и время, получает бронь часа на
+``settings.RECEPTION_SLOT_HOLD_TTL`` секунд. Пока бронь действует, другие
+пациенты видят этот час занятым и не могут отправить на него форму, поэтому
+при наплыве записей большинство конфликтов отсекается до записи в БД.
+Владелец брони определяется ключом сессии, у владельца одна бронь.
+
+Сессия создается при открытии формы записи, а не при брони, иначе каждый
+запрос брони без cookie создавал бы новую сессию и новую бронь. Число
+владельцев броней с одного адреса ограничено
+``settings.RECEPTION_SLOT_HOLDS_PER_CLIENT``.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, router, transaction
+from django.utils import timezone
+
+from reception import sharding, slots
+from reception.intervals import DEFAULT_DURATION
+
+HOLD_CONFLICT_MESSAGE = 'Это время уже выбрал другой пациент, выберите другое время.'
+
+NO_SESSION_MESSAGE = 'Откройте форму записи, чтобы выбрать время приема.'
+
+CLIENT_HOLDS_MESSAGE = 'Слишком много броней с вашего адреса, повторите позже.'
+
+# Отметка в сессии клиента, открывшего форму записи
+SESSION_KEY = 'reception_form'
+
+
+def start_session(request):
+    """Создает сессию клиента, открывшего форму записи, для его броней.
+
+    Наличие сессии проверяется по cookie без обращения к БД.
+    """
+    if request.session.session_key is None:
+        request.session[SESSION_KEY] = True
+        request.session.save()
+
+
+def get_owner(request):
+    """Возвращает ключ сессии владельца брони.
+
+    :return Ключ сессии или None, если у клиента нет сессии
+    :rtype str or None
+    """
+    # Чтение загружает сессию и сбрасывает ключ из cookie, если сессии
+    # нет в БД или она истекла
+    request.session.get(SESSION_KEY)
+
+    return request.session.session_key
+
+
+def reserve_client_hold(client, owner):
+    """Учитывает владельца брони среди владельцев броней с адреса клиента.
+
+    Владелец учитывается на время жизни брони, повторные брони владельца
+    не увеличивают счетчик. Как и ограничение частоты запросов, чтение
+    и запись в кеш не атомарны.
+
+    :param client: Адрес клиента
+    :type client: str
+    :param owner: Ключ сессии владельца брони
+    :type owner: str
+
+    :return Можно ли владельцу бронировать
+    :rtype bool
+    """
+    cache = caches[settings.RECEPTION_THROTTLE_CACHE_ALIAS]
+    key = f'slot-holds:{client}'
+    now = timezone.now().timestamp()
+    owners = {
+        other: expires for other, expires in (cache.get(key) or {}).items()
+        if expires > now}
+    if owner not in owners and len(owners) >= settings.RECEPTION_SLOT_HOLDS_PER_CLIENT:
+        return False
+
+    owners[owner] = now + settings.RECEPTION_SLOT_HOLD_TTL
+    cache.set(key, owners, settings.RECEPTION_SLOT_HOLD_TTL)
+
+    return True
+
+
+def load_day(doctor_id, date):
+    """Возвращает действующие брони врача на дату.
+
+    :return Брони в виде кортежей (слот, владелец, окончание брони)
+    :rtype tuple
+    """
+    from reception.models import SlotHold
+
+    return tuple(
+        (slots.time_to_slot(time), owner, expires_at.timestamp())
+        for time, owner, expires_at in SlotHold.objects.filter(
+            doctor=doctor_id, date=date, expires_at__gt=timezone.now()
+        ).values_list('time', 'owner', 'expires_at'))
+
+
+def load_days(doctor_ids, dates):
+    """Возвращает действующие брони врачей на даты.
+
+    Для всех врачей и дат выполняется один запрос вместо запроса
+    ``load_day`` на каждую пару, при шардировании брони читаются из шардов
+    параллельно.
+
+    :return Значения ``load_day`` по ключу (врач, дата)
+    :rtype dict
+    """
+    from reception.models import SlotHold
+
+    day_holds = {
+        (doctor_id, date): () for doctor_id in doctor_ids for date in dates}
+
+    def load_shard(shard_doctor_ids):
+        return list(SlotHold.objects.filter(
+            doctor__in=shard_doctor_ids, date__in=dates, expires_at__gt=timezone.now(),
+        ).values_list('doctor_id', 'date', 'time', 'owner', 'expires_at'))
+
+    for rows in sharding.fan_out(load_shard, doctor_ids):
+        for doctor_id, date, time, owner, expires_at in rows:
+            hold = slots.time_to_slot(time), owner, expires_at.timestamp()
+            day_holds[doctor_id, date] += (hold,)
+
+    return day_holds
+
+
+async def aload_day(doctor_id, date):
+    """Асинхронная версия ``load_day``."""
+    from reception.models import SlotHold
+
+    return tuple([
+        (slots.time_to_slot(time), owner, expires_at.timestamp())
+        async for time, owner, expires_at in SlotHold.objects.filter(
+            doctor=doctor_id, date=date, expires_at__gt=timezone.now()
+        ).values_list('time', 'owner', 'expires_at')])
+
+
+def holds_changed(days):
+    """Сбрасывает кеш броней врачей на даты после изменения броней.
+
+    Вызывается после фиксации транзакции. Индекс занятости, его версия и
+    поток событий не меняются: бронь может так и не стать записью.
+
+    :param days: Пары (идентификатор врача, дата)
+    :type days: set of tuple
+    """
+    from reception.cache import hold_cache
+
+    for doctor_id, date in days:
+        hold_cache.invalidate(doctor_id, date)
+
+
+def held_mask(holds, owner=None):
+    """Возвращает маску часов, забронированных не владельцем ``owner``.
+
+    :param holds: Брони из ``load_day``
+    :type holds: tuple
+    :param owner: Ключ сессии, чьи брони не учитываются
+    :type owner: str or None
+
+    :rtype int
+    """
+    now = timezone.now().timestamp()
+    mask = 0
+    for slot, hold_owner, expires in holds:
+        if expires > now and hold_owner != owner:
+            mask |= 1 << slot
+
+    return mask
+
+
+def is_held_by_other(doctor_id, date, time, owner, duration=DEFAULT_DURATION):
+    """Проверяет, забронирован ли другим владельцем хотя бы один час приема.
+
+    Прием длительностью ``duration`` минут занимает все часы, которые он
+    пересекает, поэтому проверяется бронь каждого из них.
+    """
+    from reception.models import SlotHold
+
+    times = slots.times_from_mask(slots.interval_mask(time, duration))
+    if not times:
+        return False
+
+    return SlotHold.objects.filter(
+        doctor=doctor_id, date=date, time__in=times,
+        expires_at__gt=timezone.now(),
+    ).exclude(owner=owner).exists()
+
+
+def hold_slot(doctor_id, date, time, owner):
+    """Бронирует час приема за владельцем.
+
+    Предыдущие брони владельца снимаются. Вызывается в шарде врача.
+
+    :return Время окончания брони или None, если час занят
+    :rtype datetime.datetime or None
+    """
+    from reception.models import SlotHold
+
+    slot = slots.time_to_slot(time)
+    if slot is None or slots.busy_mask(doctor_id, date) & (1 << slot):
+        return None
+
+    now = timezone.now()
+    expires_at = now + datetime.timedelta(seconds=settings.RECEPTION_SLOT_HOLD_TTL)
+    time = slots.slot_to_time(slot)
+    using = router.db_for_write(SlotHold)
+    try:
+        with transaction.atomic(using=using):
+            hold = SlotHold.objects.select_for_update().filter(
+                doctor=doctor_id, date=date, time=time).first()
+            if hold is not None and hold.owner != owner and hold.expires_at > now:
+                return None
+
+            days = release_holds(owner)
+            SlotHold.objects.filter(doctor=doctor_id, date=date, time=time).delete()
+            SlotHold.objects.create(
+                doctor_id=doctor_id, date=date, time=time, owner=owner,
+                expires_at=expires_at)
+    except IntegrityError:
+        # Час одновременно забронировал другой пациент
+        return None
+
+    holds_changed(days | {(doctor_id, date)})
+
+    return expires_at
+
+
+def release_holds(owner):
+    """Снимает брони владельца во всех шардах.
+
+    :return Пары (врач, дата) снятых броней
+    :rtype set of tuple
+    """
+    from reception.models import SlotHold
+
+    def release(doctor_ids):
+        holds = SlotHold.objects.filter(owner=owner)
+        shard_days = set(holds.values_list('doctor_id', 'date'))
+        holds.delete()
+        return shard_days
+
+    return set().union(*sharding.fan_out(release))
+
+
+def sweep_expired():
+    """Удаляет истекшие брони одним запросом, возвращает их количество.
+
+    Истекшие брони не учитываются при чтении, поэтому кеш и индекс занятости
+    после удаления не обновляются.
+    """
+    from reception.models import SlotHold
+
+    def sweep(doctor_ids):
+        deleted, _ = SlotHold.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+    return sum(sharding.fan_out(sweep))
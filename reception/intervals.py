@@ -0,0 +1,191 @@
+"""Пересечение приемов врача как интервалов времени.
+
+Прием занимает интервал [время, время + длительность). Время начала может
+быть любым с шагом виджета, поэтому совпадение времени начала, которое
+проверяет уникальность (врач, дата, время), не ловит пересечения вида
+09:00-10:00 и 09:15-10:15.
+
+Индекс занятости и брони считают время часовыми слотами: час занят, если
+его пересекает хотя бы один прием. Чтобы проверка пересечений не пропускала
+прием в час, который индекс показывает занятым, интервал нового приема
+расширяется до границ слотов ``slot_interval``: 09:30-09:45 пересекается
+с 09:00-09:15, как и в индексе.
+
+Длительность приема не больше ``MAX_DURATION``, поэтому пересечь интервал
+[начало, конец) могут только приемы, начинающиеся в (начало - MAX_DURATION,
+конец). Это диапазон по индексу (врач, дата, время) в БД или по
+упорядоченному списку начал в памяти - проверка не перебирает весь день.
+"""
+import bisect
+import datetime
+
+# Длительности приема, в минутах
+DURATIONS = (
+    (15, '15 минут'),
+    (30, '30 минут'),
+    (45, '45 минут'),
+    (60, '1 час'),
+    (90, '1,5 часа'),
+    (120, '2 часа'),
+)
+
+DEFAULT_DURATION = 60
+
+MAX_DURATION = max(duration for duration, _ in DURATIONS)
+
+# Длительность слота индекса занятости, в минутах
+SLOT_MINUTES = 60
+
+OVERLAP_MESSAGE = 'Выбранное время пересекается с приемом другого пациента.'
+
+
+def to_minutes(time):
+    """Возвращает число минут от начала суток.
+
+    :param time: Время
+    :type time: datetime.time
+
+    :rtype int
+    """
+    return time.hour * 60 + time.minute
+
+
+def from_minutes(minutes):
+    """Возвращает время по числу минут от начала суток.
+
+    :rtype datetime.time
+    """
+    return datetime.time(*divmod(minutes, 60))
+
+
+def interval(time, duration):
+    """Возвращает интервал приема в минутах от начала суток.
+
+    :param time: Время начала приема
+    :type time: datetime.time
+    :param duration: Длительность приема, в минутах
+    :type duration: int
+
+    :return Начало и конец интервала
+    :rtype tuple
+    """
+    start = to_minutes(time)
+
+    return start, start + duration
+
+
+def slot_interval(time, duration):
+    """Возвращает интервал часовых слотов, которые занимает прием.
+
+    :param time: Время начала приема
+    :type time: datetime.time
+    :param duration: Длительность приема, в минутах
+    :type duration: int
+
+    :return Начало первого и конец последнего слота в минутах от начала суток
+    :rtype tuple
+    """
+    start, end = interval(time, duration)
+
+    return start - start % SLOT_MINUTES, end + -end % SLOT_MINUTES
+
+
+class DayIntervals:
+    """Приемы врача за день, упорядоченные по времени начала."""
+
+    def __init__(self, intervals=()):
+        self.intervals = sorted(intervals)
+        self.starts = [start for start, _ in self.intervals]
+
+    def has_start(self, start):
+        """Проверяет, есть ли прием, начинающийся в ``start``."""
+        position = bisect.bisect_left(self.starts, start)
+        return position < len(self.starts) and self.starts[position] == start
+
+    def add(self, start, end):
+        position = bisect.bisect_left(self.starts, start)
+        self.starts.insert(position, start)
+        self.intervals.insert(position, (start, end))
+
+    def overlapping(self, start, end):
+        """Возвращает интервалы, пересекающие [start, end).
+
+        :rtype list of tuple
+        """
+        first = bisect.bisect_right(self.starts, start - MAX_DURATION)
+        last = bisect.bisect_left(self.starts, end)
+
+        return [
+            (other_start, other_end)
+            for other_start, other_end in self.intervals[first:last]
+            if other_end > start]
+
+
+def find_overlapping(doctor_id, date, time, duration, exclude_pk=None):
+    """Возвращает карточки приема врача, занимающие часовые слоты приема.
+
+    Кандидаты выбираются диапазоном по индексу (врач, дата, время),
+    пересечение со слотами ``slot_interval`` проверяется по длительности
+    каждого кандидата.
+
+    :param doctor_id: Идентификатор врача
+    :type doctor_id: int
+    :param date: Дата
+    :type date: datetime.date
+    :param time: Время начала приема
+    :type time: datetime.time
+    :param duration: Длительность приема, в минутах
+    :type duration: int
+    :param exclude_pk: Идентификатор проверяемой карточки
+    :type exclude_pk: int or None
+
+    :rtype list of reception.models.Reception
+    """
+    from reception.models import Reception
+
+    start, end = slot_interval(time, duration)
+    candidates = Reception.objects.filter(doctor=doctor_id, date=date)
+    if start > MAX_DURATION:
+        candidates = candidates.filter(time__gt=from_minutes(start - MAX_DURATION))
+    if end < 24 * 60:
+        candidates = candidates.filter(time__lt=from_minutes(end))
+    if exclude_pk is not None:
+        candidates = candidates.exclude(pk=exclude_pk)
+
+    return [
+        reception for reception in candidates.order_by('time')
+        if to_minutes(reception.time) + reception.duration > start]
+
+
+def lock_doctor(doctor_id):
+    """Блокирует строку врача до конца транзакции.
+
+    Уникальность (врач, дата, время) не защищает от одновременной записи
+    пересекающихся приемов с разным временем начала, поэтому повторная
+    проверка пересечений перед сохранением выполняется под этой блокировкой.
+
+    В SQLite ``select_for_update`` ничего не блокирует, там запись
+    сериализует транзакция ``BEGIN IMMEDIATE`` (``transaction_mode`` в
+    настройках БД): вторая транзакция ждет фиксации первой и видит ее прием.
+    """
+    from django.db import router
+
+    from reception.models import Doctor, Reception
+
+    # Блокируется строка врача в БД его карточек приема
+    Doctor.objects.db_manager(router.db_for_write(Reception)).select_for_update().filter(
+        pk=doctor_id).values_list('pk').first()
+
+
+def lock_doctors(doctor_ids):
+    """Блокирует строки нескольких врачей до конца транзакции.
+
+    Строки блокируются одним запросом в порядке идентификаторов, чтобы
+    одновременные транзакции не заблокировали друг друга.
+    """
+    from django.db import router
+
+    from reception.models import Doctor, Reception
+
+    list(Doctor.objects.db_manager(router.db_for_write(Reception)).select_for_update().filter(
+        pk__in=doctor_ids).order_by('pk').values_list('pk'))
@@ -0,0 +1,72 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+
+from reception import sharding
+from reception.models import Reception, ReceptionArchive
+from reception.signals import deferred_day_changes
+
+ARCHIVE_FIELDS = 'id', 'doctor_id', 'date', 'time', 'duration', 'fio'
+
+
+class Command(BaseCommand):
+    """Переносит прошедшие карточки приема в архивную таблицу.
+
+    Карточки переносятся порциями, каждая порция в своей транзакции, поэтому
+    команду можно прервать и запустить повторно. При шардировании карточки
+    переносятся в архив своего шарда. Строки индекса занятости за архивные
+    дни остаются с пустой маской, чтобы их версии не повторились.
+    """
+
+    help = 'Переносит карточки приема до указанной даты в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before', help='Дата в формате ДД.ММ.ГГГГ, по умолчанию сегодня')
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Количество карточек в одной транзакции')
+
+    def handle(self, *args, **options):
+        before = datetime.date.today()
+        if options['before']:
+            try:
+                before = datetime.datetime.strptime(
+                    options['before'], '%d.%m.%Y').date()
+            except ValueError:
+                raise CommandError('Дата должна быть в формате ДД.ММ.ГГГГ')
+
+        if before > datetime.date.today():
+            raise CommandError('Можно архивировать только прошедшие карточки')
+
+        total = 0
+        for alias in sharding.get_shards() or [None]:
+            with sharding.using_shard(alias):
+                while True:
+                    moved = self.archive_chunk(before, options['chunk_size'])
+                    if not moved:
+                        break
+                    total += moved
+
+        self.stdout.write(f'Перенесено в архив карточек: {total}')
+
+    def archive_chunk(self, before, chunk_size):
+        """Переносит в архив одну порцию карточек, возвращает их количество."""
+        with transaction.atomic(using=router.db_for_write(Reception)):
+            rows = list(
+                Reception.objects.filter(date__lt=before).order_by('id')
+                .values_list(*ARCHIVE_FIELDS)[:chunk_size])
+            if not rows:
+                return 0
+
+            ReceptionArchive.objects.bulk_create(
+                (ReceptionArchive(**dict(zip(ARCHIVE_FIELDS, row)))
+                 for row in rows),
+                ignore_conflicts=True)
+
+            with deferred_day_changes():
+                Reception.objects.filter(
+                    id__in=[row[0] for row in rows]).delete()
+
+        return len(rows)
@@ -0,0 +1,155 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment)
+
+from reception import sharding
+from reception.benchmarks import generate_data, measure
+from reception.cache import free_time_cache, hold_cache
+from reception.forms import ReceptionForm
+
+
+class Command(BaseCommand):
+    """Замеряет производительность горячих путей записи на прием.
+
+    Замеры выполняются на отдельной тестовой БД (и тестовых БД шардов),
+    заполненной синтетическими данными. Результаты пишутся в JSON-файл, два файла можно сравнить
+    параметром ``--compare``.
+    """
+
+    help = 'Запускает микробенчмарки записи на прием'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=50)
+        parser.add_argument('--weeks', type=int, default=4)
+        parser.add_argument(
+            '--fill-rate', type=float, default=0.5,
+            help='Доля занятых часов приема от 0 до 1')
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--output', default='bench_output.json')
+        parser.add_argument(
+            '--compare', help='JSON-файл предыдущего запуска для сравнения')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['fill_rate'] <= 1:
+            raise CommandError('Заполненность должна быть от 0 до 1')
+
+        setup_test_environment()
+        old_names = [
+            (alias, connections[alias].creation.create_test_db(
+                verbosity=0, autoclobber=True))
+            for alias in ['default', *sharding.get_shards()]]
+        sharding.reset()
+        try:
+            # Замеры отправляют запросы с одного адреса чаще ограничения
+            with override_settings(RECEPTION_THROTTLE_RATES={}):
+                results = self.run_benchmarks(options)
+        finally:
+            for alias, old_name in old_names:
+                connections[alias].creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'revision': self.get_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'params': {
+                    key: options[key]
+                    for key in ('doctors', 'weeks', 'fill_rate', 'iterations')
+                },
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as compare:
+                previous = json.load(compare)['results']
+
+        self.print_results(results, previous)
+
+    @staticmethod
+    def get_revision():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def run_benchmarks(self, options):
+        free = generate_data(
+            options['doctors'], options['weeks'], options['fill_rate'])
+        iterations = min(options['iterations'], len(free))
+        if not iterations:
+            raise CommandError('Нет свободных часов приема для замеров')
+
+        client = Client()
+        admin = Client()
+        admin.force_login(User.objects.create_superuser('bench', password='bench'))
+
+        def free_times_params(i):
+            doctor_id, date, _ = free[i]
+            return {'doctor_id': doctor_id, 'date': date.strftime('%d.%m.%Y')}
+
+        def form_data(i):
+            doctor_id, date, time = free[i]
+            return {
+                'doctor': doctor_id, 'date': date.strftime('%d.%m.%Y'),
+                'time': time.strftime('%H:%M'), 'fio': 'Петров Петр Петрович'}
+
+        def free_times(i):
+            client.get('/reception/get-free-time-choices/', free_times_params(i))
+
+        def clear_free_times(i):
+            free_time_cache.clear()
+            hold_cache.clear()
+
+        scenarios = {
+            'free_times_cold': (free_times, clear_free_times),
+            'free_times_warm': (free_times, free_times),
+            'earliest_free_time': (
+                lambda i: client.get('/reception/get-earliest-free-time/', {
+                    'days': options['weeks'] * 7}),
+                None),
+            'form_get': (lambda i: client.get('/reception/new/'), None),
+            'form_validation': (
+                lambda i: ReceptionForm(form_data(i)).is_valid(), None),
+            'admin_changelist': (
+                lambda i: admin.get('/admin/reception/reception/'), None),
+            # Бронирование меняет данные, поэтому выполняется последним
+            'form_post': (
+                lambda i: client.post('/reception/new/', form_data(i)), None),
+        }
+
+        results = {}
+        for name, (func, setup) in scenarios.items():
+            count = min(iterations, 20) if name == 'admin_changelist' else iterations
+            results[name] = measure(func, count, setup)
+            self.stdout.write(f'{name}: готово', self.style.SUCCESS)
+
+        return results
+
+    def print_results(self, results, previous=None):
+        header = f'{"сценарий":<18} {"p50, мс":>9} {"p95, мс":>9} {"p99, мс":>9} {"запросов":>9}'
+        if previous:
+            header += f' {"p50 было":>9}'
+        self.stdout.write(header)
+
+        for name, result in results.items():
+            line = (
+                f'{name:<18} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+                f'{result["p99_ms"]:>9.2f} {result["queries"]:>9.1f}')
+            if previous and name in previous:
+                line += f' {previous[name]["p50_ms"]:>9.2f}'
+            self.stdout.write(line)
@@ -0,0 +1,33 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reception import schedule
+
+
+class Command(BaseCommand):
+    """Рассчитывает календари часов приема клиники и врачей.
+
+    Команду следует запускать ежедневно, чтобы горизонт календаря
+    сдвигался вместе с текущей датой.
+    """
+
+    help = 'Рассчитывает календари часов приема клиники и врачей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.RECEPTION_CALENDAR_DAYS,
+            help='Длина горизонта календаря в днях')
+        parser.add_argument(
+            '--start', type=datetime.date.fromisoformat,
+            help='Первый день горизонта в формате ГГГГ-ММ-ДД, по умолчанию - сегодня')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        calendars = schedule.build(start=options['start'], days=options['days'])
+
+        self.stdout.write(
+            f'Рассчитано календарей: {len(calendars)} на {options["days"]} дней '
+            f'за {time.monotonic() - started:.2f} с')
@@ -0,0 +1,108 @@
+import asyncio
+import concurrent.futures
+import datetime
+import statistics
+import threading
+import time
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from reception.models import Doctor
+from reception.views import adoctor_free_times, doctor_free_times
+
+
+class Command(BaseCommand):
+    """Сравнивает синхронное и асинхронное представления свободного времени.
+
+    Синхронное представление обслуживается пулом потоков, как в WSGI-сервере
+    с потоком на запрос, асинхронное - одним циклом событий, как в ASGI.
+    Медленный клиент моделируется задержкой ``--client-delay`` после ответа,
+    в течение которой соединение занято.
+    """
+
+    help = 'Сравнивает WSGI- и ASGI-версии представления свободного времени'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument(
+            '--client-delay', type=float, default=0.05,
+            help='Время, на которое медленный клиент занимает соединение, с')
+
+    def handle(self, *args, **options):
+        doctor_ids = list(Doctor.objects.values_list('id', flat=True)[:100])
+        if not doctor_ids:
+            raise CommandError('В базе нет врачей')
+
+        today = datetime.date.today()
+        monday = today + datetime.timedelta(days=7 - today.weekday())
+        date = monday.strftime('%d.%m.%Y')
+        params = [
+            {'doctor_id': doctor_ids[i % len(doctor_ids)], 'date': date}
+            for i in range(options['requests'])
+        ]
+
+        for name, run in (('WSGI', self.run_sync), ('ASGI', self.run_async)):
+            started = time.perf_counter()
+            # Все запросы отправляются с одного адреса чаще ограничения
+            with override_settings(RECEPTION_THROTTLE_RATES={}):
+                latencies, threads = run(
+                    params, options['concurrency'], options['client_delay'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{name}: {len(params) / elapsed:.0f} запросов/с, '
+                f'медиана {statistics.median(latencies) * 1000:.2f} мс, '
+                f'p95 {self.percentile(latencies, 95) * 1000:.2f} мс, '
+                f'потоков: {threads}')
+
+    @staticmethod
+    def percentile(values, percent):
+        values = sorted(values)
+        return values[min(len(values) - 1, len(values) * percent // 100)]
+
+    def run_sync(self, params, concurrency, client_delay):
+        factory = RequestFactory()
+        threads_before = threading.active_count()
+        peak = [threads_before]
+
+        def call(query):
+            request = factory.get('/', query)
+            request.session = SessionStore()
+            started = time.perf_counter()
+            doctor_free_times(request)
+            latency = time.perf_counter() - started
+            peak[0] = max(peak[0], threading.active_count())
+            time.sleep(client_delay)
+            return latency
+
+        with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+            latencies = list(executor.map(call, params))
+
+        return latencies, peak[0] - threads_before
+
+    def run_async(self, params, concurrency, client_delay):
+        factory = AsyncRequestFactory()
+        threads_before = threading.active_count()
+        peak = [threads_before]
+
+        async def call(semaphore, query):
+            async with semaphore:
+                request = factory.get('/', query)
+                request.session = SessionStore()
+                started = time.perf_counter()
+                await adoctor_free_times(request)
+                latency = time.perf_counter() - started
+                peak[0] = max(peak[0], threading.active_count())
+                await asyncio.sleep(client_delay)
+                return latency
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(
+                *(call(semaphore, query) for query in params))
+
+        latencies = asyncio.run(main())
+
+        return latencies, peak[0] - threads_before
@@ -0,0 +1,327 @@
+import collections
+import csv
+import datetime
+import itertools
+import json
+import os
+import sys
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, router, transaction
+
+from reception import intervals, schedule, sharding, slots
+from reception.models import Doctor, Reception
+from reception.signals import days_changed
+from reception.validators import validate_not_past_date, validate_week_day
+
+DATE_FORMATS = '%Y-%m-%d', '%d.%m.%Y'
+TIME_FORMATS = '%H:%M', '%H:%M:%S'
+
+DUPLICATE_MESSAGE = ('Карточка приема с такими значениями полей К врачу, Дата и Время '
+                     'уже существует.')
+
+
+def parse(value, formats, parse_type):
+    """Разбирает дату или время по одному из форматов."""
+    for format_ in formats:
+        try:
+            parsed = datetime.datetime.strptime(value.strip(), format_)
+        except ValueError:
+            continue
+        return parsed.date() if parse_type is datetime.date else parsed.time()
+
+    raise ValueError(f'Некорректное значение: {value}')
+
+
+class Command(BaseCommand):
+    """Потоковый импорт карточек приема из CSV или JSONL.
+
+    Каждая строка содержит врача (``doctor_id`` или ``surname``, ``name``,
+    ``patronymic``), ``date``, ``time``, ``fio`` и необязательную длительность
+    приема в минутах ``duration``. Файл читается построчно,
+    карточки пишутся пакетами через ``bulk_create``, каждый пакет в своей
+    транзакции. При шардировании карточки пакета пишутся в шарды врачей
+    параллельно. Отклоненные строки пишутся в отдельный файл с причиной.
+    """
+
+    help = 'Импортирует карточки приема из CSV или JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу, "-" - стандартный ввод')
+        parser.add_argument(
+            '--format', choices=('csv', 'jsonl'),
+            help='Формат файла, по умолчанию определяется по расширению')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Количество строк в одной транзакции')
+        parser.add_argument(
+            '--rejects', help='Файл для отклоненных строк, по умолчанию '
+                              '<path>.rejects.jsonl')
+        parser.add_argument(
+            '--create-doctors', action='store_true',
+            help='Создавать врачей, которых нет в базе')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format_ = options['format'] or (
+            'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        rejects_path = options['rejects'] or (
+            'rejects.jsonl' if path == '-' else f'{path}.rejects.jsonl')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пакета должен быть положительным')
+
+        self.create_doctors = options['create_doctors']
+        self.load_doctors()
+
+        source = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        started = time.monotonic()
+        total = imported = 0
+        with source, open(rejects_path, 'w', encoding='utf-8') as rejects:
+            self.rejects = rejects
+            self.rejected = 0
+            rows = self.read_rows(source, format_)
+            while True:
+                batch = list(itertools.islice(rows, options['batch_size']))
+                if not batch:
+                    break
+
+                total += len(batch)
+                imported += self.import_batch(batch)
+                if options['verbosity'] > 1:
+                    self.report(total, imported, started)
+
+        if not self.rejected:
+            os.remove(rejects_path)
+
+        self.report(total, imported, started)
+        if self.rejected:
+            self.stdout.write(f'Отклоненные строки: {rejects_path}')
+
+    def report(self, total, imported, started):
+        """Выводит количество обработанных строк и скорость импорта."""
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(
+            f'Обработано строк: {total}, импортировано: {imported}, '
+            f'отклонено: {self.rejected}, {total / elapsed:.0f} строк/с')
+
+    def load_doctors(self):
+        """Загружает справочник врачей в память."""
+        self.doctor_ids = set()
+        self.doctors_by_name = {}
+        for id_, surname, name, patronymic in Doctor.objects.values_list(
+                'id', 'surname', 'name', 'patronymic').iterator():
+            self.doctor_ids.add(id_)
+            self.doctors_by_name[surname, name, patronymic] = id_
+
+    def read_rows(self, source, format_):
+        """Построчно читает файл, возвращая пары (номер строки, словарь)."""
+        if format_ == 'csv':
+            for line_number, row in enumerate(csv.DictReader(source), 2):
+                yield line_number, row
+        else:
+            for line_number, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = line.rstrip('\n')
+                yield line_number, row
+
+    def reject(self, line_number, row, reason):
+        """Записывает отклоненную строку с причиной."""
+        self.rejected += 1
+        self.rejects.write(json.dumps(
+            {'line': line_number, 'row': row, 'error': reason},
+            ensure_ascii=False, default=str) + '\n')
+
+    def resolve_doctor(self, row):
+        """Возвращает идентификатор врача строки по справочнику в памяти."""
+        if row.get('doctor_id'):
+            doctor_id = int(row['doctor_id'])
+            if doctor_id not in self.doctor_ids:
+                raise ValueError(f'Врач {doctor_id} не найден')
+            return doctor_id
+
+        key = tuple((row.get(field) or '').strip()
+                    for field in ('surname', 'name', 'patronymic'))
+        if not all(key):
+            raise ValueError('Не указан врач')
+
+        doctor_id = self.doctors_by_name.get(key)
+        if doctor_id is None:
+            if not self.create_doctors:
+                raise ValueError(f'Врач {" ".join(key)} не найден')
+            surname, name, patronymic = key
+            doctor_id = Doctor.objects.create(
+                surname=surname, name=name, patronymic=patronymic).id
+            self.doctor_ids.add(doctor_id)
+            self.doctors_by_name[key] = doctor_id
+
+        return doctor_id
+
+    def validate_dates(self, dates):
+        """Проверяет валидаторами модели каждую дату пакета один раз.
+
+        :return Ошибки по датам
+        :rtype dict
+        """
+        errors = {}
+        for date in dates:
+            try:
+                validate_week_day(date)
+                validate_not_past_date(date)
+            except ValidationError as error:
+                errors[date] = ' '.join(error.messages)
+
+        return errors
+
+    def is_open(self, calendars, reception):
+        """Проверяет по календарю, что врач принимает весь прием карточки."""
+        calendar = calendars.get(reception.doctor_id)
+        start, end = intervals.interval(reception.time, reception.duration)
+        if (calendar is None or start < slots.WORKING_HOURS[0] * 60
+                or end > (slots.WORKING_HOURS[-1] + 1) * 60):
+            return False
+
+        mask = slots.interval_mask(reception.time, reception.duration)
+
+        return schedule.calendar_masks(calendar, [reception.date])[0] & mask == mask
+
+    def parse_duration(self, row):
+        """Возвращает длительность приема строки, по умолчанию - час."""
+        duration = int(row.get('duration') or intervals.DEFAULT_DURATION)
+        if duration not in dict(intervals.DURATIONS):
+            raise ValueError(f'Некорректная длительность приема: {duration}')
+
+        return duration
+
+    def import_batch(self, batch):
+        """Проверяет и сохраняет пакет строк, возвращает число карточек."""
+        parsed = []
+        for line_number, row in batch:
+            if not isinstance(row, dict):
+                self.reject(line_number, row, 'Некорректная строка')
+                continue
+            try:
+                fio = (row.get('fio') or '').strip()
+                if not fio or len(fio) > Reception._meta.get_field('fio').max_length:
+                    raise ValueError('Некорректное ФИО')
+                parsed.append((line_number, row, Reception(
+                    doctor_id=self.resolve_doctor(row),
+                    date=parse(row['date'], DATE_FORMATS, datetime.date),
+                    time=parse(row['time'], TIME_FORMATS, datetime.time),
+                    duration=self.parse_duration(row),
+                    fio=fio)))
+            except (KeyError, TypeError, ValueError, AttributeError) as error:
+                self.reject(line_number, row, str(error))
+
+        dates = {r.date for _, _, r in parsed}
+        date_errors = self.validate_dates(dates)
+        calendars = schedule.get_calendars({r.doctor_id for _, _, r in parsed})
+
+        days = collections.defaultdict(intervals.DayIntervals)
+        for shard_days in sharding.fan_out(
+                lambda doctor_ids: self.load_days(doctor_ids, dates),
+                {r.doctor_id for _, _, r in parsed}):
+            days.update(shard_days)
+
+        accepted = []
+        for line_number, row, reception in parsed:
+            day = days[reception.doctor_id, reception.date]
+            if reception.date in date_errors:
+                error = date_errors[reception.date]
+            elif not self.is_open(calendars, reception):
+                error = schedule.CLOSED_MESSAGE
+            else:
+                error = self.check_overlap(day, reception)
+
+            if error:
+                self.reject(line_number, row, error)
+            else:
+                day.add(*intervals.interval(reception.time, reception.duration))
+                accepted.append((line_number, row, reception))
+
+        imported = 0
+        for shard_imported, rejected in sharding.fan_out(
+                lambda doctor_ids: self.save(accepted, doctor_ids),
+                {r.doctor_id for _, _, r in accepted}):
+            imported += shard_imported
+            for line_number, row, error in rejected:
+                self.reject(line_number, row, error)
+
+        return imported
+
+    def load_days(self, doctor_ids, dates):
+        """Загружает приемы врачей шарда на даты для поиска пересечений.
+
+        :return Приемы по врачу и дате
+        :rtype dict
+        """
+        days = collections.defaultdict(intervals.DayIntervals)
+        rows = Reception.objects.filter(
+            doctor__in=doctor_ids, date__in=dates,
+        ).order_by().values_list('doctor_id', 'date', 'time', 'duration')
+        for doctor_id, date, start_time, duration in rows:
+            days[doctor_id, date].add(*intervals.interval(start_time, duration))
+
+        return days
+
+    def check_overlap(self, day, reception):
+        """Возвращает причину отказа, если прием карточки пересекает приемы дня."""
+        start, _ = intervals.interval(reception.time, reception.duration)
+        if day.has_start(start):
+            return DUPLICATE_MESSAGE
+        if day.overlapping(*intervals.slot_interval(reception.time, reception.duration)):
+            return intervals.OVERLAP_MESSAGE
+
+        return None
+
+    def save(self, accepted, doctor_ids):
+        """Сохраняет карточки врачей шарда в одной транзакции.
+
+        Пакет проверен по приемам, прочитанным без блокировки. Под
+        блокировкой врачей пересечения проверяются повторно, чтобы не
+        записать прием поверх записи, сделанной за это время через сайт.
+        Строки, нарушившие уникальность из-за записи без блокировки
+        (например, из админки), отклоняются по одной.
+
+        :return Число сохраненных карточек и отклоненные строки
+        :rtype tuple
+        """
+        doctor_ids = set(doctor_ids)
+        shard_accepted = [item for item in accepted if item[2].doctor_id in doctor_ids]
+        using = router.db_for_write(Reception)
+        rejected = []
+        with transaction.atomic(using=using):
+            intervals.lock_doctors(doctor_ids)
+            days = self.load_days(doctor_ids, {r.date for _, _, r in shard_accepted})
+            receptions = []
+            for line_number, row, reception in shard_accepted:
+                error = self.check_overlap(days[reception.doctor_id, reception.date], reception)
+                if error:
+                    rejected.append((line_number, row, error))
+                else:
+                    receptions.append((line_number, row, reception))
+
+            try:
+                with transaction.atomic(using=using):
+                    Reception.objects.bulk_create(
+                        [r for _, _, r in receptions], batch_size=1000)
+                saved = [r for _, _, r in receptions]
+            except IntegrityError:
+                saved = []
+                for line_number, row, reception in receptions:
+                    try:
+                        with transaction.atomic(using=using):
+                            Reception.objects.bulk_create([reception])
+                    except IntegrityError:
+                        rejected.append((line_number, row, DUPLICATE_MESSAGE))
+                    else:
+                        saved.append(reception)
+
+            days_changed({(r.doctor_id, r.date) for r in saved})
+
+        return len(saved), rejected
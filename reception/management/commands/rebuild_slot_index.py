@@ -0,0 +1,106 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.db.models import F
+
+from reception import sharding, slots
+from reception.cache import free_time_cache
+from reception.models import DoctorDaySlots
+
+
+class Command(BaseCommand):
+    """Пересчитывает индекс занятости врачей по таблице карточек приема.
+
+    При шардировании индекс каждого шарда сверяется с карточками шарда.
+    """
+
+    help = 'Пересчитывает индекс занятости врачей по карточкам приема'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сверить индекс с карточками приема, не изменяя его')
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for alias in sharding.get_shards() or [None]:
+            with sharding.using_shard(alias):
+                if options['verify']:
+                    mismatches += self.verify(slots.compute_all_masks(), self.load_stored())
+                else:
+                    self.rebuild()
+
+        if mismatches:
+            raise CommandError(f'Расхождений в индексе: {mismatches}')
+
+    def load_stored(self, lock=False):
+        """Возвращает строки индекса по ключу (врач, дата).
+
+        :param lock: Заблокировать строки до конца транзакции
+        :type lock: bool
+        """
+        day_slots = DoctorDaySlots.objects.only('doctor_id', 'date', 'busy_mask')
+        if lock:
+            day_slots = day_slots.select_for_update()
+
+        return {
+            (row.doctor_id, row.date): row
+            for row in day_slots.iterator(chunk_size=2000)
+        }
+
+    def rebuild(self):
+        """Исправляет строки индекса, расходящиеся с карточками приема.
+
+        Версии исправленных строк увеличиваются, новые строки создаются.
+        Строки индекса блокируются до чтения карточек, поэтому запись,
+        изменившая занятость во время пересчета, дождется его конца.
+        """
+        with transaction.atomic(using=router.db_for_write(DoctorDaySlots)):
+            stored = self.load_stored(lock=True)
+            masks = slots.compute_all_masks()
+
+            changed = []
+            for key, day_slots in stored.items():
+                mask = masks.get(key, 0)
+                if day_slots.busy_mask != mask:
+                    day_slots.busy_mask = mask
+                    day_slots.version = F('version') + 1
+                    changed.append(day_slots)
+
+            created = [
+                DoctorDaySlots(doctor_id=doctor_id, date=date, busy_mask=mask)
+                for (doctor_id, date), mask in masks.items()
+                if (doctor_id, date) not in stored
+            ]
+
+            DoctorDaySlots.objects.bulk_update(
+                changed, ['busy_mask', 'version'], batch_size=1000)
+            DoctorDaySlots.objects.bulk_create(created, batch_size=1000)
+
+        for day_slots in changed:
+            free_time_cache.invalidate(day_slots.doctor_id, day_slots.date)
+
+        self.stdout.write(
+            f'Индекс перестроен, исправлено записей: {len(changed)}, '
+            f'добавлено: {len(created)}')
+
+    def verify(self, masks, stored):
+        """Сверяет индекс с карточками приема, возвращает число расхождений."""
+        stored = {
+            key: day_slots.busy_mask for key, day_slots in stored.items()
+            if day_slots.busy_mask
+        }
+
+        mismatches = [
+            key for key in masks.keys() | stored.keys()
+            if masks.get(key) != stored.get(key)
+        ]
+        for doctor_id, date in sorted(mismatches):
+            self.stderr.write(
+                f'Врач {doctor_id}, {date}: в индексе '
+                f'{stored.get((doctor_id, date), 0):09b}, по карточкам '
+                f'{masks.get((doctor_id, date), 0):09b}')
+
+        if not mismatches:
+            self.stdout.write(f'Индекс корректен, записей: {len(stored)}')
+
+        return len(mismatches)
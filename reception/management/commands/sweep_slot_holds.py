@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from reception import holds
+
+
+class Command(BaseCommand):
+    """Удаляет истекшие брони часов приема."""
+
+    help = 'Удаляет истекшие брони часов приема'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Удалено истекших броней: {holds.sweep_expired()}')
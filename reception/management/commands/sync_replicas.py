@@ -0,0 +1,53 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def copy_sqlite(source, target_path):
+    """Копирует SQLite-базу соединения в файл через backup API.
+
+    :param source: Соединение Django с исходной БД
+    :type source: django.db.backends.base.base.BaseDatabaseWrapper
+    :param target_path: Путь к файлу реплики
+    :type target_path: str
+    """
+    source.ensure_connection()
+    target = sqlite3.connect(target_path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+
+
+class Command(BaseCommand):
+    """Синхронизирует SQLite-реплики с основной БД.
+
+    Предназначена для локальной проверки работы с репликами: каждая реплика
+    из ``settings.RECEPTION_READ_REPLICAS`` перезаписывается копией ``default``.
+    """
+
+    help = 'Копирует основную SQLite-БД в файлы реплик'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help='Алиас реплики, по умолчанию все реплики')
+
+    def handle(self, *args, **options):
+        aliases = options['databases'] or settings.RECEPTION_READ_REPLICAS
+        if not aliases:
+            raise CommandError('Реплики не настроены')
+
+        source = connections['default']
+        if source.vendor != 'sqlite':
+            raise CommandError('Синхронизация поддерживается только для SQLite')
+
+        for alias in aliases:
+            if alias not in settings.DATABASES:
+                raise CommandError(f'Неизвестная БД: {alias}')
+
+            connections[alias].close()
+            copy_sqlite(source, settings.DATABASES[alias]['NAME'])
+            self.stdout.write(f'Реплика {alias} синхронизирована')
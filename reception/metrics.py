@@ -0,0 +1,265 @@
+"""Метрики запросов в текстовом формате Prometheus.
+
+Значения копятся в памяти процесса: запись метрики - это увеличение числа
+под блокировкой. Если задан ``settings.RECEPTION_METRICS_DIR``, процесс
+не реже раза в ``RECEPTION_METRICS_FLUSH_INTERVAL`` секунд сохраняет свои
+значения в файл каталога, а ``/metrics`` суммирует файлы всех процессов.
+Файлы завершившихся процессов сливаются в общий архив, поэтому счетчики
+не уменьшаются при перезапуске рабочих процессов.
+"""
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Описания метрик: тип, справка и границы корзин гистограммы
+METRICS = {
+    'med_http_requests_total': (
+        'counter', 'Число запросов по представлениям.', None),
+    'med_http_request_duration_seconds': (
+        'histogram', 'Время обработки запроса, в секундах.',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+    'med_http_response_size_bytes': (
+        'histogram', 'Размер тела ответа, в байтах.',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576)),
+    'med_db_queries_per_request': (
+        'histogram', 'Число SQL-запросов на запрос.',
+        (0, 1, 2, 5, 10, 20, 50, 100)),
+    'med_db_duration_per_request_seconds': (
+        'histogram', 'Время SQL-запросов на запрос, в секундах.',
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)),
+    'med_booking_conflicts_total': (
+        'counter', 'Число отказов в записи из-за уже занятого часа приема.', None),
+    'med_throttled_requests_total': (
+        'counter', 'Число запросов, отклоненных ограничением частоты.', None),
+}
+
+# Имя файла, в который сливаются значения завершившихся процессов
+ARCHIVE_NAME = 'archive.json'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Registry:
+    """Метрики процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Обнуляет значения, например, в созданном процессе."""
+        with self._lock:
+            self._values = {}
+            self._file_name = f'{os.getpid()}-{uuid.uuid4().hex}.json'
+            self._flushed_at = time.monotonic()
+
+    def inc(self, name, labels=(), value=1):
+        """Увеличивает счетчик.
+
+        :param name: Имя метрики из ``METRICS``
+        :type name: str
+        :param labels: Пары (метка, значение)
+        :type labels: tuple
+        """
+        key = name, labels
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        """Добавляет наблюдение в гистограмму."""
+        buckets = METRICS[name][2]
+        key = name, labels
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Счетчики корзин, затем сумма и число наблюдений
+                counts = self._values[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-2] += value
+            counts[-1] += 1
+
+    def snapshot(self):
+        """Возвращает копию значений процесса.
+
+        :rtype dict
+        """
+        with self._lock:
+            return {
+                key: list(value) if isinstance(value, list) else value
+                for key, value in self._values.items()}
+
+    def flush(self, force=False):
+        """Сохраняет значения процесса в каталог метрик.
+
+        Без ``force`` сохраняет не чаще ``RECEPTION_METRICS_FLUSH_INTERVAL``.
+        """
+        directory = settings.RECEPTION_METRICS_DIR
+        if not directory:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._flushed_at < settings.RECEPTION_METRICS_FLUSH_INTERVAL:
+            return
+        self._flushed_at = now
+
+        os.makedirs(directory, exist_ok=True)
+        write_values(os.path.join(directory, self._file_name), self.snapshot())
+
+    def collect(self):
+        """Возвращает значения всех процессов.
+
+        :rtype dict
+        """
+        directory = settings.RECEPTION_METRICS_DIR
+        if not directory:
+            return self.snapshot()
+
+        self.flush(force=True)
+        with directory_lock(directory):
+            compact(directory)
+            values = {}
+            for name in os.listdir(directory):
+                if name.endswith('.json'):
+                    merge(values, read_values(os.path.join(directory, name)))
+
+        return values
+
+
+def merge(values, other):
+    """Добавляет значения ``other`` к ``values``."""
+    for key, value in other.items():
+        current = values.get(key)
+        if current is None:
+            values[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                current[i] += item
+        else:
+            values[key] = current + value
+
+
+def encode_key(key):
+    name, labels = key
+    return json.dumps([name, [list(label) for label in labels]], ensure_ascii=False)
+
+
+def decode_key(text):
+    name, labels = json.loads(text)
+    return name, tuple(tuple(label) for label in labels)
+
+
+def read_values(path):
+    try:
+        with open(path, encoding='utf-8') as values_file:
+            data = json.load(values_file)
+    except (OSError, ValueError):
+        return {}
+
+    return {decode_key(key): value for key, value in data.items()}
+
+
+def write_values(path, values):
+    """Атомарно записывает значения в файл."""
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as values_file:
+        json.dump({encode_key(key): value for key, value in values.items()}, values_file)
+    os.replace(temp_path, path)
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def compact(directory):
+    """Сливает файлы завершившихся процессов в архив каталога метрик."""
+    archive_path = os.path.join(directory, ARCHIVE_NAME)
+    dead = [
+        name for name in os.listdir(directory)
+        if name.endswith('.json') and name != ARCHIVE_NAME
+        and not is_alive(int(name.split('-', 1)[0]))
+    ]
+    if not dead:
+        return
+
+    archive = read_values(archive_path)
+    for name in dead:
+        merge(archive, read_values(os.path.join(directory, name)))
+    write_values(archive_path, archive)
+    for name in dead:
+        os.remove(os.path.join(directory, name))
+
+
+@contextlib.contextmanager
+def directory_lock(directory):
+    """Межпроцессная блокировка каталога метрик на время чтения и слияния."""
+    with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+
+    def escape(value):
+        return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+    return '{%s}' % ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+def render(values):
+    """Возвращает значения метрик в текстовом формате Prometheus.
+
+    :rtype str
+    """
+    by_name = collections.defaultdict(list)
+    for (name, labels), value in sorted(values.items()):
+        by_name[name].append((labels, value))
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in by_name.get(name, ()):
+            if kind == 'counter':
+                lines.append(f'{name}{format_labels(labels)} {value}')
+                continue
+
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{format_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {value[-1]}')
+            lines.append(f'{name}_sum{format_labels(labels)} {value[-2]}')
+            lines.append(f'{name}_count{format_labels(labels)} {value[-1]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+if hasattr(os, 'register_at_fork'):
+    # Созданный процесс не должен записывать значения родителя в его файл
+    os.register_at_fork(after_in_child=registry.reset)
@@ -0,0 +1,229 @@
+"""Промежуточные обработчики приложения записи на прием."""
+import logging
+import mimetypes
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from reception.metrics import registry
+from reception.querycheck import (
+    NPlusOneError, aexecute_wrappers, ainspect_queries, execute_wrappers,
+    get_query_budget, inspect_queries)
+from reception.storage import compressed_path
+
+logger = logging.getLogger(__name__)
+
+# Время кеширования файлов с хешем в имени, в секундах
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class StaticAssetsMiddleware:
+    """Отдает собранную статику из ``STATIC_ROOT``.
+
+    Файлы с хешем в имени кешируются браузером навсегда. Если клиент
+    принимает сжатый ответ и при сборке статики была создана сжатая копия,
+    отдается она. Под ASGI файл открывается в потоке, не блокируя цикл
+    событий.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if self.is_static(request):
+            response = self.serve(request, request.path[len(settings.STATIC_URL):])
+            if response is not None:
+                return response
+
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.is_static(request):
+            response = await sync_to_async(self.serve, thread_sensitive=False)(
+                request, request.path[len(settings.STATIC_URL):])
+            if response is not None:
+                return response
+
+        return await self.get_response(request)
+
+    @staticmethod
+    def is_static(request):
+        return request.method in ('GET', 'HEAD') and request.path.startswith(settings.STATIC_URL)
+
+    def serve(self, request, name):
+        """Возвращает ответ с файлом статики или ``None``, если файла нет."""
+        if not settings.STATIC_ROOT:
+            return None
+
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except ValueError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        filename = os.path.basename(path)
+        path, encoding = compressed_path(path, request.headers.get('Accept-Encoding', ''))
+        response = FileResponse(
+            open(path, 'rb'), content_type=content_type, filename=filename)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if is_hashed(name):
+            patch_cache_control(
+                response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, no_cache=True)
+
+        return response
+
+
+# Манифест хранилища и множество имен файлов с хешем из него
+_hashed_names = None, frozenset()
+
+
+def is_hashed(name):
+    """Проверяет, что файл статики собран с хешем содержимого в имени."""
+    global _hashed_names
+
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', None)
+    if not hashed_files:
+        return False
+
+    if _hashed_names[0] is not hashed_files:
+        _hashed_names = hashed_files, frozenset(hashed_files.values())
+
+    return name in _hashed_names[1]
+
+
+class MetricsMiddleware:
+    """Записывает метрики запросов по представлениям.
+
+    Для каждого запроса учитываются время обработки, размер ответа, число
+    и время SQL-запросов во всех БД.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with execute_wrappers(queries):
+            response = self.get_response(request)
+        self.record(request, response, queries, time.perf_counter() - started)
+
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryCounter()
+        started = time.perf_counter()
+        async with aexecute_wrappers(queries):
+            response = await self.get_response(request)
+        self.record(request, response, queries, time.perf_counter() - started)
+
+        return response
+
+    @staticmethod
+    def record(request, response, queries, duration):
+        """Записывает метрики обработанного запроса."""
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else 'unmatched'
+        labels = ('view', view),
+        registry.inc('med_http_requests_total', labels + (
+            ('method', request.method), ('status', str(response.status_code))))
+        registry.observe('med_http_request_duration_seconds', labels, duration)
+        if not response.streaming:
+            registry.observe('med_http_response_size_bytes', labels, len(response.content))
+        registry.observe('med_db_queries_per_request', labels, queries.count)
+        registry.observe('med_db_duration_per_request_seconds', labels, queries.duration)
+        registry.flush()
+
+
+class QueryCounter:
+    """Обертка выполнения SQL-запросов, считающая их число и время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class QueryInspectorMiddleware:
+    """Ищет N+1 запросы и превышение бюджета запросов в каждом запросе.
+
+    Работает при ``RECEPTION_QUERY_INSPECTION``. Проблемы пишутся в лог,
+    а при ``RECEPTION_QUERY_INSPECTION = 'raise'`` приводят к исключению.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not settings.RECEPTION_QUERY_INSPECTION:
+            return self.get_response(request)
+
+        with inspect_queries() as inspector:
+            response = self.get_response(request)
+        self.check(request, inspector)
+
+        return response
+
+    async def __acall__(self, request):
+        if not settings.RECEPTION_QUERY_INSPECTION:
+            return await self.get_response(request)
+
+        async with ainspect_queries() as inspector:
+            response = await self.get_response(request)
+        self.check(request, inspector)
+
+        return response
+
+    @staticmethod
+    def check(request, inspector):
+        """Пишет в лог или выбрасывает найденные в запросе проблемы."""
+        report = inspector.report(
+            request.path, get_query_budget(request.resolver_match))
+        if report:
+            if settings.RECEPTION_QUERY_INSPECTION == 'raise':
+                raise NPlusOneError(report)
+            logger.warning(report)
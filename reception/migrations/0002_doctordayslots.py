@@ -0,0 +1,50 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from reception.slots import time_to_slot
+
+
+def build_slot_index(apps, schema_editor):
+    """Заполняет индекс занятости по существующим карточкам приема."""
+    Reception = apps.get_model('reception', 'Reception')
+    DoctorDaySlots = apps.get_model('reception', 'DoctorDaySlots')
+
+    masks = {}
+    for doctor_id, date, time in Reception.objects.values_list(
+            'doctor_id', 'date', 'time').iterator():
+        slot = time_to_slot(time)
+        if slot is not None:
+            masks[doctor_id, date] = masks.get((doctor_id, date), 0) | (1 << slot)
+
+    DoctorDaySlots.objects.bulk_create(
+        (DoctorDaySlots(doctor_id=doctor_id, date=date, busy_mask=mask)
+         for (doctor_id, date), mask in masks.items()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDaySlots',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('busy_mask', models.PositiveIntegerField(default=0, verbose_name='Занятые часы')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reception.doctor', verbose_name='Врач')),
+            ],
+            options={
+                'verbose_name': 'Занятость врача',
+                'verbose_name_plural': 'Занятость врачей',
+                'db_table': 'doctor_day_slots',
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+        migrations.RunPython(build_slot_index, migrations.RunPython.noop),
+    ]
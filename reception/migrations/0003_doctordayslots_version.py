@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0002_doctordayslots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctordayslots',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Версия'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0003_doctordayslots_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reception',
+            index=models.Index(fields=['date', 'time', 'id'], name='receptions_date_time_idx'),
+        ),
+    ]
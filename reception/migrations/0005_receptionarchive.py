@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0004_reception_date_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceptionArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('time', models.TimeField(verbose_name='Время посещения')),
+                ('fio', models.CharField(max_length=150, verbose_name='ФИО')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reception.doctor', verbose_name='К врачу')),
+            ],
+            options={
+                'verbose_name': 'Архивная карточка приема',
+                'verbose_name_plural': 'Архивные карточки приема',
+                'db_table': 'receptions_archive',
+                'indexes': [models.Index(fields=['date', 'time', 'id'], name='archive_date_time_idx'), models.Index(fields=['fio'], name='archive_fio_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0005_receptionarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('time', models.TimeField(verbose_name='Время посещения')),
+                ('owner', models.CharField(db_index=True, max_length=40, verbose_name='Владелец')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Действует до')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reception.doctor', verbose_name='К врачу')),
+            ],
+            options={
+                'verbose_name': 'Бронь времени приема',
+                'verbose_name_plural': 'Брони времени приема',
+                'db_table': 'slot_holds',
+                'unique_together': {('doctor', 'date', 'time')},
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0006_slothold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClinicHoliday',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('name', models.CharField(blank=True, max_length=100, verbose_name='Название')),
+            ],
+            options={
+                'verbose_name': 'Праздничный день',
+                'verbose_name_plural': 'Праздничные дни',
+                'db_table': 'clinic_holidays',
+                'ordering': ('date',),
+            },
+        ),
+        migrations.CreateModel(
+            name='DoctorSchedule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Понедельник'), (1, 'Вторник'), (2, 'Среда'), (3, 'Четверг'), (4, 'Пятница'), (5, 'Суббота'), (6, 'Воскресенье')], verbose_name='День недели')),
+                ('start_time', models.TimeField(verbose_name='Начало приема')),
+                ('end_time', models.TimeField(verbose_name='Окончание приема')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reception.doctor', verbose_name='Врач')),
+            ],
+            options={
+                'verbose_name': 'Смена врача',
+                'verbose_name_plural': 'Расписание врачей',
+                'db_table': 'doctor_schedules',
+                'ordering': ('doctor', 'weekday', 'start_time'),
+            },
+        ),
+        migrations.CreateModel(
+            name='SlotCalendar',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateField(verbose_name='Начало')),
+                ('masks', models.BinaryField(verbose_name='Часы приема')),
+                ('version', models.PositiveBigIntegerField(verbose_name='Версия')),
+                ('doctor', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='reception.doctor', verbose_name='Врач')),
+            ],
+            options={
+                'verbose_name': 'Календарь приема',
+                'verbose_name_plural': 'Календари приема',
+                'db_table': 'slot_calendars',
+            },
+        ),
+        migrations.CreateModel(
+            name='ScheduleException',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('start_time', models.TimeField(blank=True, null=True, verbose_name='Начало приема')),
+                ('end_time', models.TimeField(blank=True, null=True, verbose_name='Окончание приема')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reception.doctor', verbose_name='Врач')),
+            ],
+            options={
+                'verbose_name': 'Исключение из расписания',
+                'verbose_name_plural': 'Исключения из расписания',
+                'db_table': 'schedule_exceptions',
+                'ordering': ('doctor', 'date', 'start_time'),
+                'indexes': [models.Index(fields=['doctor', 'date'], name='schedule_exception_day_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0007_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reception',
+            name='duration',
+            field=models.PositiveSmallIntegerField(choices=[(15, '15 минут'), (30, '30 минут'), (45, '45 минут'), (60, '1 час'), (90, '1,5 часа'), (120, '2 часа')], default=60, verbose_name='Длительность приема'),
+        ),
+        migrations.AddField(
+            model_name='receptionarchive',
+            name='duration',
+            field=models.PositiveSmallIntegerField(choices=[(15, '15 минут'), (30, '30 минут'), (45, '45 минут'), (60, '1 час'), (90, '1,5 часа'), (120, '2 часа')], default=60, verbose_name='Длительность приема'),
+        ),
+    ]
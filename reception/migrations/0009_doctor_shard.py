@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0008_reception_duration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='shard',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32, verbose_name='Шард'),
+        ),
+    ]
@@ -1,5 +1,10 @@
+import datetime
+
+from django.core.exceptions import ValidationError
 from django.db import models
 
+from reception.intervals import DEFAULT_DURATION, DURATIONS
+from reception.sharding import ShardedQuerySet
 from reception.validators import validate_week_day, validate_not_past_date
 
 
@@ -9,6 +14,11 @@ class Doctor(models.Model):
     name = models.CharField('Имя', max_length=50)
     surname = models.CharField('Фамилия', max_length=50)
     patronymic = models.CharField('Отчество', max_length=50)
+    # Длительность приема пациента, записавшегося через сайт
+    duration = models.PositiveSmallIntegerField(
+        'Длительность приема', choices=DURATIONS, default=DEFAULT_DURATION)
+    # Алиас БД с карточками приема врача, см. reception.sharding
+    shard = models.CharField('Шард', max_length=32, blank=True, default='', editable=False)
 
     class Meta:
         db_table = 'doctors'
@@ -20,20 +30,238 @@ class Doctor(models.Model):
 
 
 class Reception(models.Model):
-    """Карточка записи на прием."""
+    """Карточка записи на прием.
+
+    Прием занимает интервал от времени посещения длительностью ``duration``
+    минут и не должен занимать часовые слоты других приемов врача.
+    """
 
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name='К врачу')
     date = models.DateField(
         'Дата', validators=[validate_week_day, validate_not_past_date])
     time = models.TimeField('Время посещения', auto_now_add=False, default='09:00')
+    duration = models.PositiveSmallIntegerField(
+        'Длительность приема', choices=DURATIONS, default=DEFAULT_DURATION)
     fio = models.CharField('ФИО', max_length=150)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         db_table = 'receptions'
         verbose_name = 'Карточка приема'
         verbose_name_plural = 'Карточки приема'
         unique_together = 'doctor', 'date', 'time'
+        indexes = [
+            models.Index(fields=['date', 'time', 'id'], name='receptions_date_time_idx'),
+        ]
 
     def __str__(self):
         return f'{self.doctor}: {self.date} {self.time}'
 
+    def clean(self):
+        # Ошибки выходного или прошедшего дня выводят валидаторы поля даты
+        from reception import intervals, schedule, sharding
+
+        if self.pk is not None and self._state.db and self.doctor_id is not None:
+            alias = sharding.shard_for(self.doctor_id)
+            if alias and alias != self._state.db:
+                raise ValidationError({'doctor': sharding.MOVE_MESSAGE})
+
+        if (self.doctor_id is None or not isinstance(self.date, datetime.date)
+                or not isinstance(self.time, datetime.time)
+                or self.date < datetime.date.today()
+                or schedule.is_clinic_day_off(self.date)):
+            return
+
+        if not schedule.in_horizon(self.date):
+            raise ValidationError({'date': schedule.HORIZON_MESSAGE})
+        if not schedule.is_open(self.doctor_id, self.date, self.time, self.duration):
+            raise ValidationError({'time': schedule.CLOSED_MESSAGE})
+        if self.overlapping():
+            raise ValidationError(intervals.OVERLAP_MESSAGE, code='overlap')
+
+    def overlapping(self):
+        """Возвращает карточки врача, пересекающие прием по времени.
+
+        Карточки с тем же временем начала не возвращаются: их находит
+        проверка уникальности.
+
+        :rtype list of Reception
+        """
+        from reception import intervals
+
+        return [
+            reception for reception in intervals.find_overlapping(
+                self.doctor_id, self.date, self.time, self.duration, exclude_pk=self.pk)
+            if reception.time != self.time]
+
+
+class DoctorDaySlots(models.Model):
+    """Занятость врача на дату - битовая маска часов приема."""
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name='Врач')
+    date = models.DateField('Дата')
+    busy_mask = models.PositiveIntegerField('Занятые часы', default=0)
+    version = models.PositiveIntegerField('Версия', default=1)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'doctor_day_slots'
+        verbose_name = 'Занятость врача'
+        verbose_name_plural = 'Занятость врачей'
+        unique_together = 'doctor', 'date'
+
+    def __str__(self):
+        return f'{self.doctor_id}: {self.date} {self.busy_mask:09b} v{self.version}'
+
+
+class ReceptionArchive(models.Model):
+    """Архивная карточка записи на прием.
+
+    Идентификатор совпадает с идентификатором исходной карточки.
+    """
+
+    id = models.IntegerField(primary_key=True)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name='К врачу')
+    date = models.DateField('Дата')
+    time = models.TimeField('Время посещения')
+    duration = models.PositiveSmallIntegerField(
+        'Длительность приема', choices=DURATIONS, default=DEFAULT_DURATION)
+    fio = models.CharField('ФИО', max_length=150)
+    archived_at = models.DateTimeField('Дата архивации', auto_now_add=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'receptions_archive'
+        verbose_name = 'Архивная карточка приема'
+        verbose_name_plural = 'Архивные карточки приема'
+        indexes = [
+            models.Index(fields=['date', 'time', 'id'], name='archive_date_time_idx'),
+            models.Index(fields=['fio'], name='archive_fio_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.doctor}: {self.date} {self.time}'
+
+
+class SlotHold(models.Model):
+    """Временная бронь часа приема врача."""
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name='К врачу')
+    date = models.DateField('Дата')
+    time = models.TimeField('Время посещения')
+    owner = models.CharField('Владелец', max_length=40, db_index=True)
+    expires_at = models.DateTimeField('Действует до', db_index=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'slot_holds'
+        verbose_name = 'Бронь времени приема'
+        verbose_name_plural = 'Брони времени приема'
+        unique_together = 'doctor', 'date', 'time'
+
+    def __str__(self):
+        return f'{self.doctor_id}: {self.date} {self.time} до {self.expires_at}'
+
+
+class ClinicHoliday(models.Model):
+    """Праздничный день, в который клиника не работает."""
+
+    date = models.DateField('Дата', unique=True)
+    name = models.CharField('Название', max_length=100, blank=True)
+
+    class Meta:
+        db_table = 'clinic_holidays'
+        verbose_name = 'Праздничный день'
+        verbose_name_plural = 'Праздничные дни'
+        ordering = 'date',
+
+    def __str__(self):
+        return f'{self.date} {self.name}'.strip()
+
+
+class DoctorSchedule(models.Model):
+    """Смена врача в недельном расписании.
+
+    Врач без смен принимает в часы работы клиники. В один день недели
+    может быть несколько смен, например, до и после перерыва.
+    """
+
+    WEEKDAYS = (
+        (0, 'Понедельник'),
+        (1, 'Вторник'),
+        (2, 'Среда'),
+        (3, 'Четверг'),
+        (4, 'Пятница'),
+        (5, 'Суббота'),
+        (6, 'Воскресенье'),
+    )
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name='Врач')
+    weekday = models.PositiveSmallIntegerField('День недели', choices=WEEKDAYS)
+    start_time = models.TimeField('Начало приема')
+    end_time = models.TimeField('Окончание приема')
+
+    class Meta:
+        db_table = 'doctor_schedules'
+        verbose_name = 'Смена врача'
+        verbose_name_plural = 'Расписание врачей'
+        ordering = 'doctor', 'weekday', 'start_time'
+
+    def __str__(self):
+        return (f'{self.doctor_id}: {self.get_weekday_display()} '
+                f'{self.start_time:%H:%M}-{self.end_time:%H:%M}')
+
+
+class ScheduleException(models.Model):
+    """Исключение из недельного расписания врача на дату.
+
+    Часы приема врача на дату с исключениями - объединение часов
+    исключений. Исключение без времени приема означает выходной.
+    """
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name='Врач')
+    date = models.DateField('Дата')
+    start_time = models.TimeField('Начало приема', null=True, blank=True)
+    end_time = models.TimeField('Окончание приема', null=True, blank=True)
+
+    class Meta:
+        db_table = 'schedule_exceptions'
+        verbose_name = 'Исключение из расписания'
+        verbose_name_plural = 'Исключения из расписания'
+        ordering = 'doctor', 'date', 'start_time'
+        indexes = [
+            models.Index(fields=['doctor', 'date'], name='schedule_exception_day_idx'),
+        ]
+
+    def __str__(self):
+        if self.start_time is None or self.end_time is None:
+            return f'{self.doctor_id}: {self.date} выходной'
+
+        return f'{self.doctor_id}: {self.date} {self.start_time:%H:%M}-{self.end_time:%H:%M}'
+
+
+class SlotCalendar(models.Model):
+    """Рассчитанный календарь часов приема врача или клиники.
+
+    Маски часов приема на каждый день, начиная с ``start``, хранятся
+    массивом по два байта на день. Календарь клиники хранится в строке
+    без врача.
+    """
+
+    doctor = models.OneToOneField(
+        Doctor, on_delete=models.CASCADE, null=True, blank=True, verbose_name='Врач')
+    start = models.DateField('Начало')
+    masks = models.BinaryField('Часы приема')
+    version = models.PositiveBigIntegerField('Версия')
+
+    class Meta:
+        db_table = 'slot_calendars'
+        verbose_name = 'Календарь приема'
+        verbose_name_plural = 'Календари приема'
+
+    def __str__(self):
+        return f'{self.doctor_id or "Клиника"}: с {self.start}, {len(self.masks) // 2} дн.'
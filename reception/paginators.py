@@ -0,0 +1,113 @@
+"""Пагинация больших списков карточек приема."""
+import datetime
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class KeysetPage(Page):
+    """Страница с курсором для перехода на следующую страницу."""
+
+    def __init__(self, object_list, number, paginator, has_next=None):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        if self._has_next is not None:
+            return self._has_next
+        return super().has_next()
+
+    @cached_property
+    def next_cursor(self):
+        """Курсор последней записи страницы или None."""
+        if (not self.paginator.is_keyset_ordered or not self.has_next()
+                or not self.object_list):
+            return None
+
+        last = self.object_list[len(self.object_list) - 1]
+        return self.paginator.make_cursor(last)
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор по ключу (date, time, id) с ограниченным подсчетом записей.
+
+    Если передан курсор и список отсортирован по ключу по возрастанию или
+    по убыванию, страница выбирается условием по ключу вместо OFFSET,
+    поэтому ее стоимость не зависит от номера. Количество записей считается
+    не дальше ``count_limit``: при превышении ``count`` равен
+    ``count_limit``, а ``count_is_estimate`` - True.
+    """
+
+    keyset = 'date', 'time', 'id'
+
+    def __init__(self, object_list, per_page, cursor=None, count_limit=10000,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cursor = cursor
+        self.count_limit = count_limit
+        self.current_page = None
+
+    @cached_property
+    def count(self):
+        return min(
+            self.object_list[:self.count_limit + 1].count(), self.count_limit)
+
+    @cached_property
+    def count_is_estimate(self):
+        """Является ли количество записей оценкой снизу."""
+        return self.count >= self.count_limit
+
+    @property
+    def is_keyset_ordered(self):
+        """Отсортирован ли список по ключу пагинации."""
+        # Админка может повторить поля сортировки, повторы не важны
+        ordering = tuple(dict.fromkeys(self.object_list.query.order_by))
+        return ordering in (self.keyset, tuple(f'-{field}' for field in self.keyset))
+
+    @property
+    def is_descending(self):
+        """Отсортирован ли список по убыванию ключа."""
+        return self.object_list.query.order_by[0].startswith('-')
+
+    def validate_number(self, number):
+        if self.count_is_estimate:
+            # Реальное количество страниц неизвестно, проверяем только нижнюю
+            # границу, пустая страница за пределами списка допустима
+            return max(int(number), 1)
+        return super().validate_number(number)
+
+    def make_cursor(self, obj):
+        """Возвращает курсор записи в виде строки."""
+        return f'{obj.date.isoformat()},{obj.time.isoformat()},{obj.id}'
+
+    def parse_cursor(self, cursor):
+        """Разбирает курсор, возвращает (date, time, id) или None."""
+        try:
+            date, time, id_ = cursor.split(',')
+            return (datetime.date.fromisoformat(date),
+                    datetime.time.fromisoformat(time), int(id_))
+        except (AttributeError, ValueError):
+            return None
+
+    def page(self, number):
+        key = self.parse_cursor(self.cursor)
+        if key is None or not self.is_keyset_ordered:
+            self.current_page = super().page(number)
+            return self.current_page
+
+        date, time, id_ = key
+        lookup = 'lt' if self.is_descending else 'gt'
+        rows = list(self.object_list.filter(
+            Q(**{f'date__{lookup}': date})
+            | Q(date=date, **{f'time__{lookup}': time})
+            | Q(date=date, time=time, **{f'id__{lookup}': id_})
+        )[:self.per_page + 1])
+
+        self.current_page = KeysetPage(
+            rows[:self.per_page], self.validate_number(number), self,
+            has_next=len(rows) > self.per_page)
+        return self.current_page
+
+    def _get_page(self, *args, **kwargs):
+        return KeysetPage(*args, **kwargs)
@@ -0,0 +1,145 @@
+"""Поиск N+1 запросов и проверка бюджета SQL-запросов представлений.
+
+За время запроса SQL-запросы группируются по виду: текст запроса без
+значений параметров. Вид, повторившийся ``RECEPTION_NPLUSONE_THRESHOLD``
+раз, считается N+1 - обычно это обращение к связанному объекту в цикле.
+Для такого вида запоминается стек вызова, на котором порог был достигнут.
+
+Бюджеты запросов объявлены для маршрутов в ``med/urls.py`` и проверяются
+тестами, а при включенной проверке - и на каждом запросе.
+"""
+import collections
+import contextlib
+import logging
+import re
+import traceback
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Значения, которые не меняют вид запроса
+IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+class NPlusOneError(AssertionError):
+    """Найден N+1 запрос или превышен бюджет запросов."""
+
+
+def query_shape(sql):
+    """Возвращает вид SQL-запроса без значений параметров.
+
+    :rtype str
+    """
+    return LITERAL_RE.sub('?', IN_LIST_RE.sub('(...)', sql))
+
+
+def caller_stack():
+    """Возвращает стек вызова из кода проекта без кода Django и библиотек."""
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(str(settings.BASE_DIR))
+        and 'site-packages' not in frame.filename
+        and not frame.filename.endswith('querycheck.py')
+    ]
+
+    return ''.join(traceback.format_list(frames))
+
+
+class QueryInspector:
+    """Обертка выполнения SQL-запросов, группирующая их по виду."""
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or settings.RECEPTION_NPLUSONE_THRESHOLD
+        self.count = 0
+        self.shapes = collections.Counter()
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        shape = query_shape(sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == self.threshold:
+            self.stacks[shape] = caller_stack()
+
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """Возвращает повторяющиеся запросы со стеком вызова.
+
+        :return Кортежи (вид запроса, число повторов, стек)
+        :rtype list of tuple
+        """
+        return [
+            (shape, self.shapes[shape], stack)
+            for shape, stack in self.stacks.items()]
+
+    def report(self, view, budget=None):
+        """Возвращает описание найденных проблем или пустую строку."""
+        problems = [
+            f'N+1 в {view}: {count} запросов вида\n    {shape}\nВызов:\n{stack}'
+            for shape, count, stack in self.repeated()]
+        if budget is not None and self.count > budget:
+            problems.append(
+                f'{view} выполнил {self.count} SQL-запросов при бюджете {budget}')
+
+        return '\n'.join(problems)
+
+
+def enter_wrappers(stack, wrapper):
+    """Ставит обертку выполнения SQL-запросов на соединения всех БД потока."""
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+@contextlib.contextmanager
+def execute_wrappers(wrapper):
+    """Оборачивает SQL-запросы всех БД, выполненные внутри блока."""
+    with contextlib.ExitStack() as stack:
+        enter_wrappers(stack, wrapper)
+        yield wrapper
+
+
+@contextlib.asynccontextmanager
+async def aexecute_wrappers(wrapper):
+    """Асинхронный вариант ``execute_wrappers``.
+
+    Соединения с БД у каждого потока свои, а синхронные представления и ORM
+    под ASGI работают в потоке ``sync_to_async``. Поэтому обертки ставятся
+    и снимаются в этом потоке, а не в потоке цикла событий.
+    """
+    stack = contextlib.ExitStack()
+    await sync_to_async(enter_wrappers)(stack, wrapper)
+    try:
+        yield wrapper
+    finally:
+        await sync_to_async(stack.close)()
+
+
+def inspect_queries(threshold=None):
+    """Собирает SQL-запросы всех БД, выполненные внутри блока."""
+    return execute_wrappers(QueryInspector(threshold))
+
+
+def ainspect_queries(threshold=None):
+    """Асинхронный вариант ``inspect_queries``."""
+    return aexecute_wrappers(QueryInspector(threshold))
+
+
+def get_query_budget(resolver_match):
+    """Возвращает бюджет запросов маршрута из ``QUERY_BUDGETS`` в ``ROOT_URLCONF``.
+
+    Маршрут ищется по имени, маршруты админки - по пространству имен.
+
+    :rtype int or None
+    """
+    if resolver_match is None:
+        return None
+
+    budgets = getattr(import_module(settings.ROOT_URLCONF), 'QUERY_BUDGETS', {})
+
+    return budgets.get(resolver_match.namespace or resolver_match.url_name)
@@ -0,0 +1,115 @@
+"""Маршрутизация запросов чтения на реплики БД и запросов к шардам.
+
+По умолчанию все запросы идут в основную БД ``default``. Чтение уходит на
+реплику только внутри ``read_from_replica()`` (или в представлении с
+декоратором ``replica_reads``), поэтому запись и чтение собственных записей
+(проверка формы и уникальности при создании карточки) всегда выполняются в
+основной БД. Реплики перечисляются в ``settings.RECEPTION_READ_REPLICAS``.
+
+Данные врачей при шардировании направляются в шард врача маршрутизатором
+``ShardRouter``, который стоит перед ``ReplicaRouter``.
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import random
+
+from django.conf import settings
+
+_read_from_replica = contextvars.ContextVar(
+    'reception_read_from_replica', default=False)
+
+# Шард, в который направляются запросы к данным врача, см. reception.sharding
+_shard = contextvars.ContextVar('reception_shard', default=None)
+
+
+@contextlib.contextmanager
+def read_from_replica():
+    """Направляет чтение внутри блока на реплики."""
+    token = _read_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+@contextlib.contextmanager
+def use_primary():
+    """Направляет чтение внутри блока в основную БД."""
+    token = _read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def replica_reads(view):
+    """Декоратор представления, читающего данные с реплик."""
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            with read_from_replica():
+                return await view(*args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with read_from_replica():
+                return view(*args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Маршрутизатор чтения на реплики.
+
+    Вне ``read_from_replica()`` решение остается за следующими
+    маршрутизаторами, по умолчанию это основная БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.RECEPTION_READ_REPLICAS
+        if replicas and _read_from_replica.get():
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат копию основной БД
+        return True
+
+
+class ShardRouter:
+    """Маршрутизатор данных врачей в их шарды.
+
+    Сохраняемый или удаляемый объект направляется в БД, из которой он
+    прочитан, а новый - в шард его врача, запросы к связанным с врачом
+    объектам - в шард врача. Запросы без объекта направляются
+    в шард, выбранный ``reception.sharding.for_doctor()``. Если шард
+    не выбран, решение остается за следующими маршрутизаторами.
+    """
+
+    def db_for_read(self, model, **hints):
+        from reception import sharding
+
+        if not sharding.is_sharded(model):
+            return None
+
+        instance = hints.get('instance')
+        if instance is not None and sharding.is_sharded(type(instance)):
+            if instance._state.db:
+                return instance._state.db
+            alias = sharding.shard_for(instance.doctor_id)
+            if alias:
+                return alias
+        elif instance is not None and instance._meta.model_name == 'doctor':
+            # Карточки, связанные с врачом, например doctor.reception_set
+            alias = sharding.shard_for(instance.pk)
+            if alias:
+                return alias
+
+        return _shard.get()
+
+    db_for_write = db_for_read
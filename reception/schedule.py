@@ -0,0 +1,443 @@
+"""Календарь часов приема клиники и врачей.
+
+Часы приема складываются из часов работы клиники
+(``settings.RECEPTION_CLINIC_HOURS``), праздников ``ClinicHoliday``,
+недельного расписания врача ``DoctorSchedule`` и исключений из него
+``ScheduleException``. Расписание не разбирается на каждом запросе: по нему
+заранее рассчитывается календарь на ``settings.RECEPTION_CALENDAR_DAYS``
+дней вперед - для клиники и каждого врача массив битовых масок часов приема
+по дням (бит ``i`` соответствует часу ``slots.WORKING_HOURS[i]``). Массив
+хранится одной строкой ``SlotCalendar`` и кешируется, поэтому проверка
+часа приема - это чтение элемента массива.
+
+Маски недельного расписания одинаковы для всех недель горизонта, поэтому
+массив врача собирается повторением маски недели, а праздники и исключения
+накладываются поверх. Массив по одному недельному расписанию строится один
+раз для всех врачей с этим расписанием.
+
+Календарь врача пересчитывается при изменении его расписания, календари
+всех врачей - при изменении праздников. Горизонт сдвигается командой
+``build_calendar``, которую следует запускать ежедневно. Календарь, не
+покрывающий запрошенную дату горизонта, пересчитывается при чтении - только
+для запрошенных врачей и клиники, остальные календари ждут своего запроса
+или ``build_calendar``.
+"""
+import array
+import datetime
+import sys
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from reception import intervals, slots
+from reception.routers import use_primary
+
+CLOSED_MESSAGE = 'Врач не принимает в выбранное время.'
+HORIZON_MESSAGE = 'Запись на выбранную дату еще не открыта.'
+
+# Тип элемента массива масок - два байта без знака на день
+MASK_TYPECODE = 'H'
+
+# Время хранения календаря в кеше, в секундах
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def cache_key(doctor_id):
+    return f'calendar:{doctor_id or "clinic"}'
+
+
+def hours_mask(start_time, end_time):
+    """Возвращает маску часов приема, начинающихся в промежутке [start_time, end_time).
+
+    :param start_time: Начало приема
+    :type start_time: datetime.time or None
+    :param end_time: Окончание приема
+    :type end_time: datetime.time or None
+
+    :rtype int
+    """
+    if start_time is None or end_time is None:
+        return 0
+
+    mask = 0
+    for slot, hour in enumerate(slots.WORKING_HOURS):
+        if start_time <= datetime.time(hour) < end_time:
+            mask |= 1 << slot
+
+    return mask
+
+
+def clinic_week():
+    """Возвращает маски часов работы клиники по дням недели.
+
+    :rtype tuple
+    """
+    week = [0] * 7
+    for weekday, (start_time, end_time) in settings.RECEPTION_CLINIC_HOURS.items():
+        week[weekday] = hours_mask(
+            datetime.time.fromisoformat(start_time), datetime.time.fromisoformat(end_time))
+
+    return tuple(week)
+
+
+def encode(masks):
+    """Возвращает массив масок в виде байтов, не зависящих от платформы."""
+    if sys.byteorder == 'big':
+        masks = array.array(MASK_TYPECODE, masks)
+        masks.byteswap()
+
+    return masks.tobytes()
+
+
+def decode(data):
+    """Возвращает массив масок из байтов ``encode``."""
+    masks = array.array(MASK_TYPECODE)
+    masks.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        masks.byteswap()
+
+    return masks
+
+
+def week_column(week, start, days):
+    """Возвращает маски дней горизонта по маскам недели.
+
+    :param week: Маски по дням недели, начиная с понедельника
+    :type week: tuple
+    :param start: Первый день горизонта
+    :type start: datetime.date
+    :param days: Длина горизонта в днях
+    :type days: int
+
+    :rtype array.array
+    """
+    offset = start.weekday()
+    first_week = array.array(
+        MASK_TYPECODE, (week[(offset + i) % 7] for i in range(7)))
+    column = first_week * (days // 7 + 1)
+    del column[days:]
+
+    return column
+
+
+def build(doctor_ids=None, start=None, days=None):
+    """Рассчитывает и сохраняет календари часов приема.
+
+    Врач принимает только в дни работы клиники: праздники и выходные дни
+    клиники закрываются в календарях всех врачей.
+
+    :param doctor_ids: Идентификаторы врачей, None среди них - календарь
+                       клиники, None вместо них - календарь клиники
+                       и всех врачей
+    :type doctor_ids: iterable of int or None
+    :param start: Первый день горизонта, по умолчанию - сегодня
+    :type start: datetime.date
+    :param days: Длина горизонта в днях
+    :type days: int
+
+    :return Календари (начало, байты масок, версия) по врачам, календарь
+            клиники - под ключом None
+    :rtype dict
+    """
+    from reception.models import (
+        ClinicHoliday, Doctor, DoctorSchedule, ScheduleException)
+
+    start = start or datetime.date.today()
+    days = days or settings.RECEPTION_CALENDAR_DAYS
+    end = start + datetime.timedelta(days=days)
+
+    with_clinic = doctor_ids is None or None in doctor_ids
+    doctors = Doctor.objects.order_by('id')
+    if doctor_ids is not None:
+        doctors = doctors.filter(id__in={id_ for id_ in doctor_ids if id_ is not None})
+    ids = list(doctors.values_list('id', flat=True))
+
+    schedules = DoctorSchedule.objects.order_by()
+    exceptions = ScheduleException.objects.order_by().filter(date__gte=start, date__lt=end)
+    if doctor_ids is not None:
+        schedules = schedules.filter(doctor__in=ids)
+        exceptions = exceptions.filter(doctor__in=ids)
+
+    weeks = {}
+    for doctor_id, weekday, start_time, end_time in schedules.values_list(
+            'doctor_id', 'weekday', 'start_time', 'end_time'):
+        week = weeks.setdefault(doctor_id, [0] * 7)
+        week[weekday] |= hours_mask(start_time, end_time)
+
+    exception_masks = {}
+    for doctor_id, date, start_time, end_time in exceptions.values_list(
+            'doctor_id', 'date', 'start_time', 'end_time'):
+        day_masks = exception_masks.setdefault(doctor_id, {})
+        position = (date - start).days
+        day_masks[position] = day_masks.get(position, 0) | hours_mask(start_time, end_time)
+
+    clinic = week_column(clinic_week(), start, days)
+    for date in ClinicHoliday.objects.filter(
+            date__gte=start, date__lt=end).values_list('date', flat=True):
+        clinic[(date - start).days] = 0
+    closed_positions = [position for position, mask in enumerate(clinic) if not mask]
+
+    columns = {}
+    calendars = {}
+    for doctor_id in ids:
+        week = tuple(weeks.get(doctor_id, ()))
+        if week not in columns:
+            if week:
+                column = week_column(week, start, days)
+                for position in closed_positions:
+                    column[position] = 0
+            else:
+                column = clinic
+            columns[week] = column
+
+        masks = columns[week]
+        day_masks = exception_masks.get(doctor_id)
+        if day_masks:
+            masks = array.array(MASK_TYPECODE, masks)
+            for position, mask in day_masks.items():
+                if clinic[position]:
+                    masks[position] = mask
+        calendars[doctor_id] = masks
+
+    if with_clinic:
+        calendars[None] = clinic
+
+    return save(calendars, start)
+
+
+def save(calendars, start):
+    """Сохраняет рассчитанные календари в БД и кеш.
+
+    Кеш заполняется сразу и повторно после фиксации транзакции, чтобы
+    его не перезаписал календарь, прочитанный из БД до фиксации.
+
+    Версия календаря - время расчета в микросекундах, поэтому версии
+    пересчитанного календаря не повторяются без чтения прежних строк.
+
+    :rtype dict
+    """
+    from reception.models import SlotCalendar
+
+    version = time.time_ns() // 1000
+    encoded = {doctor_id: encode(masks) for doctor_id, masks in calendars.items()}
+
+    with transaction.atomic():
+        SlotCalendar.objects.bulk_create(
+            (SlotCalendar(doctor_id=doctor_id, start=start, masks=data, version=version)
+             for doctor_id, data in encoded.items() if doctor_id is not None),
+            batch_size=500, update_conflicts=True, unique_fields=['doctor'],
+            update_fields=['start', 'masks', 'version'])
+        if None in encoded:
+            data = encoded[None]
+            if not SlotCalendar.objects.filter(doctor=None).update(
+                    start=start, masks=data, version=version):
+                SlotCalendar.objects.create(start=start, masks=data, version=version)
+
+    stored = {doctor_id: (start, data, version) for doctor_id, data in encoded.items()}
+    values = {cache_key(doctor_id): calendar for doctor_id, calendar in stored.items()}
+    cache.set_many(values, CACHE_TIMEOUT)
+    transaction.on_commit(lambda: cache.set_many(values, CACHE_TIMEOUT))
+
+    return stored
+
+
+def covers(calendar, date):
+    """Проверяет, что календарь содержит дату."""
+    start, data, _ = calendar
+    return 0 <= (date - start).days < len(data) // array.array(MASK_TYPECODE).itemsize
+
+
+def in_horizon(date):
+    """Проверяет, что дата входит в горизонт календаря, начинающийся сегодня."""
+    return 0 <= (date - datetime.date.today()).days < settings.RECEPTION_CALENDAR_DAYS
+
+
+def get_calendars(doctor_ids, date=None):
+    """Возвращает календари врачей из кеша или БД.
+
+    Отсутствующие календари и календари, не покрывающие дату ``date``
+    горизонта, рассчитываются заново.
+
+    :param doctor_ids: Идентификаторы врачей, None - календарь клиники
+    :type doctor_ids: iterable of int or None
+    :param date: Дата, которую должны покрывать календари
+    :type date: datetime.date
+
+    :return Календари (начало, байты масок, версия) по врачам
+    :rtype dict
+    """
+    from reception.models import SlotCalendar
+
+    keys = {cache_key(doctor_id): doctor_id for doctor_id in doctor_ids}
+    calendars = {
+        keys[key]: calendar for key, calendar in cache.get_many(keys).items()}
+    missing = [doctor_id for doctor_id in keys.values() if doctor_id not in calendars]
+    if missing:
+        with use_primary():
+            rows = SlotCalendar.objects.filter(doctor__in=[id_ for id_ in missing if id_])
+            if None in missing:
+                rows = rows | SlotCalendar.objects.filter(doctor=None)
+            loaded = {
+                doctor_id: (start, bytes(data), version)
+                for doctor_id, start, data, version in rows.values_list(
+                    'doctor_id', 'start', 'masks', 'version')}
+        cache.set_many(
+            {cache_key(doctor_id): calendar for doctor_id, calendar in loaded.items()},
+            CACHE_TIMEOUT)
+        calendars.update(loaded)
+
+    stale = [
+        doctor_id for doctor_id in keys.values()
+        if doctor_id not in calendars
+        or date is not None and in_horizon(date) and not covers(calendars[doctor_id], date)]
+    if stale:
+        with use_primary():
+            calendars.update(build(stale))
+
+    return calendars
+
+
+def get_calendar(doctor_id, date=None):
+    """Возвращает календарь врача или клиники (начало, байты масок, версия).
+
+    Для несуществующего врача возвращается пустой календарь.
+
+    :rtype tuple
+    """
+    return get_calendars([doctor_id], date).get(doctor_id, (datetime.date.today(), b'', 0))
+
+
+async def aget_calendar(doctor_id, date=None):
+    """Асинхронная версия ``get_calendar``.
+
+    Календарь читается из кеша без потока, а отсутствующий или устаревший
+    календарь загружается и рассчитывается в потоке: расчет сохраняет
+    календари в транзакции.
+
+    :rtype tuple
+    """
+    calendar = await cache.aget(cache_key(doctor_id))
+    if calendar is not None and (
+            date is None or not in_horizon(date) or covers(calendar, date)):
+        return calendar
+
+    return await sync_to_async(get_calendar)(doctor_id, date)
+
+
+def calendar_masks(calendar, dates):
+    """Возвращает маски часов приема календаря на даты.
+
+    :param calendar: Календарь (начало, байты масок, версия)
+    :type calendar: tuple
+    :param dates: Даты
+    :type dates: list of datetime.date
+
+    :rtype list of int
+    """
+    start, data, _ = calendar
+    masks = decode(data)
+
+    return [
+        masks[position] if 0 <= position < len(masks) else 0
+        for position in ((date - start).days for date in dates)]
+
+
+def day_hours(doctor_id, date):
+    """Возвращает маску часов приема врача на дату и версию календаря.
+
+    :param doctor_id: Идентификатор врача, None - клиника
+    :type doctor_id: int or None
+    :param date: Дата
+    :type date: datetime.date
+
+    :rtype tuple
+    """
+    calendar = get_calendar(doctor_id, date)
+
+    return calendar_masks(calendar, [date])[0], calendar[2]
+
+
+async def aday_hours(doctor_id, date):
+    """Асинхронная версия ``day_hours``."""
+    calendar = await aget_calendar(doctor_id, date)
+
+    return calendar_masks(calendar, [date])[0], calendar[2]
+
+
+def is_open(doctor_id, date, time, duration=intervals.DEFAULT_DURATION):
+    """Проверяет, что врач принимает весь прием с указанного времени.
+
+    :param duration: Длительность приема, в минутах
+    :type duration: int
+
+    :rtype bool
+    """
+    start, end = intervals.interval(time, duration)
+    if start < slots.WORKING_HOURS[0] * 60 or end > (slots.WORKING_HOURS[-1] + 1) * 60:
+        return False
+
+    mask = slots.interval_mask(time, duration)
+
+    return day_hours(doctor_id, date)[0] & mask == mask
+
+
+def clinic_days(dates):
+    """Возвращает даты, в которые работает клиника.
+
+    Дата за пределами горизонта считается рабочей, если клиника работает
+    в этот день недели.
+
+    :param dates: Даты
+    :type dates: list of datetime.date
+
+    :rtype list of datetime.date
+    """
+    week = clinic_week()
+    # Календарь должен покрывать последнюю дату, иначе даты после конца
+    # устаревшего календаря окажутся нерабочими
+    masks = calendar_masks(get_calendar(None, max(dates, default=None)), dates)
+
+    return [
+        date for date, mask in zip(dates, masks)
+        if (mask if in_horizon(date) else week[date.weekday()])]
+
+
+def is_clinic_day_off(date):
+    """Проверяет, что клиника не работает в указанную дату.
+
+    :rtype bool
+    """
+    return not clinic_days([date])
+
+
+def picker_options():
+    """Возвращает ограничения виджетов даты и времени по календарю клиники.
+
+    :return Параметры ``daysOfWeekDisabled``, ``disabledDates``
+            и ``enabledHours`` виджетов и версия календаря клиники
+    :rtype tuple
+    """
+    start, data, version = get_calendar(None)
+    week = clinic_week()
+    masks = decode(data)
+
+    open_mask = 0
+    for mask in week:
+        open_mask |= mask
+
+    holidays = [
+        (start + datetime.timedelta(days=position)).isoformat()
+        for position, mask in enumerate(masks)
+        if not mask and week[(start.weekday() + position) % 7]]
+
+    return {
+        # В виджете неделя начинается с воскресенья
+        'daysOfWeekDisabled': [
+            (weekday + 1) % 7 for weekday, mask in enumerate(week) if not mask],
+        'disabledDates': holidays,
+        'enabledHours': [
+            hour for slot, hour in enumerate(slots.WORKING_HOURS) if open_mask & (1 << slot)],
+    }, version
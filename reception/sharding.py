@@ -0,0 +1,313 @@
+"""Шардирование карточек приема по врачам.
+
+Карточки приема, архив, индекс занятости и брони врача хранятся в одной из
+БД ``settings.RECEPTION_SHARDS`` - шарде врача, поэтому записи к разным
+врачам не блокируют друг друга. Шард врача выбирается при его создании
+(шард с наименьшим числом врачей) и хранится в ``Doctor.shard`` - это карта
+шардов. Справочник врачей, расписания, календари и праздники остаются
+в ``default``, а строка врача копируется в его шард, чтобы на ней
+работали внешние ключи карточек.
+
+Запросы к данным врача направляются в его шард внутри ``for_doctor()``,
+сохранение и удаление объекта - в шард по самому объекту. Отчеты по
+нескольким врачам выполняются на каждом шарде параллельно функцией
+``fan_out``, результаты объединяет вызывающий код.
+
+Идентификаторы карточек приема шарда начинаются с ``номер шарда * ID_STEP``,
+поэтому по идентификатору карточки можно найти ее шард.
+
+Без ``RECEPTION_SHARDS`` все данные хранятся в ``default``, а функции модуля
+ничего не меняют.
+"""
+import concurrent.futures
+import contextlib
+import threading
+
+from django.conf import settings
+from django.db import connections, models
+
+from reception.routers import _shard
+
+# Модели, строки которых хранятся в шарде врача
+SHARDED_MODELS = frozenset(['reception', 'receptionarchive', 'doctordayslots', 'slothold'])
+
+# Шаг идентификаторов карточек приема между шардами
+ID_STEP = 10 ** 8
+
+# Таблицы, идентификаторы которых начинаются с номера шарда
+ID_TABLES = 'receptions', 'receptions_archive'
+
+MOVE_MESSAGE = 'Карточку нельзя перенести к врачу, данные которого хранятся в другой БД.'
+
+_lock = threading.Lock()
+_shard_map = {}
+
+
+def get_shards():
+    """Возвращает алиасы БД шардов.
+
+    :rtype list of str
+    """
+    return settings.RECEPTION_SHARDS
+
+
+def is_sharded(model):
+    """Проверяет, хранятся ли строки модели в шардах."""
+    return bool(get_shards()) and model._meta.model_name in SHARDED_MODELS
+
+
+def shard_number(alias):
+    """Возвращает номер шарда, начиная с 1, или 0 для БД вне шардов."""
+    shards = get_shards()
+    return shards.index(alias) + 1 if alias in shards else 0
+
+
+def shard_for(doctor_id):
+    """Возвращает алиас шарда врача или None, если врач неизвестен.
+
+    Шард врача не меняется, поэтому запоминается в карте шардов процесса.
+    Врача, которого нет в карте, читают из ``default`` по идентификатору.
+    Отсутствие врача не запоминается: врач с этим идентификатором может
+    появиться следующим же запросом.
+
+    :param doctor_id: Идентификатор врача
+    :type doctor_id: int
+
+    :rtype str or None
+    """
+    if not get_shards() or doctor_id is None:
+        return None
+
+    alias = _shard_map.get(doctor_id)
+    if alias is None:
+        from reception.models import Doctor
+
+        alias = Doctor.objects.using('default').filter(pk=doctor_id).exclude(
+            shard='').values_list('shard', flat=True).first()
+        if alias is not None:
+            with _lock:
+                _shard_map[doctor_id] = alias
+
+    return alias
+
+
+async def ashard_for(doctor_id):
+    """Асинхронная версия ``shard_for``."""
+    if not get_shards() or doctor_id is None:
+        return None
+
+    alias = _shard_map.get(doctor_id)
+    if alias is None:
+        from reception.models import Doctor
+
+        alias = await Doctor.objects.using('default').filter(pk=doctor_id).exclude(
+            shard='').values_list('shard', flat=True).afirst()
+        if alias is not None:
+            with _lock:
+                _shard_map[doctor_id] = alias
+
+    return alias
+
+
+def shard_for_pk(pk):
+    """Возвращает алиас шарда карточки приема по ее идентификатору.
+
+    :rtype str or None
+    """
+    shards = get_shards()
+    try:
+        number = int(pk) // ID_STEP
+    except (TypeError, ValueError):
+        return None
+
+    return shards[number - 1] if 0 < number <= len(shards) else None
+
+
+def reset():
+    """Сбрасывает карту шардов процесса, например, после смены настроек."""
+    with _lock:
+        _shard_map.clear()
+
+
+@contextlib.contextmanager
+def using_shard(alias):
+    """Направляет запросы к данным врачей внутри блока в шард ``alias``."""
+    token = _shard.set(alias)
+    try:
+        yield
+    finally:
+        _shard.reset(token)
+
+
+def for_doctor(doctor_id):
+    """Направляет запросы к данным врача внутри блока в его шард.
+
+    Для неизвестного врача и без шардирования ничего не меняет.
+
+    :param doctor_id: Идентификатор врача
+    :type doctor_id: int or str or None
+    """
+    try:
+        alias = shard_for(int(doctor_id))
+    except (TypeError, ValueError):
+        alias = None
+
+    return using_shard(alias) if alias else contextlib.nullcontext()
+
+
+async def afor_doctor(doctor_id):
+    """Асинхронная версия ``for_doctor``."""
+    try:
+        alias = await ashard_for(int(doctor_id))
+    except (TypeError, ValueError):
+        alias = None
+
+    return using_shard(alias) if alias else contextlib.nullcontext()
+
+
+def choose_shard():
+    """Возвращает шард для нового врача - шард с наименьшим числом врачей.
+
+    :rtype str
+    """
+    from django.db.models import Count
+
+    from reception.models import Doctor
+
+    counts = dict.fromkeys(get_shards(), 0)
+    counts.update(
+        Doctor.objects.using('default').exclude(shard='').values_list('shard')
+        .annotate(count=Count('id')).values_list('shard', 'count'))
+
+    return min(get_shards(), key=lambda alias: counts.get(alias, 0))
+
+
+def mirror_doctors(doctors):
+    """Копирует строки врачей в их шарды.
+
+    :param doctors: Врачи с назначенным шардом
+    :type doctors: iterable of reception.models.Doctor
+    """
+    from reception.models import Doctor
+
+    by_shard = {}
+    for doctor in doctors:
+        if doctor.shard:
+            by_shard.setdefault(doctor.shard, []).append(doctor)
+    fields = [field.name for field in Doctor._meta.concrete_fields if not field.primary_key]
+
+    for alias, shard_doctors in by_shard.items():
+        Doctor.objects.using(alias).bulk_create(
+            [Doctor(pk=doctor.pk, **{name: getattr(doctor, name) for name in fields})
+             for doctor in shard_doctors],
+            update_conflicts=True, unique_fields=['id'], update_fields=fields)
+
+
+class ShardedQuerySet(models.QuerySet):
+    """Запрос к модели, строки которой хранятся в шарде врача.
+
+    ``QuerySet.create`` выбирает БД до создания объекта, поэтому без явного
+    ``using`` объект сохраняется в БД по маршрутизатору без учета врача.
+    """
+
+    def create(self, **kwargs):
+        if self._db is not None or not is_sharded(self.model):
+            return super().create(**kwargs)
+
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True)
+
+        return obj
+
+
+def group_by_shard(doctor_ids=None):
+    """Группирует врачей по шардам.
+
+    :param doctor_ids: Идентификаторы врачей, None - все врачи
+    :type doctor_ids: iterable of int or None
+
+    :return Идентификаторы врачей (None - все врачи шарда) по алиасам шардов,
+            без шардирования - единственный ключ None
+    :rtype dict
+    """
+    if not get_shards():
+        return {None: None if doctor_ids is None else list(doctor_ids)}
+    if doctor_ids is None:
+        return dict.fromkeys(get_shards())
+
+    groups = {}
+    for doctor_id in doctor_ids:
+        alias = shard_for(doctor_id)
+        if alias is not None:
+            groups.setdefault(alias, []).append(doctor_id)
+
+    return groups
+
+
+def fan_out(func, doctor_ids=None):
+    """Выполняет функцию на шардах врачей и возвращает ее результаты.
+
+    Функция вызывается с идентификаторами врачей шарда внутри
+    ``using_shard``. Шарды опрашиваются параллельно в отдельных потоках,
+    кроме случая, когда запрос выполняется внутри транзакции: изменения
+    незафиксированной транзакции не видны из других соединений.
+
+    :param func: Функция от идентификаторов врачей (None - все врачи)
+    :type func: callable
+    :param doctor_ids: Идентификаторы врачей, None - все врачи
+    :type doctor_ids: iterable of int or None
+
+    :return Результаты функции по шардам
+    :rtype list
+    """
+    groups = group_by_shard(doctor_ids)
+
+    def call(alias, ids):
+        with using_shard(alias):
+            return func(ids)
+
+    in_transaction = any(
+        connections[alias].in_atomic_block for alias in groups if alias is not None)
+    if len(groups) < 2 or in_transaction:
+        return [call(alias, ids) for alias, ids in groups.items()]
+
+    def call_in_thread(alias, ids):
+        try:
+            return call(alias, ids)
+        finally:
+            connections[alias].close()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        futures = [
+            executor.submit(call_in_thread, alias, ids) for alias, ids in groups.items()]
+
+    return [future.result() for future in futures]
+
+
+def reset_sequences(alias):
+    """Сдвигает идентификаторы карточек приема шарда на ``номер * ID_STEP``.
+
+    Вызывается после миграции БД. Поддерживаются SQLite и PostgreSQL.
+    """
+    number = shard_number(alias)
+    if not number:
+        return
+
+    connection = connections[alias]
+    start = number * ID_STEP
+    with connection.cursor() as cursor:
+        for table in ID_TABLES:
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    'UPDATE sqlite_sequence SET seq = max(seq, %s) WHERE name = %s',
+                    [start, table])
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                    'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                    [table, start, table])
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {table})))",
+                    [start])
@@ -0,0 +1,183 @@
+"""Обработчики сигналов карточек приема."""
+import contextlib
+import threading
+
+from django.db import router, transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from reception import doctors, events, schedule, sharding, slots
+from reception.cache import free_time_cache
+from reception.models import (
+    ClinicHoliday, Doctor, DoctorSchedule, Reception, ScheduleException)
+
+_deferred = threading.local()
+
+
+@contextlib.contextmanager
+def deferred_day_changes():
+    """Откладывает обновление индекса и кеша занятости до выхода из блока.
+
+    Изменения карточек внутри блока копятся и обрабатываются одним вызовом
+    ``days_changed`` вместо пересчета на каждую карточку.
+    """
+    days = set()
+    _deferred.days = days
+    try:
+        yield days
+    finally:
+        _deferred.days = None
+
+    days_changed(days)
+
+
+def day_changed(doctor_id, date):
+    """Обновляет индекс и кеш занятости после изменения карточек врача на дату.
+
+    Кеш сбрасывается сразу и повторно после фиксации транзакции, чтобы в него
+    не попало значение, прочитанное до фиксации. Подписчики потока событий
+    получают новую занятость после фиксации.
+    """
+    deferred_days = getattr(_deferred, 'days', None)
+    if deferred_days is not None:
+        deferred_days.add((doctor_id, date))
+        return
+
+    with sharding.for_doctor(doctor_id):
+        using = router.db_for_write(Reception)
+        slots.rebuild_day(doctor_id, date)
+    free_time_cache.invalidate(doctor_id, date)
+    transaction.on_commit(lambda: free_time_cache.invalidate(doctor_id, date), using=using)
+    transaction.on_commit(lambda: events.publish_days([(doctor_id, date)]), using=using)
+
+
+def days_changed(days):
+    """Обновляет индекс и кеш занятости после массового изменения карточек.
+
+    Используется командами, которые пишут карточки приема в обход сигналов
+    модели (``bulk_create``, ``QuerySet.delete`` без загрузки объектов).
+
+    :param days: Пары (идентификатор врача, дата)
+    :type days: set of tuple
+    """
+    days = set(days)
+    if not days:
+        return
+
+    groups = sharding.group_by_shard({doctor_id for doctor_id, _ in days})
+    for alias, doctor_ids in groups.items():
+        shard_days = {day for day in days if day[0] in doctor_ids}
+        with sharding.using_shard(alias):
+            using = router.db_for_write(Reception)
+            slots.rebuild_days(shard_days)
+
+        def invalidate(shard_days=shard_days):
+            for doctor_id, date in shard_days:
+                free_time_cache.invalidate(doctor_id, date)
+
+        invalidate()
+        transaction.on_commit(invalidate, using=using)
+        transaction.on_commit(
+            lambda shard_days=shard_days: events.publish_days(shard_days), using=using)
+
+
+@receiver(pre_save, sender=Reception)
+def remember_reception_day(sender, instance, raw=False, using=None, **kwargs):
+    """Запоминает врача и дату изменяемой карточки до сохранения."""
+    instance._previous_day = None
+    if instance.pk is not None and not raw:
+        instance._previous_day = Reception.objects.using(using).filter(
+            pk=instance.pk).values_list('doctor_id', 'date').first()
+
+
+@receiver(post_save, sender=Reception)
+def reception_saved(sender, instance, raw=False, **kwargs):
+    """Пересчитывает индекс занятости после сохранения карточки."""
+    if raw:
+        return
+
+    day = instance.doctor_id, instance.date
+    previous_day = getattr(instance, '_previous_day', None)
+    day_changed(*day)
+    if previous_day is not None and previous_day != day:
+        day_changed(*previous_day)
+
+
+@receiver(post_delete, sender=Reception)
+def reception_deleted(sender, instance, origin=None, **kwargs):
+    """Пересчитывает индекс занятости после удаления карточки.
+
+    При удалении врача строки индекса удаляются каскадно вместе с ним.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is Doctor:
+        return
+
+    day_changed(instance.doctor_id, instance.date)
+
+
+@receiver(pre_save, sender=Doctor)
+def assign_doctor_shard(sender, instance, raw=False, using=None, **kwargs):
+    """Назначает новому врачу шард для его карточек приема."""
+    if sharding.get_shards() and using == 'default' and not instance.shard and not raw:
+        instance.shard = sharding.choose_shard()
+
+
+@receiver(post_save, sender=Doctor)
+def doctor_mirrored(sender, instance, raw=False, using=None, **kwargs):
+    """Копирует строку врача в его шард."""
+    if using == 'default' and instance.shard in sharding.get_shards():
+        sharding.mirror_doctors([instance])
+
+
+@receiver(post_delete, sender=Doctor)
+def doctor_unmirrored(sender, instance, using=None, **kwargs):
+    """Удаляет врача из его шарда вместе с его карточками приема."""
+    if using == 'default' and instance.shard in sharding.get_shards():
+        Doctor.objects.using(instance.shard).filter(pk=instance.pk).delete()
+
+
+@receiver(post_migrate)
+def shard_migrated(sender, using=None, **kwargs):
+    """Сдвигает идентификаторы карточек приема шарда после миграции."""
+    if sender.name == 'reception':
+        sharding.reset_sequences(using)
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def doctor_changed(sender, **kwargs):
+    """Сбрасывает кешированный справочник врачей после изменения врача."""
+    doctors.bump_version()
+    transaction.on_commit(doctors.bump_version)
+
+
+@receiver(post_save, sender=Doctor)
+def doctor_created(sender, instance, created=False, raw=False, **kwargs):
+    """Рассчитывает календарь нового врача по часам работы клиники."""
+    if created and not raw:
+        schedule.build([instance.id])
+
+
+@receiver(post_save, sender=DoctorSchedule)
+@receiver(post_delete, sender=DoctorSchedule)
+@receiver(post_save, sender=ScheduleException)
+@receiver(post_delete, sender=ScheduleException)
+def doctor_schedule_changed(sender, instance, raw=False, origin=None, **kwargs):
+    """Пересчитывает календарь врача после изменения его расписания."""
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if raw or origin_model is Doctor:
+        return
+
+    schedule.build([instance.doctor_id])
+
+
+@receiver(post_save, sender=ClinicHoliday)
+@receiver(post_delete, sender=ClinicHoliday)
+def clinic_holiday_changed(sender, raw=False, **kwargs):
+    """Пересчитывает календари клиники и всех врачей после изменения праздников."""
+    if raw:
+        return
+
+    schedule.build()
@@ -0,0 +1,360 @@
+"""Индекс занятости врачей по часовым слотам рабочего дня.
+
+Занятость врача на дату хранится в денормализованном виде - битовой маской
+часов приема (бит ``i`` соответствует часу ``WORKING_HOURS[i]``). Час
+занят, если его пересекает хотя бы один прием с учетом длительности. Маска
+пересчитывается при каждом изменении карточек приема, поэтому для ответа
+на вопрос "свободен ли врач" достаточно прочитать одну строку по индексу.
+
+Каждый пересчет увеличивает версию строки. Строки индекса не удаляются,
+даже если врач свободен весь день, чтобы версия никогда не повторялась.
+"""
+import datetime
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+
+# Часы начала приема (09:00 - 17:00), как в ``enabledHours`` формы
+WORKING_HOURS = (9, 10, 11, 12, 13, 14, 15, 16, 17)
+
+FULL_MASK = (1 << len(WORKING_HOURS)) - 1
+
+
+def time_to_slot(time):
+    """Возвращает номер часового слота для времени или None.
+
+    :param time: Время приема
+    :type time: datetime.time
+
+    :rtype int or None
+    """
+    try:
+        return WORKING_HOURS.index(time.hour)
+    except ValueError:
+        return None
+
+
+def slot_to_time(slot):
+    """Возвращает время начала часового слота.
+
+    :param slot: Номер слота
+    :type slot: int
+
+    :rtype datetime.time
+    """
+    return datetime.time(WORKING_HOURS[slot])
+
+
+def mask_from_times(times):
+    """Возвращает битовую маску занятых слотов по списку времени приема.
+
+    :param times: Время приемов
+    :type times: iterable of datetime.time
+
+    :rtype int
+    """
+    mask = 0
+    for time in times:
+        slot = time_to_slot(time)
+        if slot is not None:
+            mask |= 1 << slot
+
+    return mask
+
+
+def interval_mask(time, duration):
+    """Возвращает битовую маску часовых слотов, пересекающих прием.
+
+    :param time: Время начала приема
+    :type time: datetime.time
+    :param duration: Длительность приема, в минутах
+    :type duration: int
+
+    :rtype int
+    """
+    start = time.hour * 60 + time.minute
+    end = start + duration
+    mask = 0
+    for slot, hour in enumerate(WORKING_HOURS):
+        if hour * 60 < end and start < hour * 60 + 60:
+            mask |= 1 << slot
+
+    return mask
+
+
+def mask_from_intervals(intervals):
+    """Возвращает битовую маску часов, пересекающих приемы.
+
+    Час занят, если часовой прием с его начала пересекся бы с одним из
+    приемов, поэтому прием 09:15-10:15 занимает часы 9:00 и 10:00.
+
+    :param intervals: Время начала и длительность приемов
+    :type intervals: iterable of tuple
+
+    :rtype int
+    """
+    mask = 0
+    for time, duration in intervals:
+        mask |= interval_mask(time, duration)
+
+    return mask
+
+
+def times_from_mask(mask):
+    """Возвращает время начала занятых слотов маски.
+
+    :param mask: Битовая маска слотов
+    :type mask: int
+
+    :rtype list of datetime.time
+    """
+    return [
+        slot_to_time(slot) for slot in range(len(WORKING_HOURS))
+        if mask & (1 << slot)
+    ]
+
+
+def compute_mask(doctor_id, date):
+    """Вычисляет маску занятости врача на дату по таблице карточек приема.
+
+    :param doctor_id: Идентификатор врача
+    :type doctor_id: int
+    :param date: Дата
+    :type date: datetime.date
+
+    :rtype int
+    """
+    from reception.models import Reception
+
+    return mask_from_intervals(
+        Reception.objects.filter(
+            doctor=doctor_id, date=date).values_list('time', 'duration'))
+
+
+def rebuild_day(doctor_id, date):
+    """Пересчитывает и сохраняет маску занятости врача на дату.
+
+    :param doctor_id: Идентификатор врача
+    :type doctor_id: int
+    :param date: Дата
+    :type date: datetime.date
+
+    :rtype int
+    """
+    from reception.models import DoctorDaySlots
+
+    using = router.db_for_write(DoctorDaySlots)
+    day_slots = DoctorDaySlots.objects.filter(doctor=doctor_id, date=date)
+    with transaction.atomic(using=using, savepoint=False):
+        # Строка индекса блокируется до чтения карточек, как в rebuild_days:
+        # иначе более медленный пересчет записал бы устаревшую маску
+        created = False
+        if day_slots.select_for_update().values_list('pk', flat=True).first() is None:
+            try:
+                with transaction.atomic(using=using):
+                    DoctorDaySlots.objects.create(doctor_id=doctor_id, date=date, busy_mask=0)
+                created = True
+            except IntegrityError:
+                day_slots.select_for_update().values_list('pk', flat=True).first()
+
+        mask = compute_mask(doctor_id, date)
+        if created:
+            # Созданная строка еще не видна другим транзакциям, ее версия новая
+            day_slots.update(busy_mask=mask)
+        else:
+            day_slots.update(busy_mask=mask, version=F('version') + 1)
+
+    return mask
+
+
+def busy_mask(doctor_id, date):
+    """Возвращает маску занятости врача на дату из индекса.
+
+    :param doctor_id: Идентификатор врача
+    :type doctor_id: int
+    :param date: Дата
+    :type date: datetime.date
+
+    :rtype int
+    """
+    from reception.models import DoctorDaySlots
+
+    mask = DoctorDaySlots.objects.filter(
+        doctor=doctor_id, date=date).values_list('busy_mask', flat=True).first()
+
+    return mask or 0
+
+
+def day_state(doctor_id, date):
+    """Возвращает маску занятости врача на дату и версию строки индекса.
+
+    Для даты без строки в индексе возвращается нулевая версия.
+
+    :param doctor_id: Идентификатор врача
+    :type doctor_id: int
+    :param date: Дата
+    :type date: datetime.date
+
+    :rtype tuple
+    """
+    from reception.models import DoctorDaySlots
+
+    state = DoctorDaySlots.objects.filter(
+        doctor=doctor_id, date=date).values_list('busy_mask', 'version').first()
+
+    return state or (0, 0)
+
+
+async def aday_state(doctor_id, date):
+    """Асинхронная версия ``day_state``."""
+    from reception.models import DoctorDaySlots
+
+    state = await DoctorDaySlots.objects.filter(
+        doctor=doctor_id, date=date).values_list('busy_mask', 'version').afirst()
+
+    return state or (0, 0)
+
+
+def day_states(doctor_ids, dates):
+    """Возвращает значения ``day_state`` врачей на даты одним запросом.
+
+    При шардировании запросы к шардам выполняются параллельно.
+
+    :param doctor_ids: Идентификаторы врачей
+    :type doctor_ids: list of int
+    :param dates: Даты
+    :type dates: list of datetime.date
+
+    :return Маска и версия по ключу (врач, дата)
+    :rtype dict
+    """
+    from reception import sharding
+    from reception.models import DoctorDaySlots
+
+    states = {
+        (doctor_id, date): (0, 0) for doctor_id in doctor_ids for date in dates}
+
+    def shard_states(shard_doctor_ids):
+        return list(DoctorDaySlots.objects.filter(
+            doctor__in=shard_doctor_ids, date__in=dates,
+        ).values_list('doctor_id', 'date', 'busy_mask', 'version'))
+
+    for rows in sharding.fan_out(shard_states, doctor_ids):
+        for doctor_id, date, mask, version in rows:
+            states[doctor_id, date] = mask, version
+
+    return states
+
+
+def compute_all_masks():
+    """Вычисляет маски занятости всех врачей по таблице карточек приема.
+
+    :rtype dict
+    """
+    from reception.models import Reception
+
+    masks = {}
+    rows = Reception.objects.order_by().values_list(
+        'doctor_id', 'date', 'time', 'duration').iterator(chunk_size=2000)
+    for doctor_id, date, time, duration in rows:
+        mask = interval_mask(time, duration)
+        if mask:
+            key = doctor_id, date
+            masks[key] = masks.get(key, 0) | mask
+
+    return masks
+
+
+def busy_grid(doctor_ids, dates):
+    """Возвращает маски занятости врачей на даты одним запросом.
+
+    В результат попадают только врачи, у которых есть хотя бы одна
+    карточка приема на указанные даты. При шардировании запросы к шардам
+    выполняются параллельно.
+
+    :param doctor_ids: Идентификаторы врачей, None - все врачи
+    :type doctor_ids: list of int or None
+    :param dates: Даты по возрастанию
+    :type dates: list of datetime.date
+
+    :return Маски по врачам, выровненные по списку дат
+    :rtype dict
+    """
+    from reception import sharding
+    from reception.models import Reception
+
+    grid = {}
+    if not dates:
+        return grid
+
+    def shard_grid(shard_doctor_ids):
+        receptions = Reception.objects.filter(date__range=(dates[0], dates[-1]))
+        if shard_doctor_ids is not None:
+            receptions = receptions.filter(doctor__in=shard_doctor_ids)
+
+        shard_masks = {}
+        rows = receptions.order_by().values_list('doctor_id', 'date', 'time', 'duration')
+        for doctor_id, date, time, duration in rows:
+            mask = interval_mask(time, duration)
+            position = positions.get(date)
+            if mask and position is not None:
+                masks = shard_masks.setdefault(doctor_id, [0] * len(dates))
+                masks[position] |= mask
+
+        return shard_masks
+
+    positions = {date: i for i, date in enumerate(dates)}
+    # Врач хранится в одном шарде, поэтому результаты шардов не пересекаются
+    for shard_masks in sharding.fan_out(shard_grid, doctor_ids):
+        grid.update(shard_masks)
+
+    return grid
+
+
+def rebuild_days(days):
+    """Пересчитывает и сохраняет маски занятости для набора врачей и дат.
+
+    Маски вычисляются одним запросом к карточкам приема, строки индекса
+    обновляются пакетно. Функция предназначена для массовых операций, которые
+    не вызывают сигналы модели.
+
+    :param days: Пары (идентификатор врача, дата)
+    :type days: set of tuple
+    """
+    from reception.models import DoctorDaySlots, Reception
+
+    if not days:
+        return
+
+    doctor_ids = {doctor_id for doctor_id, _ in days}
+    dates = {date for _, date in days}
+
+    # Пересчет обычно вызывается из транзакции записи, и точка сохранения
+    # ему не нужна: ошибка откатывает всю запись
+    with transaction.atomic(using=router.db_for_write(DoctorDaySlots), savepoint=False):
+        # Строки индекса блокируются до чтения карточек: изменение занятости
+        # во время пересчета дождется его конца и не будет затерто
+        stored = [
+            day_slots for day_slots in DoctorDaySlots.objects.select_for_update().filter(
+                doctor__in=doctor_ids, date__in=dates)
+            if (day_slots.doctor_id, day_slots.date) in days
+        ]
+
+        masks = dict.fromkeys(days, 0)
+        rows = Reception.objects.filter(
+            doctor__in=doctor_ids, date__in=dates
+        ).order_by().values_list('doctor_id', 'date', 'time', 'duration')
+        for doctor_id, date, time, duration in rows:
+            if (doctor_id, date) in masks:
+                masks[doctor_id, date] |= interval_mask(time, duration)
+
+        for day_slots in stored:
+            day_slots.busy_mask = masks.pop((day_slots.doctor_id, day_slots.date))
+            day_slots.version = F('version') + 1
+
+        DoctorDaySlots.objects.bulk_update(
+            stored, ['busy_mask', 'version'], batch_size=1000)
+        DoctorDaySlots.objects.bulk_create(
+            (DoctorDaySlots(doctor_id=doctor_id, date=date, busy_mask=mask)
+             for (doctor_id, date), mask in masks.items()),
+            batch_size=1000)
@@ -1,58 +1,253 @@
 // JS-шаблон создания новой карточки приема к врачу
 
-$('#id_date').on('blur', function(event) {
-    var date = event.target.value,
-        doctor_id = $('#id_doctor').val();
+$('#id_date').on('blur', scheduleSlotChange);
+$('#id_doctor').on('change', scheduleSlotChange);
+$('#id_time').on('blur', scheduleSlotChange);
 
-    if(date && doctor_id){
-        getFreeTimeChoices(doctor_id, date)
-    }
-});
+// Задержка обработки изменения полей, за которую успевают прийти
+// несколько событий подряд, в миллисекундах
+var SLOT_CHANGE_DELAY = 250;
 
+// Сколько ответ о занятости врача используется без повторного запроса,
+// в миллисекундах
+var FREE_TIME_TTL = 5000;
 
-$('#id_doctor').on('change', function(event) {
-    var doctor_id = event.target.value,
-        date = $('#id_date').val();
+var slotChangeTimer = null,
+    lastSlot = null;
 
-    if(date && doctor_id){
-        getFreeTimeChoices(doctor_id, date)
+// Список выбора врача заполняется поиском по началу ФИО
+if($('#id_doctor').data('autocomplete-url')){
+    $('<input type="search" id="id_doctor_search" class="form-control" placeholder="Поиск врача">')
+        .insertBefore('#id_doctor')
+        .on('input', searchDoctors);
+}
+
+
+// Отправляет запрос за врачами, ФИО которых начинается со введенной строки
+function searchDoctors() {
+    var select = $('#id_doctor'),
+        query = $(this).val();
+
+    if(query.length < 2){
+        return;
     }
-});
 
+    $.ajax({
+        url: select.data('autocomplete-url'),
+        data: {q: query},
+        success: function (data) {
+            var selected = select.val();
 
-$('#id_time').on('blur', function(event) {
+            select.find('option').not('[value=""]').not(':selected').remove();
+            $(data.doctors).each(function (i, doctor) {
+                if(String(doctor[0]) != selected){
+                    select.append($('<option>').val(doctor[0]).text(doctor[1]));
+                }
+            });
+        }
+    });
+}
+
+
+// Откладывает обработку изменения полей, чтобы несколько событий подряд
+// привели к одному запросу
+function scheduleSlotChange() {
+    clearTimeout(slotChangeTimer);
+    slotChangeTimer = setTimeout(onSlotChange, SLOT_CHANGE_DELAY);
+}
+
+
+// Бронирует выбранный час и обновляет занятость врача на выбранную дату
+function onSlotChange() {
     var doctor_id = $('#id_doctor').val(),
-        date = $('#id_date').val();
+        date = $('#id_date').val(),
+        time = $('#id_time').val(),
+        slot = [doctor_id, date, time].join(':');
+
+    // Поля не изменились с прошлой обработки, например, при потере фокуса
+    if(slot == lastSlot){
+        return;
+    }
+    lastSlot = slot;
 
     if(date && doctor_id){
-        getFreeTimeChoices(doctor_id, date)
+        subscribeFreeTime(doctor_id, date);
+        if(time){
+            holdSlot(doctor_id, date, time);
+        } else {
+            getFreeTimeChoices(doctor_id, date);
+        }
     }
-});
+}
+
+
+// Помечает выбранное время как недоступное для записи
+function markTimeBusy() {
+    $("#id_time").addClass('text-danger');
+    $("#id_submit_btn").prop("disabled", true);
+}
+
+
+// Временно бронирует час приема, чтобы другие пациенты видели его занятым
+function holdSlot(doctor_id, date, time) {
+    $.ajax({
+        url: "/reception/hold-slot/",
+        method: "POST",
+        data: {
+            doctor_id: doctor_id,
+            date: date,
+            time: time
+        },
+        headers: {'X-CSRFToken': $('input[name=csrfmiddlewaretoken]').val()},
+        complete: function (xhr) {
+            // Час заняли, значит сохраненный ответ о занятости устарел
+            getFreeTimeChoices(doctor_id, date, xhr.status == 409);
+            if(xhr.status == 409){
+                markTimeBusy();
+            }
+        }
+    });
+}
+
+
+// Последние ответы о занятости врача по ключу "врач:дата" вместе с ETag
+// и временем получения
+var freeTimeResponses = {};
+
+// Запрос занятости, ответ на который еще не получен
+var freeTimeRequest = null;
+
+
+// Отправляет запрос за свободным рабочим временем врача в конкретный день.
+// Недавний ответ для того же врача и дня используется без запроса, если
+// не передан refresh
+function getFreeTimeChoices(doctor_id, date, refresh) {
+    var key = doctor_id + ':' + date,
+        cached = freeTimeResponses[key],
+        headers = {};
 
+    // Ответ на запрос за прежними врачом или днем уже не нужен
+    if(freeTimeRequest){
+        freeTimeRequest.abort();
+        freeTimeRequest = null;
+    }
 
+    if(cached){
+        if(!refresh && Date.now() - cached.received < FREE_TIME_TTL){
+            setFreeTimeChoices(cached.data);
+            return;
+        }
+        if(cached.etag){
+            headers['If-None-Match'] = cached.etag;
+        }
+    }
 
-// Отправляет запрос за свободным рабочим временем врача в конкретный день
-function getFreeTimeChoices(doctor_id, date) {
-    $.get(
-        "/reception/get-free-time-choices",
-        {
+    freeTimeRequest = $.ajax({
+        url: "/reception/get-free-time-choices/",
+        data: {
             doctor_id: doctor_id,
             date: date
         },
-        setFreeTimeChoices
-    );
-
-    // Заново заполняет поле выбора времени приема свободными значениями времени врача
-    function setFreeTimeChoices(data) {
-        $("#id_time").removeClass('text-danger').addClass('form-control');
-        $("#id_submit_btn").prop("disabled", false);
-
-        $(data.busy_time).each(function (i) {
-            var value = data.busy_time[i];
-            if($("#id_time").val() + ':00' == value){
-                $("#id_time").addClass('text-danger');
-                $("#id_submit_btn").prop("disabled", true);
+        headers: headers,
+        success: function (data, textStatus, xhr) {
+            // На 304 сервер не присылает тело, используем сохраненный ответ
+            if(xhr.status == 304 && cached){
+                data = cached.data;
+                cached.received = Date.now();
+            } else {
+                freeTimeResponses[key] = {
+                    etag: xhr.getResponseHeader('ETag'), data: data, received: Date.now()};
+            }
+            setFreeTimeChoices(data);
+        },
+        error: function (xhr) {
+            // Сервер ограничил частоту запросов, повторяем после паузы
+            if(xhr.status == 429){
+                var retryAfter = parseInt(xhr.getResponseHeader('Retry-After'), 10) || 1;
+                setTimeout(function () {
+                    if(lastSlot && lastSlot.indexOf(key + ':') == 0){
+                        getFreeTimeChoices(doctor_id, date, refresh);
+                    }
+                }, retryAfter * 1000);
             }
+        },
+        complete: function (xhr) {
+            if(freeTimeRequest === xhr){
+                freeTimeRequest = null;
+            }
+        }
+    });
+}
+
+
+// Заново заполняет поле выбора времени приема свободными значениями времени врача
+function setFreeTimeChoices(data) {
+    $("#id_time").removeClass('text-danger').addClass('form-control');
+    $("#id_submit_btn").prop("disabled", false);
+
+    // Прием длится час, поэтому занятость определяется по часу начала
+    var hour = $("#id_time").val().substr(0, 2) + ':00:00';
+
+    // Часы, забронированные другими пациентами, тоже недоступны
+    $(data.busy_time.concat(data.held_time || [])).each(function (i, value) {
+        if(hour == value){
+            markTimeBusy();
+        }
+    });
+}
+
+
+// Поток изменений занятости выбранного врача на выбранную дату
+var freeTimeEvents = null;
+
+
+// Подписывается на изменения занятости врача на дату, чтобы занятые часы
+// отмечались без повторных запросов. Поток доступен, только если сервер
+// передал его адрес в форме
+function subscribeFreeTime(doctor_id, date) {
+    var url = $('form').data('events-url'),
+        key = doctor_id + ':' + date;
+
+    if(!url || !window.EventSource || (freeTimeEvents && freeTimeEvents.key == key)){
+        return;
+    }
+    if(freeTimeEvents){
+        freeTimeEvents.source.close();
+    }
+
+    var source = new EventSource(url + '?' + $.param({doctor_id: doctor_id, date: date}));
+    freeTimeEvents = {key: key, source: source};
+
+    // Первое событие потока содержит все занятые часы
+    source.addEventListener('busy', function (event) {
+        updateBusyTime(key, function () {
+            return JSON.parse(event.data).busy_time;
         });
+    });
+
+    // Следующие события - часы, которые стали занятыми или свободными
+    source.addEventListener('delta', function (event) {
+        var delta = JSON.parse(event.data);
+
+        updateBusyTime(key, function (busy_time) {
+            return $.grep(busy_time, function (value) {
+                return $.inArray(value, delta.free) < 0 && $.inArray(value, delta.busy) < 0;
+            }).concat(delta.busy);
+        });
+    });
+}
+
+
+// Обновляет сохраненный ответ о занятости и отметку выбранного времени
+function updateBusyTime(key, update) {
+    var cached = freeTimeResponses[key];
+
+    if(!cached){
+        cached = freeTimeResponses[key] = {etag: null, data: {busy_time: [], held_time: []}};
+    }
+    cached.data = $.extend({}, cached.data, {busy_time: update(cached.data.busy_time)});
+
+    if(lastSlot && lastSlot.indexOf(key + ':') == 0){
+        setFreeTimeChoices(cached.data);
     }
 }
@@ -0,0 +1,121 @@
+"""Хранилище статики со склейкой бандлов, хешами в именах и сжатием."""
+import gzip
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Расширения файлов, для которых при сборке статики создаются сжатые копии
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.txt', '.html')
+
+# Файлы меньше этого размера в байтах не сжимаются
+COMPRESS_MIN_SIZE = 512
+
+# Расширения сжатых копий и функции сжатия
+COMPRESSORS = [('.gz', lambda data: gzip.compress(data, mtime=0))]
+if brotli is not None:
+    COMPRESSORS.append(('.br', brotli.compress))
+
+# Начала строки со ссылкой на карту исходников в js и css
+SOURCE_MAP_PREFIXES = (b'//# sourceMappingURL=', b'/*# sourceMappingURL=')
+
+
+class BundleManifestStorage(ManifestStaticFilesStorage):
+    """Хранилище статики, собирающее бандлы из ``RECEPTION_ASSET_BUNDLES``.
+
+    При ``collectstatic`` исходные файлы каждого бандла склеиваются в один
+    файл, после чего все файлы получают хеш в имени, а текстовые файлы
+    дополнительно сохраняются сжатыми gzip и, если установлен brotli, brotli.
+
+    Пока статика не собрана и манифеста нет, файлы отдаются по исходным
+    именам.
+    """
+
+    # Карты исходников минифицированных библиотек не поставляются,
+    # поэтому ссылки на них в js не переписываются
+    patterns = tuple(
+        (extension, pattern) for extension, pattern in ManifestStaticFilesStorage.patterns
+        if extension != '*.js'
+    )
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = {**paths, **self.save_bundles()}
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        if not dry_run:
+            for name in self.hashed_files.values():
+                self.save_compressed(name)
+
+    def save_bundles(self):
+        """Склеивает и сохраняет бандлы из уже собранных исходных файлов.
+
+        :rtype dict
+        """
+        bundles = {}
+        for name, sources in settings.RECEPTION_ASSET_BUNDLES.items():
+            parts = []
+            for source in sources:
+                with self.open(source) as source_file:
+                    parts.append(strip_source_map(source_file.read()))
+
+            # Разделитель защищает от склейки выражений без точки с запятой
+            separator = b';\n' if name.endswith('.js') else b'\n'
+            if self.exists(name):
+                self.delete(name)
+            self._save(name, ContentFile(separator.join(parts)))
+            bundles[name] = (self, name)
+
+        return bundles
+
+    def save_compressed(self, name):
+        """Сохраняет сжатые копии файла рядом с ним."""
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+
+        for extension, compress in COMPRESSORS:
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                if self.exists(name + extension):
+                    self.delete(name + extension)
+                self._save(name + extension, ContentFile(compressed))
+
+
+def strip_source_map(content):
+    """Удаляет ссылку на карту исходников, неверную для склеенного файла."""
+    lines = content.rstrip().split(b'\n')
+    if lines and lines[-1].lstrip().startswith(SOURCE_MAP_PREFIXES):
+        lines.pop()
+
+    return b'\n'.join(lines)
+
+
+def compressed_path(path, accept_encoding):
+    """Возвращает путь к сжатой копии файла и ее кодировку.
+
+    Если подходящей копии нет, возвращает исходный путь и ``None``.
+    """
+    encodings = [('br', '.br'), ('gzip', '.gz')]
+    for encoding, extension in encodings:
+        if encoding in accept_encoding and os.path.exists(path + extension):
+            return path + extension, encoding
+
+    return path, None
@@ -0,0 +1,28 @@
+"""Теги шаблонов для подключения бандлов статики."""
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """Подключает бандл статики из ``RECEPTION_ASSET_BUNDLES``.
+
+    Если статика собрана и бандл есть в манифесте, подключается один файл
+    бандла, иначе - все исходные файлы бандла по отдельности.
+    """
+    if name in (getattr(staticfiles_storage, 'hashed_files', None) or {}):
+        urls = [static(name)]
+    else:
+        urls = [static(source) for source in settings.RECEPTION_ASSET_BUNDLES[name]]
+
+    if name.endswith('.css'):
+        return format_html_join(
+            '\n', '<link rel="stylesheet" href="{}"/>', ((url,) for url in urls))
+
+    return format_html_join(
+        '\n', '<script src="{}"></script>', ((url,) for url in urls))
@@ -1,10 +1,61 @@
+import asyncio
+import collections
 import datetime
+import gzip
+import io
 import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import sqlite3
+import tempfile
+import time
+import unittest
+import urllib.parse
+import urllib.request
+from unittest import mock
 
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.db import DatabaseError, connection, connections
+from django.db.models import F, QuerySet
+from django.core.management import CommandError, call_command
+from django.forms.boundfield import BoundField
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.template import Context, Template
+from django.test import (
+    AsyncClient, AsyncRequestFactory, Client, TestCase, TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from django.utils import timezone
 
-from reception.models import Doctor, Reception
+from med import prefork
+from med.urls import QUERY_BUDGETS
+from reception import (
+    benchmarks, checks, doctors, earliest, events, holds, intervals, metrics, querycheck,
+    schedule, sharding, slots, throttle, warmup)
+from reception.admin import ReceptionAdmin, ReceptionArchiveAdmin
+from reception.forms import ReceptionForm
+from reception.management.commands.import_receptions import (
+    DUPLICATE_MESSAGE, Command as ImportReceptionsCommand)
+from reception.management.commands.sync_replicas import copy_sqlite
+from reception.middleware import (
+    MetricsMiddleware, QueryInspectorMiddleware, StaticAssetsMiddleware)
+from reception.routers import ReplicaRouter, read_from_replica, use_primary
+from reception.views import adoctor_free_times, free_time_events
+from reception.cache import free_time_cache, hold_cache
+from reception.models import (
+    ClinicHoliday, Doctor, DoctorDaySlots, DoctorSchedule, Reception,
+    ReceptionArchive, ScheduleException, SlotCalendar, SlotHold)
 from reception.tests.utils import get_next_weekday
 
 
@@ -131,9 +182,9 @@ class ReceptionFreeTimeCase(TestCase):
 
         # Создаем расписание врача Александрова И.П на понедельник,
         # занятое с 9:00 до 13:00
-        for time in busy_times:
+        for busy_time in busy_times:
             Reception.objects.create(
-                doctor=doctor, date=monday, time=time, fio=ivanov_ii)
+                doctor=doctor, date=monday, time=busy_time, fio=ivanov_ii)
 
         # Отправляем запрос для получения свободного времени приема врача
         response = self.client.get(
@@ -224,9 +275,9 @@ class ReceptionFreeTimeCase(TestCase):
 
         # Создаем расписание врача Александрова И.П на вторник,
         # все часы приема заняты.
-        for time in busy_times:
+        for busy_time in busy_times:
             Reception.objects.create(
-                doctor=doctor, date=tuesday, time=time, fio=ivanov_ii)
+                doctor=doctor, date=tuesday, time=busy_time, fio=ivanov_ii)
 
         # Отправляем запрос для получения свободного времени приема врача
         response = self.client.get(
@@ -240,3 +291,2117 @@ class ReceptionFreeTimeCase(TestCase):
         self.assertEqual(response.content, b'{"free_time": []}')
 
         self.assertEqual(content['free_time'], [])  # Не свободных часов
+
+
+class SlotIndexCase(TestCase):
+    """Набор тестов индекса занятости врачей."""
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Александров', patronymic='Петрович')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        free_time_cache.clear()
+        hold_cache.clear()
+        super(SlotIndexCase, self).setUp()
+
+    def test_index_follows_receptions(self):
+        """Тест пересчета маски при создании, изменении и удалении карточек."""
+        reception = Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(9),
+            fio='Иванов Иван Иванович')
+        Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(13),
+            fio='Петров Петр Петрович')
+
+        self.assertEqual(
+            slots.busy_mask(self.doctor.id, self.monday), 0b000010001)
+
+        tuesday = self.monday + datetime.timedelta(days=1)
+        reception.date = tuesday
+        reception.save()
+
+        self.assertEqual(
+            slots.busy_mask(self.doctor.id, self.monday), 0b000010000)
+        self.assertEqual(slots.busy_mask(self.doctor.id, tuesday), 0b1)
+
+        reception.delete()
+
+        self.assertEqual(slots.day_state(self.doctor.id, tuesday), (0, 2))
+
+    def test_free_times_index_queries(self):
+        """Тест получения занятого времени запросами к индексу и броням."""
+        Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(10),
+            fio='Иванов Иван Иванович')
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                '/reception/get-free-time-choices/',
+                {'doctor_id': self.doctor.id,
+                 'date': self.monday.strftime('%d.%m.%Y')})
+
+        self.assertEqual(
+            response.content, b'{"busy_time": ["10:00:00"], "held_time": []}')
+
+    def test_rebuild_and_verify_command(self):
+        """Тест команды перестроения и сверки индекса."""
+        Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(17),
+            fio='Иванов Иван Иванович')
+        DoctorDaySlots.objects.all().update(busy_mask=1)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_slot_index', verify=True,
+                         stdout=io.StringIO(), stderr=io.StringIO())
+
+        call_command('rebuild_slot_index', stdout=io.StringIO())
+        call_command('rebuild_slot_index', verify=True, stdout=io.StringIO())
+
+        self.assertEqual(
+            slots.busy_mask(self.doctor.id, self.monday), 1 << 8)
+
+    def test_rebuild_keeps_concurrent_version(self):
+        """Тест увеличения версии индекса в БД, а не по прочитанной строке."""
+        Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(17),
+            fio='Иванов Иван Иванович')
+        DoctorDaySlots.objects.all().update(busy_mask=1, version=5)
+
+        def compute_all_masks():
+            # Запись изменила версию, пока пересчитывались маски
+            DoctorDaySlots.objects.all().update(version=F('version') + 1)
+            return masks
+
+        masks = slots.compute_all_masks()
+        with mock.patch('reception.slots.compute_all_masks', compute_all_masks):
+            call_command('rebuild_slot_index', stdout=io.StringIO())
+
+        self.assertEqual(slots.day_state(self.doctor.id, self.monday), (1 << 8, 7))
+
+    def test_rebuild_day_locks_row_before_compute(self):
+        """Тест чтения карточек после создания и блокировки строки индекса."""
+        compute_mask = slots.compute_mask
+        stored = []
+
+        def locked_compute_mask(doctor_id, date):
+            stored.append(DoctorDaySlots.objects.filter(doctor=doctor_id, date=date).exists())
+            return compute_mask(doctor_id, date)
+
+        with mock.patch('reception.slots.compute_mask', locked_compute_mask):
+            Reception.objects.create(
+                doctor=self.doctor, date=self.monday, time=datetime.time(9),
+                fio='Иванов Иван Иванович')
+            slots.rebuild_day(self.doctor.id, self.monday)
+
+        self.assertEqual(stored, [True, True])
+        self.assertEqual(slots.day_state(self.doctor.id, self.monday), (1, 2))
+
+
+class FreeTimeGridCase(TestCase):
+    """Набор тестов представления сетки занятости врачей."""
+
+    def setUp(self):
+        self.ivanov = Doctor.objects.create(
+            name='Иван', surname='Иванов', patronymic='Иванович')
+        self.petrov = Doctor.objects.create(
+            name='Петр', surname='Петров', patronymic='Петрович')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        schedule.build()
+        caches[settings.RECEPTION_THROTTLE_CACHE_ALIAS].clear()
+        super(FreeTimeGridCase, self).setUp()
+
+    def get_grid(self, **params):
+        params.setdefault('date_from', self.monday.strftime('%d.%m.%Y'))
+        params.setdefault(
+            'date_to',
+            (self.monday + datetime.timedelta(days=6)).strftime('%d.%m.%Y'))
+
+        return self.client.get('/reception/get-free-time-grid/', params)
+
+    def test_grid_masks(self):
+        """Тест сетки занятости всех врачей на неделю без выходных."""
+        wednesday = self.monday + datetime.timedelta(days=2)
+        Reception.objects.create(
+            doctor=self.petrov, date=wednesday, time=datetime.time(9),
+            fio='Иванов Иван Иванович')
+        Reception.objects.create(
+            doctor=self.petrov, date=wednesday, time=datetime.time(11),
+            fio='Сидоров Сидор Сидорович')
+
+        with self.assertNumQueries(2):
+            response = self.get_grid()
+
+        content = json.loads(response.content.decode('utf-8'))
+
+        self.assertEqual(len(content['dates']), 5)
+        self.assertEqual(content['doctors'], [self.ivanov.id, self.petrov.id])
+        self.assertEqual(
+            content['grid'], {str(self.petrov.id): [0, 0, 0b101, 0, 0]})
+
+    def test_grid_json_format(self):
+        """Тест сетки занятости выбранных врачей в формате JSON."""
+        Reception.objects.create(
+            doctor=self.ivanov, date=self.monday, time=datetime.time(10),
+            fio='Петров Петр Петрович')
+
+        with self.assertNumQueries(1):
+            response = self.get_grid(
+                doctor_ids=f'{self.ivanov.id},{self.petrov.id}', format='json')
+
+        content = json.loads(response.content.decode('utf-8'))
+
+        self.assertEqual(
+            content['grid'],
+            {str(self.ivanov.id): {
+                self.monday.strftime('%d.%m.%Y'): ['10:00:00']}})
+
+    def test_grid_bad_period(self):
+        """Тест ограничения длины периода сетки занятости."""
+        response = self.get_grid(
+            date_to=(self.monday + datetime.timedelta(days=365)).strftime('%d.%m.%Y'))
+
+        self.assertEqual(response.status_code, 400)
+
+
+class FreeTimeCacheCase(TestCase):
+    """Набор тестов кеша занятости врачей."""
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Александров', patronymic='Петрович')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        free_time_cache.clear()
+        hold_cache.clear()
+        free_time_cache.reset_stats()
+        super(FreeTimeCacheCase, self).setUp()
+
+    def get_busy_time(self):
+        response = self.client.get(
+            '/reception/get-free-time-choices/',
+            {'doctor_id': self.doctor.id,
+             'date': self.monday.strftime('%d.%m.%Y')})
+
+        return json.loads(response.content.decode('utf-8'))['busy_time']
+
+    def test_repeated_lookups_hit_cache(self):
+        """Тест повторного получения занятого времени без запросов к БД."""
+        self.assertEqual(self.get_busy_time(), [])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_busy_time(), [])
+
+        self.assertEqual(free_time_cache.stats['misses'], 1)
+        self.assertEqual(free_time_cache.stats['local_hits'], 1)
+
+    def test_booking_invalidates_cache(self):
+        """Тест сброса кеша при создании и удалении карточки приема."""
+        self.assertEqual(self.get_busy_time(), [])
+
+        reception = Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(9),
+            fio='Иванов Иван Иванович')
+        self.assertEqual(self.get_busy_time(), ['09:00:00'])
+
+        reception.delete()
+        self.assertEqual(self.get_busy_time(), [])
+
+    def test_shared_tier_and_eviction(self):
+        """Тест вытеснения из локального кеша и чтения из общего кеша."""
+        tuesday = self.monday + datetime.timedelta(days=1)
+
+        with self.settings(RECEPTION_FREE_TIME_CACHE_SIZE=1):
+            free_time_cache.get(self.doctor.id, self.monday, slots.day_state)
+            free_time_cache.get(self.doctor.id, tuesday, slots.day_state)
+
+            with self.assertNumQueries(0):
+                free_time_cache.get(
+                    self.doctor.id, self.monday, slots.day_state)
+
+        self.assertEqual(free_time_cache.stats['evictions'], 2)
+        self.assertEqual(free_time_cache.stats['shared_hits'], 1)
+
+    def stale_loader(self, doctor_id, date):
+        """Загружает занятость, после чего запись меняет ее до сохранения в кеш."""
+        state = slots.day_state(doctor_id, date)
+        Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(9),
+            fio='Иванов Иван Иванович')
+        return state
+
+    def test_invalidation_during_load(self):
+        """Тест отказа от значения, сброшенного во время загрузки."""
+        free_time_cache.get(self.doctor.id, self.monday, self.stale_loader)
+
+        self.assertEqual(
+            free_time_cache.get(self.doctor.id, self.monday, slots.day_state),
+            slots.day_state(self.doctor.id, self.monday))
+        self.assertEqual(free_time_cache.stats['misses'], 2)
+
+    async def test_async_invalidation_during_load(self):
+        """Тест отказа от значения, сброшенного во время асинхронной загрузки."""
+        await free_time_cache.aget(
+            self.doctor.id, self.monday, sync_to_async(self.stale_loader))
+
+        self.assertEqual(
+            await free_time_cache.aget(self.doctor.id, self.monday, slots.aday_state),
+            await slots.aday_state(self.doctor.id, self.monday))
+        self.assertEqual(free_time_cache.stats['misses'], 2)
+
+    def test_prime_skips_invalidated(self):
+        """Тест отказа от заранее загруженного значения, сброшенного при загрузке."""
+        free_time_cache.prime(
+            [(self.doctor.id, self.monday)],
+            lambda: {(self.doctor.id, self.monday): self.stale_loader(
+                self.doctor.id, self.monday)})
+
+        self.assertEqual(self.get_busy_time(), ['09:00:00'])
+
+
+class FreeTimeETagCase(TestCase):
+    """Набор тестов условных запросов свободного времени приема врача."""
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Александров', patronymic='Петрович')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        free_time_cache.clear()
+        hold_cache.clear()
+        super(FreeTimeETagCase, self).setUp()
+
+    def get_free_time(self, **headers):
+        return self.client.get(
+            '/reception/get-free-time-choices/',
+            {'doctor_id': self.doctor.id,
+             'date': self.monday.strftime('%d.%m.%Y')},
+            headers=headers)
+
+    def test_not_modified(self):
+        """Тест ответа 304 на запрос с актуальным ETag."""
+        etag = self.get_free_time()['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.get_free_time(if_none_match=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_booking_changes_etag(self):
+        """Тест смены ETag после создания и удаления карточки приема."""
+        etags = [self.get_free_time()['ETag']]
+
+        reception = Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(9),
+            fio='Иванов Иван Иванович')
+        response = self.get_free_time(if_none_match=etags[-1])
+        self.assertEqual(response.status_code, 200)
+        etags.append(response['ETag'])
+
+        reception.delete()
+        response = self.get_free_time(if_none_match=etags[-1])
+        self.assertEqual(response.status_code, 200)
+        etags.append(response['ETag'])
+
+        self.assertEqual(len(set(etags)), 3)
+
+
+class ImportReceptionsCase(TestCase):
+    """Набор тестов команды импорта карточек приема."""
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Александров', patronymic='Петрович')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        self.directory = tempfile.TemporaryDirectory()
+        free_time_cache.clear()
+        hold_cache.clear()
+        super(ImportReceptionsCase, self).setUp()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        super(ImportReceptionsCase, self).tearDown()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file_:
+            file_.write(content)
+
+        return path
+
+    def test_import_csv(self):
+        """Тест импорта CSV с отклонением невалидных и повторных строк."""
+        monday = self.monday.strftime('%d.%m.%Y')
+        saturday = (self.monday + datetime.timedelta(days=5)).isoformat()
+        path = self.write('receptions.csv', (
+            'doctor_id,surname,name,patronymic,date,time,fio\n'
+            f'{self.doctor.id},,,,{monday},09:00,Иванов Иван Иванович\n'
+            f',Александров,Иван,Петрович,{monday},10:00,Петров Петр Петрович\n'
+            f'{self.doctor.id},,,,{monday},09:00,Сидоров Сидор Сидорович\n'
+            f'{self.doctor.id},,,,{saturday},09:00,Сидоров Сидор Сидорович\n'
+            f',Борисов,Борис,Борисович,{monday},09:00,Сидоров Сидор Сидорович\n'
+        ))
+
+        stdout = io.StringIO()
+        call_command('import_receptions', path, batch_size=2, stdout=stdout)
+
+        self.assertEqual(Reception.objects.count(), 2)
+        self.assertEqual(
+            slots.busy_mask(self.doctor.id, self.monday), 0b11)
+        self.assertIn('отклонено: 3', stdout.getvalue())
+
+        with open(f'{path}.rejects.jsonl', encoding='utf-8') as rejects:
+            lines = [json.loads(line)['line'] for line in rejects]
+        self.assertEqual(lines, [4, 5, 6])
+
+    def test_import_jsonl_create_doctors(self):
+        """Тест импорта JSONL с созданием отсутствующих врачей."""
+        path = self.write('receptions.jsonl', json.dumps({
+            'surname': 'Борисов', 'name': 'Борис', 'patronymic': 'Борисович',
+            'date': self.monday.isoformat(), 'time': '17:00',
+            'fio': 'Иванов Иван Иванович'}, ensure_ascii=False) + '\n')
+
+        call_command(
+            'import_receptions', path, create_doctors=True,
+            stdout=io.StringIO())
+
+        reception = Reception.objects.get()
+        self.assertEqual(reception.doctor.surname, 'Борисов')
+        self.assertEqual(reception.time, datetime.time(17))
+        self.assertFalse(os.path.exists(f'{path}.rejects.jsonl'))
+
+    def import_during_booking(self, booking_time, recheck=True):
+        """Импортирует строки, пока другой пациент записывается на ``booking_time``."""
+        date = self.monday.isoformat()
+        path = self.write('receptions.csv', (
+            'doctor_id,date,time,fio\n'
+            f'{self.doctor.id},{date},09:00,Иванов Иван Иванович\n'
+            f'{self.doctor.id},{date},12:00,Петров Петр Петрович\n'))
+        save = ImportReceptionsCommand.save
+
+        def concurrent_save(command, accepted, doctor_ids):
+            # Запись сделана после проверки пакета, но до его сохранения
+            Reception.objects.bulk_create([Reception(
+                doctor=self.doctor, date=self.monday, time=booking_time, duration=30,
+                fio='Сидоров Сидор Сидорович')])
+            if recheck:
+                return save(command, accepted, doctor_ids)
+            # Запись без блокировки врача не видна повторной проверке
+            with mock.patch.object(command, 'load_days', return_value=collections.defaultdict(
+                    intervals.DayIntervals)):
+                return save(command, accepted, doctor_ids)
+
+        with mock.patch.object(ImportReceptionsCommand, 'save', concurrent_save):
+            call_command('import_receptions', path, stdout=io.StringIO())
+
+        with open(f'{path}.rejects.jsonl', encoding='utf-8') as rejects:
+            return [json.loads(line)['error'] for line in rejects]
+
+    def test_import_rechecks_under_lock(self):
+        """Тест повторной проверки пакета под блокировкой врачей."""
+        self.assertEqual(
+            self.import_during_booking(datetime.time(9, 30)), [intervals.OVERLAP_MESSAGE])
+        self.assertEqual(
+            Reception.objects.get(fio='Петров Петр Петрович').time, datetime.time(12))
+
+    def test_import_rejects_integrity_error(self):
+        """Тест отклонения строки, нарушившей уникальность при сохранении."""
+        errors = self.import_during_booking(datetime.time(12), recheck=False)
+
+        self.assertEqual(errors, [DUPLICATE_MESSAGE])
+        self.assertEqual(
+            Reception.objects.get(fio='Иванов Иван Иванович').time, datetime.time(9))
+        self.assertEqual(slots.busy_mask(self.doctor.id, self.monday), 0b1001)
+
+
+class ExportReceptionsCase(TestCase):
+    """Набор тестов выгрузки карточек приема."""
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Александров', patronymic='Петрович')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        for hour in (9, 10):
+            Reception.objects.create(
+                doctor=self.doctor, date=self.monday,
+                time=datetime.time(hour), fio='Иванов Иван Иванович')
+        self.admin = User.objects.create_superuser('admin', password='admin')
+        super(ExportReceptionsCase, self).setUp()
+
+    def test_export_requires_staff(self):
+        """Тест запрета выгрузки без входа в систему."""
+        response = self.client.get('/reception/export/')
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_jsonl(self):
+        """Тест потоковой выгрузки в JSONL с фильтром по периоду."""
+        self.client.force_login(self.admin)
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/reception/export/', {
+                'format': 'jsonl', 'doctor_ids': self.doctor.id,
+                'date_from': self.monday.strftime('%d.%m.%Y')})
+            lines = b''.join(response.streaming_content).decode('utf-8')
+
+        rows = [json.loads(line) for line in lines.splitlines()]
+        self.assertEqual([row['time'] for row in rows], ['09:00:00', '10:00:00'])
+        self.assertEqual(rows[0]['doctor_surname'], 'Александров')
+
+    def test_export_reads_from_replica(self):
+        """Тест чтения потоковой выгрузки с реплики после выхода из представления."""
+        self.client.force_login(self.admin)
+        databases = []
+
+        def iterator(queryset, chunk_size):
+            # БД запроса определяется при чтении, как в QuerySet.iterator
+            databases.append(queryset.db)
+            yield from ()
+
+        with mock.patch.object(
+                QuerySet, 'iterator', autospec=True, side_effect=iterator):
+            with self.settings(RECEPTION_READ_REPLICAS=['replica1']):
+                response = self.client.get('/reception/export/')
+            b''.join(response.streaming_content)
+
+        self.assertEqual(databases, ['replica1'])
+
+    def test_export_admin_action(self):
+        """Тест выгрузки выбранных карточек действием админки."""
+        self.client.force_login(self.admin)
+        reception = Reception.objects.first()
+
+        response = self.client.post('/admin/reception/reception/', {
+            'action': 'export_csv', '_selected_action': [reception.id]})
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{reception.id},'))
+
+
+class ReceptionAdminCase(TestCase):
+    """Набор тестов списка карточек приема в админке."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', password='admin')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        doctors = [
+            Doctor.objects.create(
+                name='Иван', surname=f'Врач {i}', patronymic='Петрович')
+            for i in range(3)
+        ]
+        for doctor in doctors:
+            for hour in slots.WORKING_HOURS:
+                Reception.objects.create(
+                    doctor=doctor, date=self.monday, time=datetime.time(hour),
+                    fio='Иванов Иван Иванович')
+        self.client.force_login(self.admin)
+        patcher = mock.patch.object(ReceptionAdmin, 'list_per_page', 10)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super(ReceptionAdminCase, self).setUp()
+
+    def test_changelist_queries_do_not_grow(self):
+        """Тест отсутствия запроса врача на каждую строку списка."""
+        with self.settings(RECEPTION_ADMIN_COUNT_LIMIT=15):
+            with self.assertNumQueries(4):
+                response = self.client.get('/admin/reception/reception/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'более 15')
+        self.assertContains(response, 'Следующая страница')
+
+    def test_filters_without_table_reads(self):
+        """Тест фильтров по дате и врачу без выборки всех дат и врачей."""
+        doctor = Doctor.objects.order_by('id').first()
+
+        with self.assertNumQueries(4):
+            response = self.client.get('/admin/reception/reception/', {
+                'doctor__id__exact': doctor.id,
+                'date__gte': self.monday.isoformat(),
+                'date__lt': (self.monday + datetime.timedelta(days=1)).isoformat()})
+
+        self.assertEqual(
+            {reception.doctor_id for reception in response.context['cl'].result_list},
+            {doctor.id})
+
+    def test_keyset_pages(self):
+        """Тест перехода по страницам списка по курсору."""
+        seen = []
+        url = '/admin/reception/reception/'
+        with self.settings(RECEPTION_ADMIN_COUNT_LIMIT=15):
+            while url:
+                response = self.client.get(url)
+                cl = response.context['cl']
+                seen.extend(reception.id for reception in cl.result_list)
+                cursor = cl.paginator.current_page.next_cursor
+                url = cursor and f'/admin/reception/reception/?after={cursor}'
+
+        self.assertEqual(
+            seen,
+            list(Reception.objects.order_by('date', 'time', 'id')
+                 .values_list('id', flat=True)))
+
+
+class ArchiveReceptionsCase(TestCase):
+    """Набор тестов архивации прошедших карточек приема."""
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Александров', patronymic='Петрович')
+        self.past_monday = datetime.date(2013, 4, 15)
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        for date in (self.past_monday, self.monday):
+            for hour in (9, 10, 11):
+                Reception.objects.create(
+                    doctor=self.doctor, date=date, time=datetime.time(hour),
+                    fio='Иванов Иван Иванович')
+        super(ArchiveReceptionsCase, self).setUp()
+
+    def test_archive_past_receptions(self):
+        """Тест переноса прошедших карточек в архив порциями."""
+        stdout = io.StringIO()
+        call_command('archive_receptions', chunk_size=2, stdout=stdout)
+
+        self.assertIn('Перенесено в архив карточек: 3', stdout.getvalue())
+        self.assertEqual(
+            set(Reception.objects.values_list('date', flat=True)), {self.monday})
+        self.assertEqual(
+            list(ReceptionArchive.objects.values_list('date', 'fio').distinct()),
+            [(self.past_monday, 'Иванов Иван Иванович')])
+        self.assertEqual(slots.day_state(self.doctor.id, self.past_monday), (0, 5))
+        self.assertEqual(slots.busy_mask(self.doctor.id, self.monday), 0b111)
+
+    def test_archive_future_date(self):
+        """Тест запрета архивации будущих карточек."""
+        with self.assertRaises(CommandError):
+            call_command(
+                'archive_receptions', before=self.monday.strftime('%d.%m.%Y'))
+
+    def test_archive_admin_is_read_only(self):
+        """Тест поиска по архиву в админке без права изменения."""
+        call_command('archive_receptions', stdout=io.StringIO())
+        self.client.force_login(
+            User.objects.create_superuser('admin', password='admin'))
+
+        response = self.client.get(
+            '/admin/reception/receptionarchive/', {'q': 'Иванов'})
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+        archive = ReceptionArchive.objects.first()
+        response = self.client.post(
+            f'/admin/reception/receptionarchive/{archive.id}/change/',
+            {'fio': 'Петров Петр Петрович'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_archive_admin_keyset_pages(self):
+        """Тест перехода по страницам архива по курсору в обратном порядке."""
+        call_command('archive_receptions', stdout=io.StringIO())
+        self.client.force_login(
+            User.objects.create_superuser('admin', password='admin'))
+
+        seen = []
+        url = '/admin/reception/receptionarchive/'
+        with mock.patch.object(ReceptionArchiveAdmin, 'list_per_page', 2):
+            while url:
+                response = self.client.get(url)
+                cl = response.context['cl']
+                seen.extend(archive.id for archive in cl.result_list)
+                cursor = cl.paginator.current_page.next_cursor
+                url = cursor and f'/admin/reception/receptionarchive/?after={cursor}'
+
+        self.assertEqual(
+            seen,
+            list(ReceptionArchive.objects.order_by('-date', '-time', '-id')
+                 .values_list('id', flat=True)))
+
+    def test_delete_doctor_with_receptions(self):
+        """Тест удаления врача вместе с карточками и индексом занятости."""
+        self.doctor.delete()
+
+        self.assertFalse(DoctorDaySlots.objects.exists())
+
+
+class AsyncViewsCase(TestCase):
+    """Набор тестов асинхронных представлений свободного времени."""
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Александров', patronymic='Петрович')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        self.factory = AsyncRequestFactory()
+        free_time_cache.clear()
+        hold_cache.clear()
+        super(AsyncViewsCase, self).setUp()
+
+    def make_request(self, method, *args, **kwargs):
+        request = getattr(self.factory, method)(*args, **kwargs)
+        request.session = SessionStore()
+
+        return request
+
+    async def test_async_free_times(self):
+        """Тест асинхронного получения занятого времени врача."""
+        await Reception.objects.acreate(
+            doctor=self.doctor, date=self.monday, time=datetime.time(15),
+            fio='Иванов Иван Иванович')
+
+        response = await adoctor_free_times(self.make_request('get', '/', {
+            'doctor_id': self.doctor.id,
+            'date': self.monday.strftime('%d.%m.%Y')}))
+
+        self.assertEqual(
+            response.content, b'{"busy_time": ["15:00:00"], "held_time": []}')
+
+        response = await adoctor_free_times(self.make_request('get', '/', {
+            'doctor_id': self.doctor.id,
+            'date': self.monday.strftime('%d.%m.%Y')},
+            headers={'if-none-match': response['ETag']}))
+
+        self.assertEqual(response.status_code, 304)
+
+    async def test_async_calendar_from_cache(self):
+        """Тест чтения календаря врача из кеша без синхронного кода."""
+        await sync_to_async(schedule.build)()
+
+        with mock.patch.object(schedule, 'get_calendar', side_effect=AssertionError):
+            hours = await schedule.aday_hours(self.doctor.id, self.monday)
+
+        self.assertEqual(hours, await sync_to_async(schedule.day_hours)(
+            self.doctor.id, self.monday))
+
+
+class ReplicaRouterCase(TestCase):
+    """Набор тестов маршрутизации чтения на реплики."""
+
+    def test_reads_from_replica_only_in_context(self):
+        """Тест чтения с реплики только внутри read_from_replica."""
+        router = ReplicaRouter()
+
+        with self.settings(RECEPTION_READ_REPLICAS=['replica1', 'replica2']):
+            self.assertIsNone(router.db_for_read(Reception))
+
+            with read_from_replica():
+                self.assertIn(
+                    router.db_for_read(Reception), ('replica1', 'replica2'))
+                self.assertIsNone(router.db_for_write(Reception))
+
+                with use_primary():
+                    self.assertIsNone(router.db_for_read(Reception))
+
+    def test_without_replicas(self):
+        """Тест чтения из основной БД, если реплики не настроены."""
+        with self.settings(RECEPTION_READ_REPLICAS=[]), read_from_replica():
+            self.assertIsNone(ReplicaRouter().db_for_read(Reception))
+
+    def test_copy_sqlite(self):
+        """Тест копирования основной БД в файл реплики."""
+        # Тестовая БД открыта в транзакции, поэтому копируем отдельную БД
+        source = mock.Mock(connection=sqlite3.connect(':memory:'))
+        source.connection.execute('CREATE TABLE doctors (surname TEXT)')
+        source.connection.execute(
+            "INSERT INTO doctors VALUES ('Александров')")
+        source.connection.commit()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'replica.sqlite3')
+            copy_sqlite(source, path)
+
+            replica = sqlite3.connect(path)
+            try:
+                surnames = replica.execute('SELECT surname FROM doctors').fetchall()
+            finally:
+                replica.close()
+
+        self.assertEqual(surnames, [('Александров',)])
+
+
+class SlotHoldCase(TestCase):
+    """Набор тестов временных броней часов приема."""
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Александров', patronymic='Петрович')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        self.first, self.second = Client(), Client()
+        free_time_cache.clear()
+        hold_cache.clear()
+        caches[settings.RECEPTION_THROTTLE_CACHE_ALIAS].clear()
+        # Сессия владельца брони создается при открытии формы записи
+        for client in (self.first, self.second):
+            client.get('/reception/new/')
+        super(SlotHoldCase, self).setUp()
+
+    def hold(self, client, time='09:00'):
+        return client.post('/reception/hold-slot/', {
+            'doctor_id': self.doctor.id,
+            'date': self.monday.strftime('%d.%m.%Y'), 'time': time})
+
+    def get_free_time(self, client):
+        response = client.get('/reception/get-free-time-choices/', {
+            'doctor_id': self.doctor.id,
+            'date': self.monday.strftime('%d.%m.%Y')})
+
+        return json.loads(response.content.decode('utf-8'))
+
+    def book(self, client, time='09:00'):
+        return client.post('/reception/new/', {
+            'doctor': self.doctor.id, 'date': self.monday.strftime('%d.%m.%Y'),
+            'time': time, 'fio': 'Иванов Иван Иванович'})
+
+    def test_hold_is_seen_by_others(self):
+        """Тест видимости брони другим пациентам, но не владельцу."""
+        self.assertEqual(self.hold(self.first).status_code, 200)
+
+        self.assertEqual(self.get_free_time(self.first)['held_time'], [])
+        self.assertEqual(
+            self.get_free_time(self.second)['held_time'], ['09:00:00'])
+        self.assertEqual(self.hold(self.second, '09:30').status_code, 409)
+
+    def test_new_hold_releases_previous(self):
+        """Тест снятия предыдущей брони владельца при новой брони."""
+        self.hold(self.first)
+        self.hold(self.first, '11:00')
+
+        self.assertEqual(
+            self.get_free_time(self.second)['held_time'], ['11:00:00'])
+
+    def test_hold_keeps_index_version(self):
+        """Тест неизменности версии индекса занятости при брони."""
+        self.get_free_time(self.second)
+        self.hold(self.first)
+        self.hold(self.first, '11:00')
+
+        self.assertFalse(DoctorDaySlots.objects.filter(doctor=self.doctor).exists())
+        self.assertEqual(
+            self.get_free_time(self.second)['held_time'], ['11:00:00'])
+
+    def test_booking_respects_hold(self):
+        """Тест отказа в записи на час, забронированный другим пациентом."""
+        self.hold(self.first)
+
+        response = self.book(self.second)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Reception.objects.exists())
+
+        response = self.book(self.first)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(SlotHold.objects.exists())
+        self.assertEqual(
+            self.get_free_time(self.second),
+            {'busy_time': ['09:00:00'], 'held_time': []})
+
+    def test_long_booking_respects_later_hold(self):
+        """Тест отказа в длинном приеме, пересекающем чужую бронь."""
+        self.hold(self.first, '10:00')
+        self.doctor.duration = 120
+        self.doctor.save()
+
+        response = self.book(self.second)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, holds.HOLD_CONFLICT_MESSAGE)
+        self.assertFalse(Reception.objects.exists())
+
+    def test_hold_requires_session(self):
+        """Тест отказа в брони клиенту без сессии."""
+        client = Client()
+        sessions = Session.objects.count()
+        self.assertEqual(self.hold(client).status_code, 403)
+
+        client.cookies[settings.SESSION_COOKIE_NAME] = 'x' * 32
+        self.assertEqual(self.hold(client).status_code, 403)
+        self.assertFalse(SlotHold.objects.exists())
+        self.assertEqual(Session.objects.count(), sessions)
+
+    @override_settings(RECEPTION_SLOT_HOLDS_PER_CLIENT=1)
+    def test_holds_per_client(self):
+        """Тест ограничения числа владельцев броней с одного адреса."""
+        self.assertEqual(self.hold(self.first).status_code, 200)
+        self.assertEqual(self.hold(self.first, '11:00').status_code, 200)
+
+        response = self.hold(self.second, '12:00')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(
+            json.loads(response.content.decode('utf-8')),
+            {'error': holds.CLIENT_HOLDS_MESSAGE})
+
+        response = self.second.post('/reception/hold-slot/', {
+            'doctor_id': self.doctor.id, 'date': self.monday.strftime('%d.%m.%Y'),
+            'time': '12:00'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+    def test_expired_holds(self):
+        """Тест истечения броней и их удаления командой."""
+        self.hold(self.first)
+        SlotHold.objects.update(
+            expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        self.assertEqual(self.get_free_time(self.second)['held_time'], [])
+        self.assertEqual(self.hold(self.second).status_code, 200)
+
+        SlotHold.objects.update(
+            expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        stdout = io.StringIO()
+        call_command('sweep_slot_holds', stdout=stdout)
+
+        self.assertIn('Удалено истекших броней: 1', stdout.getvalue())
+        self.assertFalse(SlotHold.objects.exists())
+
+
+class BenchmarksCase(TestCase):
+    """Набор тестов генератора данных и замеров бенчмарков."""
+
+    def test_generate_data(self):
+        """Тест генерации расписания с заданной заполненностью."""
+        monday = get_next_weekday(datetime.date.today(), 0)
+
+        free = benchmarks.generate_data(2, 1, 0.5, start=monday)
+
+        slots_total = 2 * 5 * len(slots.WORKING_HOURS)
+        self.assertEqual(Reception.objects.count() + len(free), slots_total)
+        self.assertEqual(
+            sum(bin(mask).count('1') for mask in DoctorDaySlots.objects.values_list(
+                'busy_mask', flat=True)),
+            Reception.objects.count())
+
+    def test_measure(self):
+        """Тест подсчета перцентилей и запросов к БД."""
+        result = benchmarks.measure(lambda i: list(Doctor.objects.all()), 10)
+
+        self.assertEqual(result['iterations'], 10)
+        self.assertEqual(result['queries'], 1)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(benchmarks.percentile([1, 2, 3, 4], 50), 2)
+
+
+class DoctorChoicesCase(TestCase):
+    """Набор тестов кешированного справочника и поиска врачей."""
+
+    def setUp(self):
+        cache.clear()
+        self.petrov = Doctor.objects.create(
+            name='Иван', surname='Петров', patronymic='Сергеевич')
+        self.petrova = Doctor.objects.create(
+            name='Алёна', surname='Петрова', patronymic='Ивановна')
+        Doctor.objects.create(
+            name='Олег', surname='Сидоров', patronymic='Петрович')
+
+    def search(self, query, **params):
+        response = Client().get(
+            '/reception/doctors/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [label for _, label in json.loads(response.content)['doctors']]
+
+    def test_form_without_doctor_list(self):
+        """Тест отрисовки формы без списка врачей и без чтения их из БД."""
+        client = Client()
+        client.get('/reception/new/')
+
+        with self.assertNumQueries(0):
+            response = client.get('/reception/new/')
+        self.assertContains(response, 'data-autocomplete-url')
+        self.assertNotContains(response, 'Сидоров Олег Петрович')
+
+    def test_search(self):
+        """Тест поиска врачей по началу слов ФИО."""
+        self.assertEqual(
+            self.search('пет'),
+            ['Петров Иван Сергеевич', 'Петрова Алёна Ивановна',
+             'Сидоров Олег Петрович'])
+        self.assertEqual(self.search('петров ив'),
+                         ['Петров Иван Сергеевич', 'Петрова Алёна Ивановна'])
+        self.assertEqual(self.search('алена'), ['Петрова Алёна Ивановна'])
+        self.assertEqual(self.search('пет', limit=1), ['Петров Иван Сергеевич'])
+        self.assertEqual(self.search('ов'), [])
+
+    def test_doctor_change_invalidates(self):
+        """Тест обновления справочника и индекса после изменения врача."""
+        self.assertEqual(self.search('сид'), ['Сидоров Олег Петрович'])
+
+        Doctor.objects.create(name='Анна', surname='Сидорова', patronymic='Олеговна')
+        self.petrov.delete()
+
+        self.assertEqual(
+            self.search('сид'),
+            ['Сидоров Олег Петрович', 'Сидорова Анна Олеговна'])
+        self.assertNotIn(
+            (self.petrov.pk, 'Петров Иван Сергеевич'), doctors.get_choices())
+
+    def test_selected_doctor(self):
+        """Тест проверки врача запросом по ключу, в списке только выбранный врач."""
+        monday = get_next_weekday(datetime.date.today(), 0)
+        form = ReceptionForm({
+            'doctor': self.petrova.pk, 'date': monday.strftime('%d.%m.%Y'),
+            'time': '09:00', 'fio': ''})
+
+        with CaptureQueriesContext(connection) as context:
+            form.is_valid()
+        # Кроме поля формы, врача по ключу проверяет ForeignKey модели
+        for query in context.captured_queries:
+            if 'FROM "doctors"' in query['sql']:
+                self.assertIn('WHERE "doctors"."id" =', query['sql'])
+
+        html = str(form['doctor'])
+        self.assertIn('Петрова Алёна Ивановна', html)
+        self.assertNotIn('Петров Иван Сергеевич', html)
+
+
+class PageCacheCase(TestCase):
+    """Набор тестов кеширования отрисовки страниц записи."""
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Петров', patronymic='Сергеевич')
+
+    def test_form_fragment_cached(self):
+        """Тест отрисовки незаполненной формы из кеша фрагмента."""
+        Client().get('/reception/new/')
+
+        with mock.patch.object(
+                BoundField, 'as_widget', autospec=True,
+                side_effect=BoundField.as_widget) as as_widget:
+            first = Client().get('/reception/new/')
+            second = Client().get('/reception/new/')
+
+        as_widget.assert_not_called()
+        self.assertContains(first, 'data-autocomplete-url')
+        self.assertNotEqual(
+            first.context['csrf_token'], second.context['csrf_token'])
+        self.assertContains(second, str(second.context['csrf_token']))
+
+    def test_bound_form_not_cached(self):
+        """Тест вывода ошибок проверки заполненной формы."""
+        Client().get('/reception/new/')
+
+        response = Client().post('/reception/new/', {'doctor': self.doctor.pk})
+
+        self.assertContains(response, 'Обязательное поле.')
+
+    def test_success_page_cached(self):
+        """Тест отдачи страницы успешной записи из кеша."""
+        with mock.patch('reception.views.render', wraps=render) as render_mock:
+            first = Client().get('/reception/success/')
+            second = Client().get('/reception/success/')
+
+        render_mock.assert_called_once()
+        self.assertEqual(first.content, second.content)
+        self.assertIn('public', second['Cache-Control'])
+        self.assertIn('max-age=3600', second['Cache-Control'])
+
+
+class StaticAssetsCase(TestCase):
+    """Набор тестов сборки и отдачи бандлов статики."""
+
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        self.static_root = static_root.name
+        settings_override = override_settings(STATIC_ROOT=self.static_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def render_bundle(self, name):
+        return Template('{% load assets %}{% bundle name %}').render(Context({'name': name}))
+
+    def test_sources_without_manifest(self):
+        """Тест подключения исходных файлов бандла до сборки статики."""
+        html = self.render_bundle('js/vendor.js')
+
+        self.assertEqual(html.count('<script'), 3)
+        self.assertIn('/static/js/jquery.min.js', html)
+
+    def test_collectstatic(self):
+        """Тест склейки, хеширования и сжатия бандлов при сборке статики."""
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        name = staticfiles_storage.stored_name('js/vendor.js')
+        self.assertRegex(name, r'^js/vendor\.[0-9a-f]{12}\.js$')
+        self.assertEqual(
+            self.render_bundle('js/vendor.js'), f'<script src="/static/{name}"></script>')
+
+        with staticfiles_storage.open(name) as bundle:
+            content = bundle.read()
+        with staticfiles_storage.open(name + '.gz') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), content)
+        self.assertIn(b'jQuery', content)
+        self.assertNotIn(b'sourceMappingURL', content)
+
+        response = Client().get(f'/static/{name}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/javascript')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), content)
+
+        response = Client().get('/static/js/vendor.js')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+    async def test_async_middleware(self):
+        """Тест отдачи статики без перехода цепочки обработчиков в поток под ASGI."""
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(StaticAssetsMiddleware(get_response)))
+
+        with open(os.path.join(self.static_root, 'robots.txt'), 'w') as robots:
+            robots.write('User-agent: *')
+        response = await AsyncClient().get('/static/robots.txt')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'Нужен os.fork')
+class PreforkServerCase(TestCase):
+    """Набор тестов запуска приложения в предварительно созданных процессах."""
+
+    def start_server(self, *args):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'med.prefork', '--bind', f'127.0.0.1:{port}', *args],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.addCleanup(process.kill)
+        url = f'http://127.0.0.1:{port}/reception/success/'
+
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=5)
+                return process, url
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+    def test_worker_restart_and_stop(self):
+        """Тест перезапуска рабочего после лимита запросов и плавной остановки."""
+        process, url = self.start_server(
+            '--workers', '1', '--max-requests', '2', '--max-requests-jitter', '0')
+
+        statuses = []
+        for _ in range(5):
+            with urllib.request.urlopen(url, timeout=5) as response:
+                statuses.append(response.status)
+        self.assertEqual(statuses, [200] * 5)
+
+        process.send_signal(signal.SIGTERM)
+        self.assertEqual(process.wait(timeout=10), 0)
+
+    def test_shared_caches(self):
+        """Тест отказа запускать несколько рабочих с локальными кешами."""
+        self.assertIsNone(prefork.check_shared_caches(1))
+        self.assertIn("'default'", prefork.check_shared_caches(2))
+
+        shared = {
+            alias: {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': f'/tmp/med-test-{alias}'}
+            for alias in ('default', 'free_time', 'throttle')}
+        with self.settings(CACHES=shared):
+            self.assertIsNone(prefork.check_shared_caches(2))
+
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with self.settings(CACHES={**shared, 'free_time': local}):
+            self.assertIn("'free_time'", prefork.check_shared_caches(2))
+
+    def test_idle_connection_timeout(self):
+        """Тест закрытия соединения клиента, не приславшего запрос."""
+        process, url = self.start_server('--workers', '1', '--timeout', '1')
+
+        address = urllib.parse.urlsplit(url)
+        with socket.create_connection((address.hostname, address.port), timeout=10) as sock:
+            self.assertEqual(sock.recv(1024), b'')
+
+        with urllib.request.urlopen(url, timeout=5) as response:
+            self.assertEqual(response.status, 200)
+
+
+class WarmUpCase(TestCase):
+    """Набор тестов прогрева процесса и проверки готовности."""
+
+    def setUp(self):
+        cache.clear()
+        free_time_cache.clear()
+        hold_cache.clear()
+        warmup._ready.clear()
+        self.addCleanup(warmup._ready.clear)
+
+    def test_ready(self):
+        """Тест ответа о готовности только после успешного прогрева."""
+        with mock.patch('reception.warmup.check_database', side_effect=DatabaseError):
+            response = Client().get('/ready')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(warmup.is_ready())
+
+        response = Client().get('/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'ready': True})
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertTrue(warmup.is_ready())
+
+    def test_warm_up_primes_caches(self):
+        """Тест загрузки занятости и справочника врачей при прогреве."""
+        doctor = Doctor.objects.create(
+            name='Иван', surname='Петров', patronymic='Сергеевич')
+        monday = get_next_weekday(datetime.date.today(), 0)
+        Reception.objects.create(
+            doctor=doctor, date=monday, time=datetime.time(9), fio='Иванов Иван')
+        free_time_cache.clear()
+        hold_cache.clear()
+
+        with self.settings(RECEPTION_WARMUP_DAYS=6):
+            self.assertTrue(warmup.warm_up(keep_connection=True))
+
+        with self.assertNumQueries(0):
+            response = Client().get('/reception/get-free-time-choices/', {
+                'doctor_id': doctor.pk, 'date': monday.strftime('%d.%m.%Y')})
+            self.assertEqual(doctors.search('пет'), [(doctor.pk, 'Петров Иван Сергеевич')])
+        self.assertEqual(json.loads(response.content)['busy_time'], ['09:00:00'])
+
+
+class MetricsCase(TestCase):
+    """Набор тестов метрик запросов."""
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Петров', patronymic='Сергеевич')
+
+    def test_request_metrics(self):
+        """Тест метрик запросов по представлениям и конфликтов записи."""
+        monday = get_next_weekday(datetime.date.today(), 0)
+        Reception.objects.create(
+            doctor=self.doctor, date=monday, time=datetime.time(9), fio='Иванов Иван')
+
+        client = Client()
+        client.get('/reception/new/')
+        client.post('/reception/new/', {
+            'doctor': self.doctor.pk, 'date': monday.strftime('%d.%m.%Y'),
+            'time': '09:00', 'fio': 'Сидоров Олег'})
+
+        response = client.get('/metrics')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+        view = 'view="reception-new"'
+        self.assertIn(
+            f'med_http_requests_total{{{view},method="GET",status="200"}} 1', text)
+        self.assertIn(
+            f'med_http_requests_total{{{view},method="POST",status="200"}} 1', text)
+        self.assertIn(f'med_http_request_duration_seconds_count{{{view}}} 2', text)
+        self.assertIn(f'med_http_request_duration_seconds_bucket{{{view},le="+Inf"}} 2', text)
+        self.assertIn(f'med_db_queries_per_request_count{{{view}}} 2', text)
+        self.assertIn(f'med_http_response_size_bytes_count{{{view}}} 2', text)
+        self.assertIn('med_booking_conflicts_total 1', text)
+
+    def test_metrics_access(self):
+        """Тест доступа к метрикам с разрешенных адресов и сотрудникам."""
+        client = Client(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(client.get('/metrics').status_code, 403)
+
+        client.force_login(User.objects.create_user('user', password='user'))
+        self.assertEqual(client.get('/metrics').status_code, 403)
+
+        client.force_login(User.objects.create_user('staff', password='staff', is_staff=True))
+        self.assertEqual(client.get('/metrics').status_code, 200)
+
+        with self.settings(RECEPTION_METRICS_ALLOWED_IPS=['10.0.0.2']):
+            self.assertEqual(Client(REMOTE_ADDR='10.0.0.2').get('/metrics').status_code, 200)
+
+    async def test_async_request_metrics(self):
+        """Тест метрик запроса, обработанного цепочкой под ASGI."""
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(MetricsMiddleware(get_response)))
+
+        await AsyncClient().get('/reception/new/')
+        text = metrics.render(metrics.registry.collect())
+
+        self.assertIn(
+            'med_http_requests_total{view="reception-new",method="GET",status="200"} 1', text)
+        # Запросы представления в потоке учитываются
+        self.assertRegex(text, r'med_db_queries_per_request_sum\{view="reception-new"\} [1-9]')
+
+    def test_booking_race_conflict(self):
+        """Тест отказа в записи при нарушении уникальности во время сохранения."""
+        monday = get_next_weekday(datetime.date.today(), 0)
+        data = {
+            'doctor': self.doctor.pk, 'date': monday.strftime('%d.%m.%Y'),
+            'time': '09:00', 'fio': 'Сидоров Олег'}
+
+        with mock.patch(
+                'reception.forms.ReceptionForm.validate_unique', autospec=True):
+            Client().post('/reception/new/', data)
+            response = Client().post('/reception/new/', data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Reception.objects.count(), 1)
+        self.assertEqual(
+            metrics.registry.snapshot()[('med_booking_conflicts_total', ())], 1)
+
+    def test_multiple_processes(self):
+        """Тест сложения метрик процессов и архивации завершившихся."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        finished = subprocess.Popen(['true'])
+        finished.wait()
+
+        with self.settings(RECEPTION_METRICS_DIR=directory.name):
+            metrics.write_values(
+                os.path.join(directory.name, f'{finished.pid}-old.json'),
+                {('med_booking_conflicts_total', ()): 2})
+            metrics.registry.inc('med_booking_conflicts_total')
+
+            self.assertEqual(
+                metrics.registry.collect()[('med_booking_conflicts_total', ())], 3)
+            self.assertEqual(
+                sorted(name for name in os.listdir(directory.name) if name.endswith('.json')),
+                sorted([metrics.ARCHIVE_NAME, metrics.registry._file_name]))
+
+            metrics.registry.inc('med_booking_conflicts_total')
+            self.assertIn(
+                'med_booking_conflicts_total 4',
+                metrics.render(metrics.registry.collect()))
+
+
+class QueryBudgetCase(TestCase):
+    """Набор тестов N+1 запросов и бюджетов запросов маршрутов."""
+
+    def setUp(self):
+        cache.clear()
+        free_time_cache.clear()
+        hold_cache.clear()
+        warmup._ready.set()
+        self.addCleanup(warmup._ready.clear)
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        self.doctors = [
+            Doctor.objects.create(name='Иван', surname=f'Врач{i}', patronymic='Петрович')
+            for i in range(6)]
+        for doctor in self.doctors:
+            for hour in slots.WORKING_HOURS[:6]:
+                Reception.objects.create(
+                    doctor=doctor, date=self.monday, time=datetime.time(hour),
+                    fio='Иванов Иван Иванович')
+        schedule.build()
+        self.client.force_login(User.objects.create_superuser('admin', password='admin'))
+
+    def get_requests(self):
+        """Возвращает запросы к маршрутам: имя маршрута, метод, адрес и данные."""
+        doctor = self.doctors[0]
+        date = self.monday.strftime('%d.%m.%Y')
+        reception = Reception.objects.first()
+
+        return [
+            ('index', 'get', '/', {}),
+            ('ready', 'get', '/ready', {}),
+            ('metrics', 'get', '/metrics', {}),
+            ('reception-new', 'get', '/reception/new/', {}),
+            ('reception-new', 'post', '/reception/new/', {
+                'doctor': doctor.pk, 'date': date, 'time': '16:00', 'fio': 'Сидоров'}),
+            ('reception-success', 'get', '/reception/success/', {}),
+            ('free-time-choices', 'get', '/reception/get-free-time-choices/', {
+                'doctor_id': doctor.pk, 'date': date}),
+            ('free-time-events', 'get', '/reception/free-time-events/', {
+                'doctor_id': doctor.pk, 'date': date}),
+            ('free-time-grid', 'get', '/reception/get-free-time-grid/', {
+                'date_from': date, 'date_to': date}),
+            ('earliest-free-time', 'get', '/reception/get-earliest-free-time/', {
+                'date_from': date, 'days': 84}),
+            ('hold-slot', 'post', '/reception/hold-slot/', {
+                'doctor_id': doctor.pk, 'date': date, 'time': '17:00'}),
+            ('doctors-search', 'get', '/reception/doctors/search/', {'q': 'врач'}),
+            ('export', 'get', '/reception/export/', {'format': 'csv'}),
+            ('admin', 'get', '/admin/', {}),
+            ('admin', 'get', '/admin/reception/reception/', {}),
+            ('admin', 'get', f'/admin/reception/reception/{reception.pk}/change/', {}),
+            ('admin', 'get', '/admin/reception/doctor/', {}),
+            ('admin', 'get', '/admin/reception/receptionarchive/', {}),
+        ]
+
+    def test_budgets_declared(self):
+        """Тест наличия бюджета запросов у каждого маршрута."""
+        budgets = set(QUERY_BUDGETS)
+        routes = {
+            pattern.namespace if isinstance(pattern, URLResolver) else pattern.name
+            for pattern in get_resolver().url_patterns}
+
+        self.assertEqual(routes, budgets)
+        self.assertEqual({name for name, *_ in self.get_requests()}, budgets)
+
+    def test_query_budgets(self):
+        """Тест отсутствия N+1 и соблюдения бюджетов запросов маршрутов."""
+        for name, method, path, data in self.get_requests():
+            with self.subTest(path=path, method=method):
+                # Бюджет рассчитан на запрос с пустыми кешами
+                cache.clear()
+                free_time_cache.clear()
+                hold_cache.clear()
+                with querycheck.inspect_queries() as inspector:
+                    response = getattr(self.client, method)(path, data)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+
+                self.assertLess(response.status_code, 400)
+                budget = querycheck.get_query_budget(response.resolver_match)
+                self.assertEqual(inspector.report(path, budget), '')
+
+    def test_detects_n_plus_one(self):
+        """Тест поиска N+1 со стеком вызова."""
+        with querycheck.inspect_queries() as inspector:
+            labels = [str(reception) for reception in Reception.objects.all()]
+
+        self.assertEqual(len(labels), 36)
+        (shape, count, stack), = inspector.repeated()
+        self.assertIn('FROM "doctors"', shape)
+        self.assertEqual(count, 6 * 6)
+        self.assertIn('test_detects_n_plus_one', stack)
+        self.assertIn('N+1', inspector.report('/'))
+
+    @override_settings(RECEPTION_QUERY_INSPECTION='raise')
+    def test_middleware_raises(self):
+        """Тест исключения при N+1 в запросе при включенной проверке."""
+        with mock.patch(
+                'reception.views.doctors.search',
+                side_effect=lambda *args: [str(r) for r in Reception.objects.all()]):
+            with self.assertRaises(querycheck.NPlusOneError):
+                self.client.get('/reception/doctors/search/', {'q': 'врач'})
+
+    @override_settings(RECEPTION_QUERY_INSPECTION='raise')
+    async def test_async_middleware_raises(self):
+        """Тест проверки запросов в цепочке обработчиков под ASGI."""
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(QueryInspectorMiddleware(get_response)))
+
+        with mock.patch(
+                'reception.views.doctors.search',
+                side_effect=lambda *args: [str(r) for r in Reception.objects.all()]):
+            with self.assertRaises(querycheck.NPlusOneError):
+                await AsyncClient().get('/reception/doctors/search/', {'q': 'врач'})
+
+
+class CalendarCase(TestCase):
+    """Набор тестов календаря часов приема."""
+
+    def setUp(self):
+        # Календарь клиники кешируется, а праздники откатываются вместе с тестом
+        self.addCleanup(cache.clear)
+        cache.clear()
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Иванов', patronymic='Иванович')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        self.tuesday = self.monday + datetime.timedelta(days=1)
+
+    def get_free_times(self, date):
+        response = self.client.get('/reception/get-free-time-choices/', {
+            'doctor_id': self.doctor.pk, 'date': date.strftime('%d.%m.%Y')})
+        return json.loads(response.content.decode('utf-8'))['busy_time']
+
+    def test_doctor_schedule(self):
+        """Тест часов приема врача по сменам и исключениям из расписания."""
+        DoctorSchedule.objects.create(
+            doctor=self.doctor, weekday=1,
+            start_time=datetime.time(9), end_time=datetime.time(11))
+        DoctorSchedule.objects.create(
+            doctor=self.doctor, weekday=1,
+            start_time=datetime.time(15), end_time=datetime.time(17))
+        ScheduleException.objects.create(
+            doctor=self.doctor, date=self.tuesday + datetime.timedelta(days=7),
+            start_time=datetime.time(12), end_time=datetime.time(13))
+        ScheduleException.objects.create(
+            doctor=self.doctor, date=self.tuesday + datetime.timedelta(days=14))
+
+        masks = schedule.calendar_masks(
+            schedule.get_calendar(self.doctor.pk),
+            [self.monday, self.tuesday, self.tuesday + datetime.timedelta(days=7),
+             self.tuesday + datetime.timedelta(days=14)])
+
+        self.assertEqual(masks, [0, 0b11000011, 0b1000, 0])
+        self.assertTrue(schedule.is_open(self.doctor.pk, self.tuesday, datetime.time(15, 30)))
+        self.assertFalse(schedule.is_open(self.doctor.pk, self.tuesday, datetime.time(12)))
+
+    def test_holiday(self):
+        """Тест праздничного дня клиники."""
+        ScheduleException.objects.create(
+            doctor=self.doctor, date=self.monday,
+            start_time=datetime.time(9), end_time=datetime.time(18))
+        ClinicHoliday.objects.create(date=self.monday, name='Праздник')
+
+        self.assertTrue(schedule.is_clinic_day_off(self.monday))
+        self.assertFalse(schedule.is_clinic_day_off(self.tuesday))
+        # Исключение из расписания врача не открывает праздничный день
+        self.assertEqual(
+            schedule.day_hours(self.doctor.pk, self.monday)[0], 0)
+        with self.assertRaises(ValidationError):
+            Reception(doctor=self.doctor, date=self.monday, fio='Петров').full_clean()
+
+        options, _ = schedule.picker_options()
+        self.assertEqual(options['daysOfWeekDisabled'], [6, 0])
+        self.assertIn(self.monday.isoformat(), options['disabledDates'])
+        self.assertEqual(options['enabledHours'], list(slots.WORKING_HOURS))
+
+    def test_check_clinic_hours(self):
+        """Тест проверки часов работы клиники вне часов приема."""
+        self.assertEqual(checks.check_clinic_hours(None), [])
+
+        with self.settings(RECEPTION_CLINIC_HOURS={
+                0: ('08:00', '18:00'), 1: ('09:00', '12:00'), 7: ('09:00', '10:00'),
+                2: ('09:00', '19:00'), 3: ('9 утра', '18:00')}):
+            errors = checks.check_clinic_hours(None)
+
+        self.assertEqual(
+            [error.id for error in errors],
+            ['reception.E002', 'reception.E001', 'reception.E002', 'reception.E001'])
+
+    def test_clinic_days_stale_calendar(self):
+        """Тест пересчета устаревшего календаря клиники для рабочих дней."""
+        schedule.build(start=self.monday - datetime.timedelta(days=14), days=14)
+
+        self.assertEqual(schedule.clinic_days([self.monday]), [self.monday])
+
+    def test_stale_calendar_rebuilds_requested_only(self):
+        """Тест пересчета при чтении только запрошенных устаревших календарей."""
+        other = Doctor.objects.create(
+            name='Петр', surname='Борисов', patronymic='Иванович')
+        old_start = self.monday - datetime.timedelta(days=14)
+        schedule.build(start=old_start, days=14)
+
+        calendars = schedule.get_calendars([None, self.doctor.pk], self.monday)
+
+        self.assertTrue(schedule.covers(calendars[None], self.monday))
+        self.assertTrue(schedule.covers(calendars[self.doctor.pk], self.monday))
+        self.assertEqual(schedule.get_calendar(other.pk)[0], old_start)
+
+    def test_reception_outside_doctor_hours(self):
+        """Тест записи на час, в который врач не принимает."""
+        DoctorSchedule.objects.create(
+            doctor=self.doctor, weekday=1,
+            start_time=datetime.time(9), end_time=datetime.time(12))
+
+        response = self.client.post('/reception/new/', {
+            'doctor': self.doctor.pk, 'date': self.tuesday.strftime('%d.%m.%Y'),
+            'time': '14:00', 'fio': 'Петров Петр Петрович'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].errors['time'], [schedule.CLOSED_MESSAGE])
+        self.assertFalse(Reception.objects.exists())
+
+        response = self.client.post('/reception/hold-slot/', {
+            'doctor_id': self.doctor.pk, 'date': self.tuesday.strftime('%d.%m.%Y'),
+            'time': '14:00'})
+        self.assertEqual(response.status_code, 409)
+
+    def test_free_times_closed_hours(self):
+        """Тест занятости врача в часы, в которые он не принимает."""
+        self.assertEqual(self.get_free_times(self.tuesday), [])
+        etag = self.client.get('/reception/get-free-time-choices/', {
+            'doctor_id': self.doctor.pk,
+            'date': self.tuesday.strftime('%d.%m.%Y')})['ETag']
+
+        DoctorSchedule.objects.create(
+            doctor=self.doctor, weekday=1,
+            start_time=datetime.time(13), end_time=datetime.time(18))
+
+        self.assertEqual(
+            self.get_free_times(self.tuesday),
+            ['09:00:00', '10:00:00', '11:00:00', '12:00:00'])
+        self.assertEqual(
+            self.get_free_times(self.monday),
+            [str(datetime.time(hour)) for hour in slots.WORKING_HOURS])
+        response = self.client.get(
+            '/reception/get-free-time-choices/',
+            {'doctor_id': self.doctor.pk, 'date': self.tuesday.strftime('%d.%m.%Y')},
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_build_shares_week_columns(self):
+        """Тест расчета календарей множества врачей."""
+        Doctor.objects.bulk_create(
+            Doctor(name='Иван', surname=f'Врач{i}', patronymic='Петрович')
+            for i in range(1000))
+
+        # Расписание читается тремя запросами, календари пишутся пакетами
+        with self.assertNumQueries(13):
+            calendars = schedule.build()
+
+        self.assertEqual(len(calendars), 1002)
+        self.assertEqual(SlotCalendar.objects.count(), 1002)
+        _, data, _ = calendars[None]
+        self.assertEqual(len(data), settings.RECEPTION_CALENDAR_DAYS * 2)
+        self.assertEqual(
+            {calendar[1] for calendar in calendars.values()}, {data})
+
+    def test_build_calendar_command(self):
+        """Тест команды расчета календаря со сдвигом горизонта."""
+        out = io.StringIO()
+        call_command(
+            'build_calendar', '--days=14', f'--start={self.monday.isoformat()}', stdout=out)
+
+        self.assertIn('Рассчитано календарей: 2', out.getvalue())
+        start, data, _ = schedule.get_calendar(self.doctor.pk)
+        self.assertEqual((start, len(data)), (self.monday, 28))
+        # Дата горизонта, не покрытая календарем, пересчитывает его
+        self.assertEqual(
+            schedule.day_hours(self.doctor.pk, datetime.date.today())[0],
+            0 if datetime.date.today().weekday() > 4 else slots.FULL_MASK)
+        self.assertEqual(schedule.get_calendar(self.doctor.pk)[0], datetime.date.today())
+
+
+class IntervalsCase(TestCase):
+    """Набор тестов пересечения приемов разной длительности."""
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Иванов', patronymic='Иванович')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(9),
+            duration=60, fio='Петров Петр Петрович')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def reception(self, hour, minute=0, duration=60):
+        return Reception(
+            doctor=self.doctor, date=self.monday, time=datetime.time(hour, minute),
+            duration=duration, fio='Сидоров Сидор Сидорович')
+
+    def test_day_intervals(self):
+        """Тест поиска пересечений в упорядоченном списке приемов дня."""
+        day = intervals.DayIntervals([(540, 600), (660, 780)])
+        day.add(600, 615)
+
+        self.assertEqual(day.overlapping(555, 615), [(540, 600), (600, 615)])
+        self.assertEqual(day.overlapping(615, 660), [])
+        self.assertEqual(day.overlapping(770, 800), [(660, 780)])
+        self.assertTrue(day.has_start(600))
+        self.assertFalse(day.has_start(601))
+
+    def test_overlap_validation(self):
+        """Тест отказа в записи на пересекающийся прием."""
+        with self.assertRaisesMessage(ValidationError, intervals.OVERLAP_MESSAGE):
+            self.reception(9, 15).full_clean()
+        with self.assertRaisesMessage(ValidationError, intervals.OVERLAP_MESSAGE):
+            self.reception(9, 45, duration=15).full_clean()
+
+        self.reception(10).full_clean()
+        self.reception(10, 15, duration=15).save()
+        # Приемы в одном часовом слоте пересекаются, как и в индексе занятости
+        with self.assertRaisesMessage(ValidationError, intervals.OVERLAP_MESSAGE):
+            self.reception(10, 30, duration=15).full_clean()
+        # Прием не должен выходить за часы приема врача
+        with self.assertRaisesMessage(ValidationError, schedule.CLOSED_MESSAGE):
+            self.reception(17, duration=90).full_clean()
+
+    def test_find_overlapping_range(self):
+        """Тест выбора кандидатов диапазоном по времени начала."""
+        Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(13),
+            duration=120, fio='Сидоров Сидор Сидорович')
+
+        with self.assertNumQueries(1) as context:
+            found = intervals.find_overlapping(
+                self.doctor.id, self.monday, datetime.time(14, 30), 30)
+
+        self.assertEqual([reception.time for reception in found], [datetime.time(13)])
+        self.assertIn('"receptions"."time" >', context.captured_queries[0]['sql'])
+        self.assertIn('"receptions"."time" <', context.captured_queries[0]['sql'])
+
+    def test_free_times_by_intervals(self):
+        """Тест занятости часов, пересекающих прием со сдвигом."""
+        Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(11, 15),
+            duration=60, fio='Сидоров Сидор Сидорович')
+
+        response = self.client.get('/reception/get-free-time-choices/', {
+            'doctor_id': self.doctor.id, 'date': self.monday.strftime('%d.%m.%Y')})
+
+        self.assertEqual(
+            json.loads(response.content.decode('utf-8'))['busy_time'],
+            ['09:00:00', '11:00:00', '12:00:00'])
+
+    def test_form_rejects_overlap(self):
+        """Тест отказа в записи через форму на пересекающийся прием."""
+        response = self.client.post('/reception/new/', {
+            'doctor': self.doctor.id, 'date': self.monday.strftime('%d.%m.%Y'),
+            'time': '09:30', 'fio': 'Сидоров Сидор Сидорович'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(intervals.OVERLAP_MESSAGE, response.context['form'].non_field_errors())
+        self.assertEqual(Reception.objects.count(), 1)
+
+    def test_form_uses_doctor_duration(self):
+        """Тест длительности приема из карточки врача, а не из формы."""
+        self.doctor.duration = 90
+        self.doctor.save()
+
+        response = self.client.post('/reception/new/', {
+            'doctor': self.doctor.id, 'date': self.monday.strftime('%d.%m.%Y'),
+            'time': '10:00', 'duration': 15, 'fio': 'Сидоров Сидор Сидорович'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Reception.objects.get(time=datetime.time(10)).duration, 90)
+
+    def test_import_rejects_overlap(self):
+        """Тест отклонения пересекающихся строк импорта."""
+        date = self.monday.isoformat()
+        path = os.path.join(self.directory.name, 'receptions.csv')
+        with open(path, 'w', encoding='utf-8') as file_:
+            file_.write(
+                'doctor_id,date,time,duration,fio\n'
+                f'{self.doctor.id},{date},09:45,30,Иванов Иван Иванович\n'
+                f'{self.doctor.id},{date},10:00,90,Иванов Иван Иванович\n'
+                f'{self.doctor.id},{date},11:00,60,Иванов Иван Иванович\n'
+                f'{self.doctor.id},{date},11:15,30,Иванов Иван Иванович\n')
+
+        call_command('import_receptions', path, stdout=io.StringIO())
+
+        self.assertEqual(
+            sorted(Reception.objects.values_list('time', 'duration')),
+            [(datetime.time(9), 60), (datetime.time(10), 90)])
+        with open(f'{path}.rejects.jsonl', encoding='utf-8') as rejects:
+            errors = [json.loads(line)['error'] for line in rejects]
+        self.assertEqual(errors, [intervals.OVERLAP_MESSAGE] * 3)
+
+
+class EarliestFreeTimeCase(TestCase):
+    """Набор тестов поиска ближайших свободных часов приема."""
+
+    def setUp(self):
+        self.doctors = [
+            Doctor.objects.create(name='Иван', surname=f'Иванов {i}', patronymic='Иванович')
+            for i in range(3)]
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        schedule.build()
+        caches[settings.RECEPTION_THROTTLE_CACHE_ALIAS].clear()
+
+    def book(self, doctor, dates, hours=slots.WORKING_HOURS):
+        Reception.objects.bulk_create(
+            Reception(doctor=doctor, date=date, time=datetime.time(hour),
+                      fio='Петров Петр Петрович')
+            for date in dates for hour in hours)
+        slots.rebuild_days({(doctor.id, date) for date in dates})
+
+    def get(self, **params):
+        response = self.client.get('/reception/get-earliest-free-time/', {
+            'date_from': self.monday.strftime('%d.%m.%Y'), **params})
+        self.assertEqual(response.status_code, 200)
+
+        return [
+            (slot['doctor_id'], slot['date'], slot['time'])
+            for slot in json.loads(response.content.decode('utf-8'))['slots']]
+
+    def test_earliest_for_any_doctor(self):
+        """Тест порядка часов по времени и врачу с пропуском занятых."""
+        first, second, third = self.doctors
+        self.book(first, [self.monday], hours=(9,))
+        self.book(second, [self.monday], hours=(9, 10))
+        date = self.monday.strftime('%d.%m.%Y')
+
+        self.assertEqual(self.get(limit=4), [
+            (third.id, date, '09:00:00'),
+            (first.id, date, '10:00:00'),
+            (third.id, date, '10:00:00'),
+            (first.id, date, '11:00:00'),
+        ])
+
+    def test_earliest_skips_booked_and_closed_days(self):
+        """Тест поиска после полностью занятых дней и выходных."""
+        doctor = self.doctors[0]
+        week = [self.monday + datetime.timedelta(days=i) for i in range(5)]
+        self.book(doctor, week)
+        DoctorSchedule.objects.create(
+            doctor=doctor, weekday=1, start_time=datetime.time(13),
+            end_time=datetime.time(15))
+        next_monday = self.monday + datetime.timedelta(days=7)
+        ClinicHoliday.objects.create(date=next_monday)
+        SlotHold.objects.create(
+            doctor=doctor, date=next_monday + datetime.timedelta(days=1),
+            time=datetime.time(13), owner='другой',
+            expires_at=timezone.now() + datetime.timedelta(minutes=1))
+
+        date = (next_monday + datetime.timedelta(days=1)).strftime('%d.%m.%Y')
+        self.assertEqual(
+            self.get(doctor_ids=str(doctor.id), limit=3),
+            [(doctor.id, date, '14:00:00'),
+             (doctor.id, (next_monday + datetime.timedelta(days=8)).strftime(
+                 '%d.%m.%Y'), '13:00:00'),
+             (doctor.id, (next_monday + datetime.timedelta(days=8)).strftime(
+                 '%d.%m.%Y'), '14:00:00')])
+
+    def test_fully_booked_horizon(self):
+        """Тест поиска по полностью занятому горизонту одним проходом."""
+        dates = benchmarks.working_days(self.monday, 12)
+        for doctor in self.doctors:
+            self.book(doctor, dates)
+        doctor_ids = [doctor.id for doctor in self.doctors]
+        earliest.find_earliest(doctor_ids, self.monday, 84, 10)
+
+        with self.assertNumQueries(2):
+            found = earliest.find_earliest(doctor_ids, self.monday, 84, 10)
+
+        self.assertEqual(found, [])
+
+    def test_unknown_doctors_and_bad_params(self):
+        """Тест ответа для неизвестных врачей и некорректных параметров."""
+        self.assertEqual(self.get(doctor_ids='999999'), [])
+
+        url = '/reception/get-earliest-free-time/'
+        self.assertEqual(self.client.get(url, {'days': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'days': 93}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'doctor_ids': 'a'}).status_code, 400)
+
+
+@override_settings(RECEPTION_THROTTLE_RATES={'free-time': (1, 2)})
+class ThrottleCase(TestCase):
+    """Набор тестов ограничения частоты запросов свободного времени."""
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Иванов', patronymic='Иванович')
+        self.params = {
+            'doctor_id': self.doctor.id,
+            'date': get_next_weekday(datetime.date.today(), 0).strftime('%d.%m.%Y')}
+        caches[settings.RECEPTION_THROTTLE_CACHE_ALIAS].clear()
+        metrics.registry.reset()
+
+    def test_take(self):
+        """Тест расхода и пополнения ведра токенов."""
+        full_at, wait = throttle.take(None, 100, 2, 3)
+        self.assertEqual((full_at, wait), (100.5, 0))
+        full_at, wait = throttle.take(full_at, 100, 2, 3)
+        full_at, wait = throttle.take(full_at, 100, 2, 3)
+        self.assertEqual((full_at, wait), (101.5, 0))
+
+        self.assertEqual(throttle.take(full_at, 100, 2, 3), (None, 0.5))
+        # За полсекунды пополняется один токен
+        self.assertEqual(throttle.take(full_at, 100.5, 2, 3), (102, 0))
+
+    def test_free_times_throttled(self):
+        """Тест ответа 429 после исчерпания ведра клиента."""
+        url = '/reception/get-free-time-choices/'
+        for _ in range(2):
+            self.assertEqual(self.client.get(url, self.params).status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, self.params)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(
+            json.loads(response.content.decode('utf-8')),
+            {'error': throttle.THROTTLE_MESSAGE})
+        self.assertEqual(
+            metrics.registry.snapshot()[
+                'med_throttled_requests_total', (('scope', 'free-time'),)], 1)
+
+        # У другого клиента свое ведро
+        response = self.client.get(url, self.params, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(RECEPTION_THROTTLE_CLIENT_HEADER='HTTP_X_REAL_IP')
+    def test_client_header(self):
+        """Тест адреса клиента из заголовка обратного прокси."""
+        url = '/reception/get-free-time-choices/'
+        for address in ('10.0.0.1', '10.0.0.1', '10.0.0.2'):
+            response = self.client.get(url, self.params, headers={'x-real-ip': address})
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(url, self.params, headers={'x-real-ip': '10.0.0.1'})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(RECEPTION_THROTTLE_RATES={
+        'free-time-grid': (1, 1), 'earliest': (1, 1), 'hold': (1, 1)})
+    def test_heavy_views_throttled(self):
+        """Тест ограничения частоты запросов сетки, поиска часов и брони."""
+        monday = self.params['date']
+        requests = (
+            ('get', '/reception/get-free-time-grid/', {'date_from': monday}),
+            ('get', '/reception/get-earliest-free-time/', {}),
+            ('post', '/reception/hold-slot/', {
+                'doctor_id': self.doctor.id, 'date': monday, 'time': '09:00'}),
+        )
+        for method, url, params in requests:
+            getattr(self.client, method)(url, params)
+            response = getattr(self.client, method)(url, params)
+            self.assertEqual(response.status_code, 429, url)
+
+    @override_settings(RECEPTION_THROTTLE_CLIENT_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_forwarded_for_spoofing(self):
+        """Тест адреса клиента из последнего адреса в X-Forwarded-For."""
+        url = '/reception/get-free-time-choices/'
+        statuses = [
+            self.client.get(url, self.params, headers={
+                'x-forwarded-for': f'10.1.0.{number}, 10.0.0.1'}).status_code
+            for number in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+
+    async def test_async_free_times_throttled(self):
+        """Тест ограничения частоты запросов асинхронного представления."""
+        factory = AsyncRequestFactory()
+        statuses = []
+        for _ in range(3):
+            request = factory.get('/', self.params)
+            request.session = SessionStore()
+            statuses.append((await adoctor_free_times(request)).status_code)
+
+        self.assertEqual(statuses, [200, 200, 429])
+
+
+@override_settings(RECEPTION_ASYNC_VIEWS=True)
+class FreeTimeEventsCase(TestCase):
+    """Набор тестов потока изменений занятости врача."""
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            name='Иван', surname='Иванов', patronymic='Иванович')
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        self.channel = events.channel(self.doctor.id, self.monday)
+        DoctorSchedule.objects.create(
+            doctor=self.doctor, weekday=0, start_time=datetime.time(9),
+            end_time=datetime.time(17))
+        Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(15),
+            fio='Петров Петр Петрович')
+
+    async def next_event(self, stream):
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        return chunk.decode('utf-8')
+
+    async def test_broker(self):
+        """Тест доставки последнего сообщения подписчику из другого потока."""
+        broker = events.LocalBroker()
+        subscription = broker.subscribe('канал')
+
+        self.assertIsNone(await subscription.get(0.01))
+
+        await asyncio.to_thread(broker.publish, 'канал', 1)
+        await asyncio.to_thread(broker.publish, 'канал', 2)
+        broker.publish('другой канал', 3)
+
+        self.assertEqual(await subscription.get(1), 2)
+        self.assertIsNone(await subscription.get(0.01))
+
+        broker.unsubscribe(subscription)
+        self.assertFalse(broker.has_subscribers('канал'))
+
+    async def test_stream(self):
+        """Тест событий потока после создания и удаления карточки приема."""
+        request = AsyncRequestFactory().get('/', {
+            'doctor_id': self.doctor.id, 'date': self.monday.strftime('%d.%m.%Y')})
+        response = await free_time_events(request)
+        stream = aiter(response.streaming_content)
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(
+            await self.next_event(stream),
+            'retry: 3000\nevent: busy\nid: 1\n'
+            'data: {"busy_time": ["15:00:00", "17:00:00"]}\n\n')
+        self.assertTrue(events.get_broker().has_subscribers(self.channel))
+
+        def change(action):
+            with self.captureOnCommitCallbacks(execute=True):
+                action()
+
+        await sync_to_async(change)(lambda: Reception.objects.create(
+            doctor=self.doctor, date=self.monday, time=datetime.time(10, 30),
+            duration=30, fio='Сидоров Сидор Сидорович'))
+        self.assertEqual(
+            await self.next_event(stream),
+            'event: delta\nid: 2\ndata: {"busy": ["10:00:00"], "free": []}\n\n')
+
+        await sync_to_async(change)(
+            lambda: Reception.objects.filter(time=datetime.time(15)).delete())
+        self.assertEqual(
+            await self.next_event(stream),
+            'event: delta\nid: 3\ndata: {"busy": [], "free": ["15:00:00"]}\n\n')
+
+        # При отключении клиента сервер отменяет ожидание следующего события
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.01)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertFalse(events.get_broker().has_subscribers(self.channel))
+
+    @override_settings(RECEPTION_EVENTS_KEEPALIVE=0.01, RECEPTION_EVENTS_MAX_AGE=0.05)
+    async def test_keepalive_and_max_age(self):
+        """Тест комментариев без изменений и завершения потока."""
+        request = AsyncRequestFactory().get('/', {
+            'doctor_id': self.doctor.id, 'date': self.monday.strftime('%d.%m.%Y')})
+        response = await free_time_events(request)
+        chunks = [chunk.decode('utf-8') async for chunk in response.streaming_content]
+
+        self.assertIn('event: busy', chunks[0])
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(set(chunks[1:]), {': keepalive\n\n'})
+        self.assertFalse(events.get_broker().has_subscribers(self.channel))
+
+    def test_publish_without_subscribers(self):
+        """Тест отсутствия запросов, если на день никто не подписан."""
+        with self.assertNumQueries(0):
+            events.publish_days({(self.doctor.id, self.monday)})
+
+    @override_settings(RECEPTION_ASYNC_VIEWS=False)
+    def test_wsgi(self):
+        """Тест отказа от потока событий под WSGI."""
+        response = self.client.get('/reception/free-time-events/', {
+            'doctor_id': self.doctor.id, 'date': self.monday.strftime('%d.%m.%Y')})
+
+        self.assertEqual(response.status_code, 204)
+        self.assertNotContains(
+            self.client.get('/reception/new/'), 'data-events-url')
+
+
+class ShardingCase(TransactionTestCase):
+    """Набор тестов шардирования карточек приема по врачам.
+
+    Шарды - отдельные файлы SQLite, которые создаются на время тестов.
+    """
+
+    shards = 'shard1', 'shard2'
+    # Шарды подключаются в setUpClass, после проверок запуска тестов
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        for alias in cls.shards:
+            path = os.path.join(cls.directory.name, f'{alias}.sqlite3')
+            settings.DATABASES[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'TEST': {'NAME': path}}
+            connections.settings[alias] = connections.configure_settings({
+                'default': connections.settings['default'],
+                alias: settings.DATABASES[alias]})[alias]
+
+        cls.shard_settings = override_settings(RECEPTION_SHARDS=list(cls.shards))
+        cls.shard_settings.enable()
+        for alias in cls.shards:
+            connections[alias].creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in cls.shards:
+            connections[alias].creation.destroy_test_db(
+                settings.DATABASES[alias]['NAME'], verbosity=0)
+            del connections[alias]
+            # Настройки соединений обычно и есть settings.DATABASES
+            connections.settings.pop(alias, None)
+            settings.DATABASES.pop(alias, None)
+        cls.shard_settings.disable()
+        cls.directory.cleanup()
+
+    def setUp(self):
+        sharding.reset()
+        cache.clear()
+        self.first, self.second = [
+            Doctor.objects.create(name='Иван', surname=f'Иванов {i}', patronymic='Иванович')
+            for i in range(2)]
+        self.monday = get_next_weekday(datetime.date.today(), 0)
+        self.admin = User.objects.create_superuser('admin', password='admin')
+
+    def book(self, doctor, hour):
+        return Reception.objects.create(
+            doctor=doctor, date=self.monday, time=datetime.time(hour),
+            fio='Петров Петр Петрович')
+
+    def test_doctors_spread_and_mirrored(self):
+        """Тест выбора шарда нового врача и копирования его строки в шард."""
+        self.assertEqual((self.first.shard, self.second.shard), self.shards)
+        self.assertEqual(sharding.shard_for(self.second.id), 'shard2')
+        self.assertTrue(Doctor.objects.using('shard2').filter(pk=self.second.pk).exists())
+        self.assertFalse(Doctor.objects.using('shard1').filter(pk=self.second.pk).exists())
+
+    def test_shard_lookup(self):
+        """Тест чтения шарда одного врача при его отсутствии в карте шардов."""
+        sharding.reset()
+
+        with self.assertNumQueries(1, using='default'):
+            self.assertEqual(sharding.shard_for(self.second.id), 'shard2')
+            self.assertEqual(sharding.shard_for(self.second.id), 'shard2')
+        with self.assertNumQueries(1, using='default'):
+            self.assertIsNone(sharding.shard_for(self.second.id + 100))
+
+    def test_reception_routed_to_doctor_shard(self):
+        """Тест сохранения карточки и индекса занятости в шарде врача."""
+        reception = self.book(self.second, 10)
+
+        self.assertEqual(reception._state.db, 'shard2')
+        self.assertGreater(reception.id, 2 * sharding.ID_STEP)
+        self.assertEqual(sharding.shard_for_pk(reception.id), 'shard2')
+        self.assertFalse(Reception.objects.using('default').exists())
+        self.assertEqual(
+            DoctorDaySlots.objects.using('shard2').get(doctor=self.second).busy_mask,
+            0b10)
+
+    def test_form_and_free_times_routed(self):
+        """Тест записи через форму и чтения занятости из шарда врача."""
+        response = self.client.post('/reception/new/', {
+            'doctor': self.first.id, 'date': self.monday.strftime('%d.%m.%Y'),
+            'time': '11:00', 'fio': 'Иванов Иван Иванович'})
+
+        self.assertRedirects(response, '/reception/success', fetch_redirect_response=False)
+        self.assertEqual(Reception.objects.using('shard1').get().doctor_id, self.first.id)
+
+        response = self.client.get('/reception/get-free-time-choices/', {
+            'doctor_id': self.first.id, 'date': self.monday.strftime('%d.%m.%Y')})
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertIn('11:00:00', content['busy_time'])
+
+    async def test_async_free_times_routed(self):
+        """Тест чтения занятости из шарда врача асинхронным представлением."""
+        await sync_to_async(self.book)(self.second, 12)
+        request = AsyncRequestFactory().get('/', {
+            'doctor_id': self.second.id, 'date': self.monday.strftime('%d.%m.%Y')})
+        request.session = SessionStore()
+
+        content = json.loads((await adoctor_free_times(request)).content.decode('utf-8'))
+
+        self.assertIn('12:00:00', content['busy_time'])
+
+    def test_reports_merge_shards(self):
+        """Тест объединения выгрузки и сетки занятости по всем шардам."""
+        self.book(self.second, 9)
+        self.book(self.first, 10)
+        self.book(self.second, 11)
+        self.client.force_login(self.admin)
+
+        response = self.client.get('/reception/export/', {'format': 'jsonl'})
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(
+            [(row['doctor_id'], row['time']) for row in rows],
+            [(self.second.id, '09:00:00'), (self.first.id, '10:00:00'),
+             (self.second.id, '11:00:00')])
+
+        self.assertEqual(slots.busy_grid(None, [self.monday]), {
+            self.first.id: [0b10], self.second.id: [0b101]})
+
+    def test_admin_routed_by_reception_id(self):
+        """Тест открытия карточки шарда и списка шарда в админке."""
+        reception = self.book(self.second, 9)
+        self.client.force_login(self.admin)
+
+        response = self.client.get(f'/admin/reception/reception/{reception.id}/change/')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/admin/reception/reception/', {'shard': 'shard2'})
+        self.assertEqual(
+            [obj.id for obj in response.context['cl'].result_list], [reception.id])
+
+    def test_move_to_other_shard_rejected(self):
+        """Тест запрета переноса карточки к врачу другого шарда."""
+        reception = self.book(self.second, 9)
+        reception.doctor = self.first
+
+        with self.assertRaisesMessage(ValidationError, sharding.MOVE_MESSAGE):
+            reception.full_clean()
@@ -0,0 +1,133 @@
+"""Ограничение частоты запросов клиента.
+
+Каждому клиенту и группе представлений соответствует ведро токенов: в нем
+помещается ``burst`` токенов, токены пополняются со скоростью ``rate`` в
+секунду, каждый запрос забирает один токен. Запрос к пустому ведру
+получает ответ 429 с заголовком ``Retry-After``.
+
+Состояние ведра - одно число, время, когда ведро снова станет полным
+(алгоритм GCRA), поэтому хранится в общем кеше
+``settings.RECEPTION_THROTTLE_CACHE_ALIAS`` и действует на все процессы,
+если кеш общий. Чтение и запись не атомарны: одновременные запросы одного
+клиента могут получить на несколько токенов больше, но не больше числа
+одновременных запросов.
+"""
+import functools
+import json
+import math
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from reception.metrics import registry
+
+THROTTLE_MESSAGE = 'Слишком много запросов, повторите позже.'
+
+
+def get_client(request):
+    """Возвращает адрес клиента.
+
+    За обратным прокси адрес берется из заголовка
+    ``settings.RECEPTION_THROTTLE_CLIENT_HEADER``. Из списка адресов,
+    как в ``X-Forwarded-For``, берется последний: его добавил прокси,
+    а предыдущие присылает сам клиент и может подменить.
+
+    :rtype str
+    """
+    header = settings.RECEPTION_THROTTLE_CLIENT_HEADER
+    if header and request.META.get(header):
+        return request.META[header].split(',')[-1].strip()
+
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def make_key(scope, client):
+    """Возвращает ключ кеша ведра клиента."""
+    return f'throttle:{scope}:{client}'
+
+
+def take(full_at, now, rate, burst):
+    """Забирает токен из ведра.
+
+    :param full_at: Время, когда ведро станет полным, None - ведро полное
+    :type full_at: float or None
+    :param now: Текущее время
+    :type now: float
+    :param rate: Скорость пополнения, токенов в секунду
+    :type rate: float
+    :param burst: Вместимость ведра
+    :type burst: int
+
+    :return Новое время заполнения ведра и время ожидания токена в секундах,
+            время ожидания 0 - токен получен
+    :rtype tuple
+    """
+    interval = 1 / rate
+    full_at = max(full_at or now, now) + interval
+    wait = full_at - burst * interval - now
+    if wait > 0:
+        return None, wait
+
+    return full_at, 0
+
+
+def too_many_requests(scope, wait):
+    """Возвращает ответ 429 с временем ожидания в ``Retry-After``."""
+    registry.inc('med_throttled_requests_total', (('scope', scope),))
+    response = HttpResponse(
+        json.dumps({'error': THROTTLE_MESSAGE}, ensure_ascii=False),
+        content_type='application/json', status=429)
+    response['Retry-After'] = str(math.ceil(wait))
+
+    return response
+
+
+def throttle(scope):
+    """Декоратор представления, ограничивающий частоту запросов клиента.
+
+    Скорость и вместимость ведра группы представлений ``scope`` задаются
+    в ``settings.RECEPTION_THROTTLE_RATES``, группа без настройки
+    не ограничивается. Подходит для синхронных и асинхронных представлений.
+    """
+    def get_bucket(request):
+        limits = settings.RECEPTION_THROTTLE_RATES.get(scope)
+        if not limits:
+            return None
+
+        cache = caches[settings.RECEPTION_THROTTLE_CACHE_ALIAS]
+        return cache, make_key(scope, get_client(request)), limits
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                bucket = get_bucket(request)
+                if bucket is not None:
+                    cache, key, (rate, burst) = bucket
+                    now = time.time()
+                    full_at, wait = take(await cache.aget(key), now, rate, burst)
+                    if wait:
+                        return too_many_requests(scope, wait)
+                    await cache.aset(key, full_at, math.ceil(full_at - now))
+
+                return await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                bucket = get_bucket(request)
+                if bucket is not None:
+                    cache, key, (rate, burst) = bucket
+                    now = time.time()
+                    full_at, wait = take(cache.get(key), now, rate, burst)
+                    if wait:
+                        return too_many_requests(scope, wait)
+                    cache.set(key, full_at, math.ceil(full_at - now))
+
+                return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -3,6 +3,19 @@ import datetime
 from django.core.exceptions import ValidationError
 
 
+def is_day_off(date):
+    """Проверяет, является ли дата выходным или праздничным днем клиники.
+
+    :param date: Дата
+    :type date: datetime.date
+
+    :rtype bool
+    """
+    from reception import schedule
+
+    return schedule.is_clinic_day_off(date)
+
+
 def validate_week_day(date):
     """Валидирует дату.
 
@@ -12,7 +25,7 @@ def validate_week_day(date):
     :raise django.core.exceptions.ValidationError
     """
     # Проверяем, что дата не является выходным днем
-    if date.weekday() in (5, 6):
+    if is_day_off(date):
         raise ValidationError(
             'Выбранная дата - {date}, является выходным днем.'.format(
                 date=date)
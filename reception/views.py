@@ -1,13 +1,40 @@
+import asyncio
 import datetime
 import json
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import permission_required
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, router, transaction
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse)
 from django.shortcuts import render
-from django.views.generic import CreateView
-from django.views.generic import RedirectView
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.cache import cache_control, cache_page, never_cache
+from django.views.decorators.http import require_POST
+from django.views.generic import CreateView, RedirectView
 
+from reception import (
+    doctors, earliest, events, holds, intervals, metrics, schedule, sharding, slots, warmup)
+from reception.cache import free_time_cache, hold_cache
+from reception.export import EXPORT_FORMATS, filter_receptions, streaming_export
 from reception.forms import ReceptionForm
-from reception.models import Reception
+from reception.models import Doctor, Reception
+from reception.routers import replica_reads, use_primary
+from reception.throttle import get_client, throttle
+
+# Максимальная длина периода сетки занятости в днях
+GRID_MAX_DAYS = 92
+
+# Максимальное число врачей в ответе поиска
+DOCTOR_SEARCH_MAX_LIMIT = 50
+
+# Максимальная длина периода поиска ближайших свободных часов в днях
+EARLIEST_MAX_DAYS = 92
+
+# Максимальное число часов в ответе поиска ближайших свободных часов
+EARLIEST_MAX_LIMIT = 50
 
 
 class CreateReception(CreateView):
@@ -17,27 +44,510 @@ class CreateReception(CreateView):
     form_class = ReceptionForm
     success_url = '/reception/success'
 
+    def get(self, request, *args, **kwargs):
+        # Брони пациента принадлежат сессии, открытой вместе с формой
+        holds.start_session(request)
+        return super().get(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        # Проверка уникальности должна видеть последние записи в шарде врача
+        with use_primary(), sharding.for_doctor(request.POST.get('doctor')):
+            return super().post(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        owner = holds.get_owner(self.request)
+        if not check_slot_hold(form, owner):
+            return self.form_invalid(form)
+
+        try:
+            with transaction.atomic(using=router.db_for_write(Reception)):
+                if not check_overlap(form):
+                    return self.form_invalid(form)
+                response = super().form_valid(form)
+        except IntegrityError:
+            # Час заняли между проверкой формы и сохранением карточки
+            add_booking_conflict(form)
+            return self.form_invalid(form)
+        holds.holds_changed(holds.release_holds(owner))
+
+        return response
+
+    def form_invalid(self, form):
+        count_booking_conflict(form)
+        return super().form_invalid(form)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        return {**context, **form_context(context['form'])}
+
+
+def form_context(form):
+    """Возвращает контекст шаблона формы записи.
+
+    Отрисовка незаполненной формы кешируется фрагментом шаблона до изменения
+    календаря клиники: врачи в форму не выводятся, а подбираются поиском.
+    Токен CSRF и ошибки проверки в кешированный фрагмент не попадают
+    и выводятся на каждый запрос. Поток изменений занятости подключается
+    только под ASGI.
+    """
+    return {
+        'form': form,
+        'calendar_version': form.calendar_version,
+        'form_cache_timeout': settings.RECEPTION_PAGE_CACHE_TIMEOUT,
+        'events_url': (
+            '/reception/free-time-events/' if settings.RECEPTION_ASYNC_VIEWS else None),
+    }
+
+
+def add_booking_conflict(form):
+    """Добавляет в форму ошибку уникальности врача, даты и времени приема."""
+    form.add_error(None, form.instance.unique_error_message(
+        Reception, ('doctor', 'date', 'time')))
+
+
+def count_booking_conflict(form):
+    """Учитывает в метриках отказ в записи на уже занятое время приема."""
+    if any(error.code in ('unique_together', 'overlap')
+           for error in form.non_field_errors().as_data()):
+        metrics.registry.inc('med_booking_conflicts_total')
+
+
+def check_overlap(form):
+    """Повторно проверяет пересечение приема под блокировкой врача.
+
+    Вызывается в транзакции сохранения карточки. При пересечении добавляет
+    ошибку в форму.
+
+    :rtype bool
+    """
+    reception = form.instance
+    intervals.lock_doctor(reception.doctor_id)
+    if reception.overlapping():
+        form.add_error(None, ValidationError(intervals.OVERLAP_MESSAGE, code='overlap'))
+        return False
+
+    return True
+
+
+def check_slot_hold(form, owner):
+    """Проверяет, что выбранные в форме часы не забронированы другим пациентом.
+
+    При конфликте добавляет ошибку в форму.
+
+    :rtype bool
+    """
+    data = form.cleaned_data
+    if holds.is_held_by_other(
+            data['doctor'].id, data['date'], data['time'], owner, form.instance.duration):
+        form.add_error('time', holds.HOLD_CONFLICT_MESSAGE)
+        return False
 
+    return True
+
+
+@cache_control(public=True)
+@cache_page(settings.RECEPTION_PAGE_CACHE_TIMEOUT)
 def reception_success(request):
-    """Представление успешного создания карточки на прием к врачу."""
+    """Представление успешного создания карточки на прием к врачу.
+
+    Страница статическая, поэтому целиком отдается из кеша и может
+    кешироваться браузером и промежуточными прокси.
+    """
     return render(request, 'reception/reception_success.html')
 
 
+@never_cache
+def ready(request):
+    """Представление проверки готовности процесса к приему запросов.
+
+    Отвечает 503, пока прогрев процесса не завершен. Если прогрев при
+    запуске не удался, например из-за недоступной БД, он повторяется.
+    """
+    if not warmup.is_ready() and not warmup.warm_up(keep_connection=True):
+        return HttpResponse(
+            json.dumps({'ready': False}), content_type='application/json', status=503)
+
+    return HttpResponse(json.dumps({'ready': True}), content_type='application/json')
+
+
+@never_cache
+def metrics_view(request):
+    """Представление метрик всех процессов в текстовом формате Prometheus.
+
+    Метрики доступны адресам ``RECEPTION_METRICS_ALLOWED_IPS`` без обращения
+    к БД, остальным - только сотрудникам.
+    """
+    if (get_client(request) not in settings.RECEPTION_METRICS_ALLOWED_IPS
+            and not request.user.is_staff):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        metrics.render(metrics.registry.collect()), content_type=metrics.CONTENT_TYPE)
+
+
 class CreateReceptionRedirectView(RedirectView):
     """Представление для перенаправления на страницу создания карточки."""
 
     url = 'reception/new'
 
 
-def doctor_free_times(request):
-    """Представление для получения свободного времени приема врача на дату."""
+def get_free_times_params(request):
+    """Возвращает врача и дату из запроса свободного времени приема."""
     doctor_id = int(request.GET['doctor_id'])
-    date = datetime.datetime.strptime(request.GET['date'], "%d.%m.%Y")
+    date = datetime.datetime.strptime(request.GET['date'], "%d.%m.%Y").date()
+
+    return doctor_id, date
+
+
+def free_times_response(request, doctor_id, date, state, day_holds, hours):
+    """Возвращает ответ со временем приема врача или 304 по ETag.
+
+    В ``busy_time`` кроме занятых попадают часы, в которые врач не принимает
+    по календарю, в ``held_time`` - часы, забронированные другими пациентами.
+    """
+    mask, version = state
+    open_mask, calendar_version = hours
+    mask |= slots.FULL_MASK & ~open_mask
+    held = holds.held_mask(day_holds, request.session.session_key) & ~mask
+    etag = f'"{doctor_id}-{date:%Y%m%d}-{version}-{calendar_version}-{held}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        busy_time = slots.times_from_mask(mask)
+        held_time = slots.times_from_mask(held)
+        response = HttpResponse(
+            json.dumps({
+                'busy_time': [str(bt) for bt in busy_time],
+                'held_time': [str(ht) for ht in held_time],
+            }),
+            content_type='application/json')
+
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Cookie'])
+
+    return response
+
+
+@throttle('free-time')
+def doctor_free_times(request):
+    """Представление для получения свободного времени приема врача на дату.
+
+    ETag ответа строится по версии строки индекса занятости, поэтому на
+    запрос с совпадающим ``If-None-Match`` отвечаем 304 без чтения карточек.
+
+    Индекс читается из основной БД, а не с реплики: прочитанное значение
+    кешируется до следующего сброса, и отставание реплики осталось бы в кеше.
+    """
+    doctor_id, date = get_free_times_params(request)
+    with sharding.for_doctor(doctor_id):
+        state = free_time_cache.get(doctor_id, date, slots.day_state)
+        day_holds = hold_cache.get(doctor_id, date, holds.load_day)
+    hours = schedule.day_hours(doctor_id, date)
+
+    return free_times_response(request, doctor_id, date, state, day_holds, hours)
 
-    busy_time = Reception.objects.filter(
-        doctor=doctor_id, date=date).values_list('time', flat=True)
 
+@throttle('free-time')
+async def adoctor_free_times(request):
+    """Асинхронная версия представления ``doctor_free_times``."""
+    doctor_id, date = get_free_times_params(request)
+    with await sharding.afor_doctor(doctor_id):
+        state = await free_time_cache.aget(doctor_id, date, slots.aday_state)
+        day_holds = await hold_cache.aget(doctor_id, date, holds.aload_day)
+    hours = await schedule.aday_hours(doctor_id, date)
+
+    return free_times_response(request, doctor_id, date, state, day_holds, hours)
+
+
+def format_event(name, data, event_id=None):
+    """Возвращает событие потока в формате Server-Sent Events.
+
+    :rtype str
+    """
+    lines = [f'event: {name}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data)}')
+
+    return '\n'.join(lines) + '\n\n'
+
+
+async def free_time_events(request):
+    """Представление потока изменений занятости врача на дату.
+
+    Параметры запроса как у ``doctor_free_times``. Первое событие ``busy``
+    содержит занятые часы, в том числе часы, в которые врач не принимает.
+    Затем после каждого изменения карточек приема отправляется событие
+    ``delta`` с часами, которые стали занятыми (``busy``) и свободными
+    (``free``). Без изменений раз в ``RECEPTION_EVENTS_KEEPALIVE`` секунд
+    отправляется комментарий, чтобы соединение не закрыл прокси. Через
+    ``RECEPTION_EVENTS_MAX_AGE`` секунд поток завершается, и браузер
+    переподключается.
+
+    Ожидающий поток - это сопрограмма без потока и соединения с БД, поэтому
+    под ASGI процесс держит тысячи открытых форм. Под WSGI поток занял бы
+    рабочий процесс целиком, поэтому отвечаем 204 - браузер прекращает
+    переподключения.
+    """
+    if not settings.RECEPTION_ASYNC_VIEWS:
+        return HttpResponse(status=204)
+
+    try:
+        doctor_id, date = get_free_times_params(request)
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('Некорректные параметры запроса')
+
+    shard = await sharding.afor_doctor(doctor_id)
+
+    async def stream():
+        broker = events.get_broker()
+        # Подписка до чтения занятости, чтобы не пропустить изменение между ними
+        subscription = broker.subscribe(events.channel(doctor_id, date))
+        try:
+            with shard:
+                mask, version = await slots.aday_state(doctor_id, date)
+            open_mask, _ = await schedule.aday_hours(doctor_id, date)
+            closed = slots.FULL_MASK & ~open_mask
+            busy = mask | closed
+            yield f'retry: {settings.RECEPTION_EVENTS_RETRY}\n' + format_event(
+                'busy', {'busy_time': [str(time) for time in slots.times_from_mask(busy)]},
+                version)
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.RECEPTION_EVENTS_MAX_AGE
+            while loop.time() < deadline:
+                message = await subscription.get(min(
+                    settings.RECEPTION_EVENTS_KEEPALIVE, deadline - loop.time()))
+                if message is None:
+                    yield ': keepalive\n\n'
+                    continue
+                # Сообщение могло быть опубликовано до чтения занятости
+                if message['version'] <= version:
+                    continue
+
+                version = message['version']
+                new_busy = message['busy_mask'] | closed
+                added, removed = new_busy & ~busy, busy & ~new_busy
+                busy = new_busy
+                if added or removed:
+                    yield format_event('delta', {
+                        'busy': [str(time) for time in slots.times_from_mask(added)],
+                        'free': [str(time) for time in slots.times_from_mask(removed)],
+                    }, version)
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Буферизация nginx задержала бы события
+    response['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
+@require_POST
+@throttle('hold')
+def hold_slot(request):
+    """Представление временной брони часа приема врача.
+
+    Параметры запроса: ``doctor_id``, ``date`` и ``time`` в формате ЧЧ:ММ.
+    Если врач не принимает в этот час, час занят или забронирован другим
+    пациентом, отвечает 409. Клиенту, не открывавшему форму записи, отвечает
+    403, а сверх числа броней с его адреса - 429.
+    """
+    try:
+        doctor_id = int(request.POST['doctor_id'])
+        date = datetime.datetime.strptime(request.POST['date'], "%d.%m.%Y").date()
+        time = datetime.datetime.strptime(request.POST['time'], "%H:%M").time()
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('Некорректные параметры запроса')
+
+    if not schedule.is_open(doctor_id, date, time):
+        return HttpResponse(
+            json.dumps({'error': schedule.CLOSED_MESSAGE}, ensure_ascii=False),
+            content_type='application/json', status=409)
+
+    owner = holds.get_owner(request)
+    if owner is None:
+        return HttpResponse(
+            json.dumps({'error': holds.NO_SESSION_MESSAGE}, ensure_ascii=False),
+            content_type='application/json', status=403)
+    if not holds.reserve_client_hold(get_client(request), owner):
+        return HttpResponse(
+            json.dumps({'error': holds.CLIENT_HOLDS_MESSAGE}, ensure_ascii=False),
+            content_type='application/json', status=429)
+
+    with sharding.for_doctor(doctor_id):
+        expires_at = holds.hold_slot(doctor_id, date, time, owner)
+    if expires_at is None:
+        return HttpResponse(
+            json.dumps({'error': holds.HOLD_CONFLICT_MESSAGE}, ensure_ascii=False),
+            content_type='application/json', status=409)
+
+    return HttpResponse(
+        json.dumps({'held_until': expires_at.isoformat()}),
+        content_type='application/json')
+
+
+def search_doctors(request):
+    """Представление поиска врачей по началу слов ФИО.
+
+    Параметры запроса: ``q`` - строка поиска, ``limit`` - число врачей
+    в ответе. Поиск идет по индексу в памяти процесса без обращения к БД.
+    """
+    try:
+        limit = min(int(request.GET.get('limit', 20)), DOCTOR_SEARCH_MAX_LIMIT)
+    except ValueError:
+        return HttpResponseBadRequest('Некорректные параметры запроса')
+
+    found = doctors.search(request.GET.get('q', ''), max(limit, 0))
+
+    return HttpResponse(
+        json.dumps({'doctors': found}, ensure_ascii=False),
+        content_type='application/json')
+
+
+@throttle('free-time-grid')
+@replica_reads
+def doctors_free_time_grid(request):
+    """Представление для получения сетки занятости врачей на период.
+
+    Параметры запроса: ``doctor_ids`` - идентификаторы врачей через запятую
+    (по умолчанию все врачи), ``date_from`` и ``date_to`` - границы периода,
+    ``format`` - ``mask`` (по умолчанию) или ``json``.
+
+    В формате ``mask`` занятость врача на каждый рабочий день периода
+    передается одним числом - битовой маской часов ``hours``. Часы, в которые
+    врач не принимает по календарю, считаются занятыми. Врачи без карточек
+    приема, принимающие весь период в часы работы клиники, в ``grid`` не
+    попадают.
+    """
+    try:
+        date_from = datetime.datetime.strptime(
+            request.GET['date_from'], "%d.%m.%Y").date()
+        date_to = datetime.datetime.strptime(
+            request.GET['date_to'], "%d.%m.%Y").date()
+        doctor_ids = request.GET.get('doctor_ids')
+        if doctor_ids:
+            doctor_ids = sorted({int(id_) for id_ in doctor_ids.split(',')})
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('Некорректные параметры запроса')
+
+    days = (date_to - date_from).days + 1
+    if not 0 < days <= GRID_MAX_DAYS:
+        return HttpResponseBadRequest(
+            f'Период должен быть от 1 до {GRID_MAX_DAYS} дней')
+
+    dates = schedule.clinic_days([
+        date_from + datetime.timedelta(days=i) for i in range(days)])
+    if not doctor_ids:
+        doctor_ids = None
+
+    grid = slots.busy_grid(doctor_ids, dates)
+
+    if doctor_ids is None:
+        doctor_ids = list(Doctor.objects.order_by('id').values_list('id', flat=True))
+
+    calendars = schedule.get_calendars(doctor_ids, dates[-1] if dates else None)
+    for doctor_id, calendar in calendars.items():
+        closed = [
+            slots.FULL_MASK & ~mask
+            for mask in schedule.calendar_masks(calendar, dates)]
+        if any(closed):
+            masks = grid.setdefault(doctor_id, [0] * len(dates))
+            for i, mask in enumerate(closed):
+                masks[i] |= mask
+
+    if request.GET.get('format') == 'json':
+        grid = {
+            doctor_id: {
+                date.strftime('%d.%m.%Y'): [
+                    str(time) for time in slots.times_from_mask(mask)]
+                for date, mask in zip(dates, masks) if mask
+            }
+            for doctor_id, masks in grid.items()
+        }
 
     return HttpResponse(
-        json.dumps({'busy_time': [str(bt) for bt in busy_time]}), content_type='application/json')
+        json.dumps({
+            'hours': slots.WORKING_HOURS,
+            'dates': [date.strftime('%d.%m.%Y') for date in dates],
+            'doctors': doctor_ids,
+            'grid': grid,
+        }, separators=(',', ':')),
+        content_type='application/json')
+
+
+@throttle('earliest')
+@replica_reads
+def earliest_free_times(request):
+    """Представление поиска ближайших свободных часов приема.
+
+    Параметры запроса: ``doctor_ids`` - идентификаторы врачей через запятую
+    (по умолчанию все врачи), ``date_from`` - первый день поиска (по умолчанию
+    сегодня), ``days`` - длина периода поиска в днях, ``limit`` - число часов
+    в ответе. Часы в ответе упорядочены по дате и времени, часы одного
+    времени - по врачу.
+    """
+    today = datetime.date.today()
+    try:
+        date_from = today
+        if request.GET.get('date_from'):
+            date_from = max(today, datetime.datetime.strptime(
+                request.GET['date_from'], "%d.%m.%Y").date())
+        days = int(request.GET.get('days', 28))
+        limit = min(int(request.GET.get('limit', 10)), EARLIEST_MAX_LIMIT)
+        doctor_ids = request.GET.get('doctor_ids')
+        if doctor_ids:
+            doctor_ids = sorted({int(id_) for id_ in doctor_ids.split(',')})
+    except ValueError:
+        return HttpResponseBadRequest('Некорректные параметры запроса')
+
+    if not 0 < days <= EARLIEST_MAX_DAYS:
+        return HttpResponseBadRequest(
+            f'Период должен быть от 1 до {EARLIEST_MAX_DAYS} дней')
+
+    found = earliest.find_earliest(
+        doctor_ids or None, date_from, days, limit, request.session.session_key)
+
+    return HttpResponse(
+        json.dumps({
+            'slots': [
+                {'doctor_id': doctor_id, 'date': date.strftime('%d.%m.%Y'),
+                 'time': str(time)}
+                for date, time, doctor_id in found],
+        }),
+        content_type='application/json')
+
+
+@staff_member_required
+@permission_required('reception.view_reception', raise_exception=True)
+@replica_reads
+def export_receptions(request):
+    """Представление потоковой выгрузки карточек приема.
+
+    Параметры запроса: ``doctor_ids`` - идентификаторы врачей через запятую,
+    ``date_from`` и ``date_to`` - границы периода, ``format`` - ``csv``
+    (по умолчанию) или ``jsonl``.
+    """
+    format_ = request.GET.get('format', 'csv')
+    try:
+        doctor_ids = [
+            int(id_) for id_ in request.GET.get('doctor_ids', '').split(',')
+            if id_]
+        date_from, date_to = (
+            datetime.datetime.strptime(request.GET[param], "%d.%m.%Y").date()
+            if request.GET.get(param) else None
+            for param in ('date_from', 'date_to'))
+    except ValueError:
+        return HttpResponseBadRequest('Некорректные параметры запроса')
+
+    if format_ not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Некорректный формат выгрузки')
+
+    receptions = filter_receptions(
+        Reception.objects.all(), doctor_ids, date_from, date_to)
+    # При шардировании выгрузка объединяет карточки шардов врачей
+    shards = [alias for alias in sharding.group_by_shard(doctor_ids or None) if alias]
 
+    return streaming_export(receptions, format_, shards=shards)
@@ -0,0 +1,105 @@
+"""Прогрев процесса перед приемом запросов.
+
+Без прогрева первые запросы после запуска компилируют маршруты и шаблоны,
+загружают библиотеки тегов и открывают соединение с БД. ``warm_up``
+выполняет эту работу заранее, а ``is_ready`` сообщает, завершен ли прогрев,
+для проверки готовности балансировщиком.
+"""
+import datetime
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+# Шаблоны, которые компилируются в кеш загрузчика при прогреве
+WARM_TEMPLATES = (
+    'reception/reception_form.html',
+    'reception/reception_success.html',
+)
+
+_ready = threading.Event()
+_lock = threading.Lock()
+
+
+def is_ready():
+    """Проверяет, что прогрев процесса завершен."""
+    return _ready.is_set()
+
+
+def warm_templates():
+    """Загружает шаблоны страниц записи в кеширующий загрузчик."""
+    for name in WARM_TEMPLATES:
+        get_template(name)
+
+
+def warm_urls():
+    """Компилирует маршруты приложения."""
+    get_resolver().url_patterns
+    get_resolver().reverse_dict
+
+
+def check_database():
+    """Открывает соединение с основной БД и проверяет его."""
+    with connections['default'].cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def warm_caches():
+    """Загружает справочник врачей, календари приема и занятость.
+
+    Занятость и брони загружаются на ближайшие рабочие дни клиники.
+    """
+    from reception import doctors, holds, schedule, slots
+    from reception.cache import free_time_cache, hold_cache
+    from reception.forms import ReceptionForm
+    from reception.views import form_context
+
+    doctors.get_index()
+    doctor_ids = [doctor_id for doctor_id, _ in doctors.get_choices()]
+    schedule.get_calendars([None, *doctor_ids])
+
+    # Отрисовка формы заполняет кеш фрагмента и загружает теги шаблонов
+    get_template('reception/reception_form.html').render(form_context(ReceptionForm()))
+
+    today = datetime.date.today()
+    dates = schedule.clinic_days([
+        today + datetime.timedelta(days=i)
+        for i in range(settings.RECEPTION_CALENDAR_DAYS)])[:settings.RECEPTION_WARMUP_DAYS]
+    days = [(doctor_id, date) for doctor_id in doctor_ids for date in dates]
+    free_time_cache.prime(days, lambda: slots.day_states(doctor_ids, dates))
+    hold_cache.prime(days, lambda: holds.load_days(doctor_ids, dates))
+
+
+def warm_up(keep_connection=False):
+    """Прогревает процесс и отмечает его готовым к приему запросов.
+
+    :param keep_connection: Оставить открытым соединение с БД. Процесс,
+                            после прогрева которого создаются рабочие
+                            процессы, не должен передавать им соединение.
+    :type keep_connection: bool
+
+    :return Завершен ли прогрев
+    :rtype bool
+    """
+    with _lock:
+        try:
+            warm_urls()
+            warm_templates()
+            check_database()
+            warm_caches()
+        except DatabaseError:
+            logger.exception('Прогрев не завершен: БД недоступна')
+            _ready.clear()
+            return False
+        finally:
+            if not keep_connection:
+                connections.close_all()
+
+        _ready.set()
+
+    return True